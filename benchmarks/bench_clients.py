@@ -0,0 +1,33 @@
+import os
+import pytest
+from ndn.app import NDNApp
+from ndn.client_conf import read_client_conf
+from ndn.encoding import Name
+from ndn.security import KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo.clients import PutfileClient
+
+
+@pytest.mark.parametrize('manifest', [False, True])
+@pytest.mark.parametrize('cpu_count', sorted({1, os.cpu_count() or 1}))
+def bench_putfile_prepare(bench, scale, tmp_path, cpu_count, manifest):
+    # the workers sign with the default keychain
+    pib_location = read_client_conf()['pib'].split(':', 1)[1]
+    if not os.path.exists(os.path.join(pib_location, 'pib.db')):
+        pytest.skip('no default keychain')
+    segment_size = 8000
+    file_path = tmp_path / 'file'
+    file_path.write_bytes(os.urandom(scale * segment_size // 10))
+    seg_cnt = (scale * segment_size // 10 + segment_size - 1) // segment_size
+    client = PutfileClient(NDNApp(DummyFace(None), KeychainDigest()), '/client', '/repo')
+
+    def prepare():
+        # with a manifest, segments are signed with digests and the key signs once
+        client._prepare_data(str(file_path), Name.from_str('/bench/putfile'), segment_size, 0, cpu_count,
+                             manifest)
+        assert len(client.encoded_packets['/bench/putfile']) == seg_cnt
+    # the signing pool is started once, as when inserting several files
+    prepare()
+    bench(prepare, seg_cnt, cpu_count=cpu_count, segment_size=segment_size,
+          signing='manifest' if manifest else 'segment')
+    client.close()
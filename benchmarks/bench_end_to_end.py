@@ -0,0 +1,130 @@
+import asyncio as aio
+import itertools
+import os
+import pytest
+from ndn.client_conf import read_client_conf
+from ndn.encoding import Name
+from ndn_python_repo import Repo
+from ndn_python_repo.clients import GetfileClient, PutfileClient
+from ndn_python_repo.handle import ReadHandle, WriteCommandHandle, DeleteCommandHandle, SyncCommandHandle
+from ndn_python_repo.storage import SqliteStorage
+from ndn_python_repo.utils import PubSub, FetchScheduler, manifest_name
+from simnet import SimNetwork
+
+
+SEGMENT_SIZE = 1000
+
+
+async def _start_repo(app, path: str):
+    """
+    Start a repo on ``app``, as ``ndn-python-repo`` does.
+    """
+    config = {'repo_config': {'repo_name': 'bench_repo', 'register_root': True,
+                              'max_concurrent_objects': 16, 'fetch_window': 64}}
+    storage = SqliteStorage(os.path.join(path, 'sqlite3.db'))
+    pb = PubSub(app)
+    read_handle = ReadHandle(app, storage, config)
+    scheduler = FetchScheduler.from_config(config['repo_config'])
+    write_handle = WriteCommandHandle(app, storage, pb, read_handle, config, scheduler)
+    sync_handle = SyncCommandHandle(app, storage, pb, read_handle, config, scheduler)
+    delete_handle = DeleteCommandHandle(app, storage, pb, read_handle, config)
+    repo = Repo(app, storage, read_handle, write_handle, delete_handle, sync_handle, None, config)
+    await repo.listen()
+    return storage
+
+
+@pytest.mark.parametrize('manifest', [False, True])
+@pytest.mark.parametrize('loss', [0.0, 0.01])
+@pytest.mark.parametrize('delay', [0.0025])
+def bench_putfile_getfile(bench, scale, tmp_path, delay, loss, manifest):
+    # the putfile client signs with the default keychain
+    pib_location = read_client_conf()['pib'].split(':', 1)[1]
+    if not os.path.exists(os.path.join(pib_location, 'pib.db')):
+        pytest.skip('no default keychain')
+    seg_cnt = max(scale // 10, 1)
+    file_path = tmp_path / 'file'
+    file_path.write_bytes(os.urandom(seg_cnt * SEGMENT_SIZE))
+    objects = itertools.count()
+    inserted = []
+
+    async def body():
+        # the round trip between two apps is four times the delay of a link
+        net = SimNetwork(seed=0)
+        repo_app = net.add_app('repo', delay=delay, bandwidth=1e9, loss=loss)
+        put_app = net.add_app('putfile', delay=delay, bandwidth=1e9, loss=loss)
+        get_app = net.add_app('getfile', delay=delay, bandwidth=1e9, loss=loss)
+        await net.start()
+        await _start_repo(repo_app, str(tmp_path))
+        putfile = PutfileClient(put_app, Name.from_str('/putfile'), 'bench_repo')
+        getfile = GetfileClient(get_app, 'bench_repo')
+
+        async def new_name():
+            return Name.from_str(f'/bench/e2e/obj{next(objects)}')
+
+        async def insert(name):
+            # until the client is notified of the completion
+            inserted_num = await putfile.insert_file(str(file_path), name, SEGMENT_SIZE, 0, 1, manifest=manifest)
+            if manifest:
+                # the root and the leaves of the manifest are inserted too
+                seg_cnt_with_manifest = seg_cnt + len(putfile.encoded_packets[Name.to_str(manifest_name(name))]) + 1
+                assert inserted_num == seg_cnt_with_manifest
+            else:
+                assert inserted_num == seg_cnt
+            inserted.append(name)
+
+        async def inserted_name():
+            name = inserted.pop(0)
+            # the repo serves the object from now on
+            await put_app.unregister(name)
+            return name
+
+        async def fetch(name):
+            await getfile.fetch_file(name, str(tmp_path / 'fetched'), overwrite=True)
+            assert (tmp_path / 'fetched').read_bytes() == file_path.read_bytes()
+
+        await bench.run(insert, seg_cnt, setup=new_name, stage='insert', delay=delay, loss=loss,
+                        segment_size=SEGMENT_SIZE, manifest=manifest)
+        result = await bench.run(fetch, seg_cnt, setup=inserted_name, stage='fetch', delay=delay,
+                                 loss=loss, segment_size=SEGMENT_SIZE, manifest=manifest)
+        # traffic of both stages, written with the results
+        result['links'] = net.stats()
+        putfile.close()
+        await net.stop()
+    aio.run(body())
+
+
+@pytest.mark.parametrize('command', ['insert_file', 'insert_files'])
+def bench_insert_many_files(bench, scale, tmp_path, command):
+    pib_location = read_client_conf()['pib'].split(':', 1)[1]
+    if not os.path.exists(os.path.join(pib_location, 'pib.db')):
+        pytest.skip('no default keychain')
+    # small files of 3 segments
+    file_cnt = max(scale // 100, 2)
+    for i in range(file_cnt):
+        (tmp_path / f'file{i}').write_bytes(os.urandom(3 * SEGMENT_SIZE))
+    rounds = itertools.count()
+
+    async def body():
+        net = SimNetwork(seed=0)
+        repo_app = net.add_app('repo', delay=0.0025, bandwidth=1e9)
+        put_app = net.add_app('putfile', delay=0.0025, bandwidth=1e9)
+        await net.start()
+        await _start_repo(repo_app, str(tmp_path))
+        putfile = PutfileClient(put_app, Name.from_str('/putfile'), 'bench_repo')
+
+        async def new_files():
+            prefix = f'/bench/many/round{next(rounds)}'
+            return [(str(tmp_path / f'file{i}'), Name.from_str(f'{prefix}/file{i}')) for i in range(file_cnt)]
+
+        async def insert(files):
+            if command == 'insert_files':
+                inserted = await putfile.insert_files(files, SEGMENT_SIZE, 0, 1)
+            else:
+                inserted = sum(await aio.gather(*[putfile.insert_file(path, name, SEGMENT_SIZE, 0, 1)
+                                                  for path, name in files]))
+            assert inserted == file_cnt * 3
+
+        await bench.run(insert, file_cnt * 3, setup=new_files, files=file_cnt, command=command)
+        putfile.close()
+        await net.stop()
+    aio.run(body())
@@ -0,0 +1,49 @@
+import asyncio as aio
+import random
+import pytest
+from ndn.app import NDNApp
+from ndn.encoding import Name
+from ndn.security import KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo.storage import NameKey
+from ndn_python_repo.utils import concurrent_fetcher
+
+
+class _ProducerFace(DummyFace):
+    """
+    A face answering Interests with the given Data packets after ``rtt`` seconds, losing a\
+        fraction ``loss`` of the Interests.
+    """
+    def __init__(self, test_func, packets: list, rtt: float, loss: float):
+        super().__init__(test_func)
+        self.packets = {NameKey.from_name(name): wire for name, wire in packets}
+        self.rtt = rtt
+        self.loss = loss
+        self.random = random.Random(0)
+
+    def send(self, data: bytes):
+        wire = self.packets.get(NameKey.from_packet(data))
+        if wire is None or self.random.random() < self.loss:
+            return
+        aio.get_running_loop().call_later(self.rtt, lambda: aio.create_task(self.input_packet(wire)))
+
+
+@pytest.mark.parametrize('loss', [0.0, 0.01])
+@pytest.mark.parametrize('rtt', [0.01])
+def bench_concurrent_fetcher(bench, scale, packets, rtt, loss):
+    pkts = packets('/bench/fetch', scale, segments=scale)
+    window = 64
+
+    async def face_proc(face: _ProducerFace):
+        async def fetch():
+            fetched = 0
+            async for _ in concurrent_fetcher(app, Name.from_str('/bench/fetch/obj0'), 0, scale - 1,
+                                              aio.Semaphore(window)):
+                fetched += 1
+            assert fetched == scale
+        await bench.run(fetch, scale, rtt=rtt, loss=loss, window=window)
+
+    face = _ProducerFace(face_proc, pkts, rtt, loss)
+    app = NDNApp(face, KeychainDigest())
+    face.app = app
+    aio.run(app.main_loop())
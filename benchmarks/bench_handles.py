@@ -0,0 +1,87 @@
+import asyncio as aio
+import os
+from ndn.app import NDNApp
+from ndn.encoding import InterestParam, make_interest
+from ndn.security import KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo.handle import ReadHandle, TcpBulkInsertHandle
+from ndn_python_repo.storage import NameKey, SqliteStorage
+
+
+class _CountingFace(DummyFace):
+    """
+    A face that only counts the packets sent by the app.
+    """
+    def __init__(self, test_func):
+        super().__init__(test_func)
+        self.sent = 0
+        self.target = None
+
+    def send(self, data: bytes):
+        self.sent += 1
+        if self.sent == self.target:
+            self.event.set()
+
+    def expect_sent(self, count: int):
+        """
+        Set ``event`` once ``count`` more packets are sent. Interests are processed in tasks of the app.
+        """
+        self.target = self.sent + count
+        self.event.clear()
+
+
+def bench_read_handle(bench, scale, packets, tmp_path):
+    pkts = packets('/bench/read', scale)
+    interests = [make_interest(name, InterestParam(nonce=i, lifetime=4000)) for i, (name, _) in enumerate(pkts)]
+
+    async def face_proc(face: _CountingFace):
+        storage = SqliteStorage(os.path.join(tmp_path, 'sqlite3.db'))
+        storage.put_data_packets([(name, wire, 3600000) for name, wire in pkts])
+        read_handle = ReadHandle(app, storage, {'repo_config': {'register_root': False}})
+        # as ReadHandle.listen, without registering the prefix since there is no forwarder
+        app.set_interest_filter('/bench/read', read_handle._on_interest, need_raw_packet=True)
+
+        async def serve():
+            face.expect_sent(len(interests))
+            for interest in interests:
+                await face.input_packet(interest)
+            await face.event.wait()
+        await bench.run(serve, scale)
+
+    face = _CountingFace(face_proc)
+    app = NDNApp(face, KeychainDigest())
+    face.app = app
+    aio.run(app.main_loop())
+
+
+def bench_tcp_bulk_insert(bench, scale, packets, tmp_path):
+    pkts = packets('/bench/tcp', scale)
+    last_key = NameKey.from_name(pkts[-1][0])
+    config = {
+        'repo_config': {'register_root': True},
+        'tcp_bulk_insert': {'addr': '127.0.0.1', 'port': 0, 'register_prefix': False},
+    }
+
+    async def body():
+        async def setup():
+            storage = SqliteStorage(os.path.join(tmp_path, f'{os.urandom(4).hex()}.db'))
+            handle = TcpBulkInsertHandle(storage, None, config)
+            while getattr(handle, 'server', None) is None:
+                await aio.sleep(0.001)
+            return storage, handle
+
+        async def ingest(args):
+            storage, handle = args
+            port = handle.server.sockets[0].getsockname()[1]
+            _, writer = await aio.open_connection('127.0.0.1', port)
+            for _, wire in pkts:
+                writer.write(wire)
+            await writer.drain()
+            writer.close()
+            # done once the last packet is committed
+            while not storage._exists([last_key])[0]:
+                await aio.sleep(0.001)
+            handle.server.close()
+
+        await bench.run(ingest, scale, setup=setup)
+    aio.run(body())
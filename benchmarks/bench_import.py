@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import pytest
+
+
+# entry points, and modules they must not import
+ENTRY_POINTS = {
+    # the interpreter starting, measured alone
+    'sys': [],
+    'ndn.app': [],
+    'ndn_python_repo': ['ndn.app', 'yaml', 'ndn_python_repo.handle.read_handle',
+                        'ndn_python_repo.storage.storage_base'],
+    'ndn_python_repo.clients.getfile': ['yaml', 'multiprocessing', 'ndn_python_repo.handle.read_handle',
+                                        'ndn_python_repo.storage.storage_base'],
+    'ndn_python_repo.cmd.install': ['ndn.app', 'yaml'],
+    'ndn_python_repo.cmd.main': ['concurrent.futures.process', 'importlib.metadata', 'plyvel', 'pymongo'],
+}
+
+
+def _python(code: str) -> str:
+    # from the root of the repository, so that its package is imported
+    return subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          capture_output=True, text=True, check=True).stdout
+
+
+@pytest.mark.parametrize('module', list(ENTRY_POINTS))
+def bench_import(bench, module):
+    loaded = _python(f'import sys, {module}\n'
+                     f'print(*[m for m in {ENTRY_POINTS[module]!r} if m in sys.modules])').split()
+    assert loaded == []
+
+    def start():
+        # a new interpreter each round, so nothing is imported already
+        _python(f'import {module}')
+    # more rounds, as a single start is short and noisy
+    bench(start, 1, rounds=10, module=module)
@@ -0,0 +1,91 @@
+import asyncio as aio
+import os
+import pytest
+from ndn.encoding import Name
+from ndn_python_repo import Repo
+from ndn_python_repo.handle import CommandHandle, DeleteCommandHandle, ReadHandle, SyncCommandHandle, \
+    WriteCommandHandle
+from ndn_python_repo.storage import SqliteStorage
+from ndn_python_repo.utils import PubSub
+from simnet import SimNetwork
+
+
+@pytest.mark.parametrize('window,depth', [(1, 0), (16, 0), (16, 1)])
+def bench_recover_prefixes(bench, scale, tmp_path, window, depth):
+    # prefixes registered by clients inserting one object each, under 10 applications
+    prefix_cnt = max(scale // 10, 1)
+    config = {'repo_config': {'register_root': False, 'register_aggregate_depth': depth,
+                              'register_window': window, 'register_rate': 1000}}
+
+    async def body():
+        storage = SqliteStorage(os.path.join(tmp_path, 'sqlite3.db'))
+        for i in range(prefix_cnt):
+            CommandHandle.add_registered_prefix_in_storage(storage, Name.from_str(f'/app{i % 10}/obj{i}'))
+
+        async def setup():
+            # a round trip of 2 ms to the forwarder
+            net = SimNetwork(seed=0)
+            app = net.add_app('repo', delay=0.0005)
+            await net.start()
+            return net, ReadHandle(app, storage, config)
+
+        async def recover(args):
+            net, read_handle = args
+            # as Repo.recover_registered_prefixes
+            for prefix in CommandHandle.get_registered_prefix_in_storage(storage):
+                read_handle.listen(prefix)
+            await read_handle.registrar.join()
+            assert len(net.forwarder.fib) == len(read_handle.routes)
+            await net.stop()
+
+        await bench.run(recover, prefix_cnt, setup=setup, window=window, depth=depth)
+    aio.run(body())
+
+
+@pytest.mark.parametrize('stage', ['listen', 'ready'])
+def bench_cold_start(bench, scale, tmp_path, stage):
+    # a repo restarting with prefixes and sync groups joined before
+    prefix_cnt = max(scale // 10, 1)
+    group_cnt = max(scale // 100, 1)
+    config = {'repo_config': {'repo_name': 'bench_repo', 'register_root': False, 'register_aggregate_depth': 1,
+                              'register_rate': 1000}}
+
+    async def body():
+        storage = SqliteStorage(os.path.join(tmp_path, 'sqlite3.db'))
+        for i in range(prefix_cnt):
+            CommandHandle.add_registered_prefix_in_storage(storage, Name.from_str(f'/app{i % 10}/obj{i}'))
+        for i in range(group_cnt):
+            group = Name.from_str(f'/sync/group{i}')
+            CommandHandle.add_sync_group_in_storage(storage, group)
+            CommandHandle.add_sync_states_in_storage(storage, group, {
+                'fetched_dict': {}, 'svs_client_states': {'local_sv': {}, 'inst_buffer': {}},
+                'data_name_dedupe': False, 'check_status': {}, 'register_prefix': None})
+        started = []
+
+        async def setup():
+            net = SimNetwork(seed=0)
+            app = net.add_app('repo', delay=0.0005)
+            await net.start()
+            pb = PubSub(app)
+            read_handle = ReadHandle(app, storage, config)
+            write_handle = WriteCommandHandle(app, storage, pb, read_handle, config)
+            sync_handle = SyncCommandHandle(app, storage, pb, read_handle, config)
+            delete_handle = DeleteCommandHandle(app, storage, pb, read_handle, config)
+            repo = Repo(app, storage, read_handle, write_handle, delete_handle, sync_handle, None, config)
+            started.append((net, repo))
+            return net, repo
+
+        async def start(args):
+            # 'listen' is when the repo accepts commands, 'ready' when it recovered its state
+            _, repo = args
+            await repo.listen()
+            if stage == 'ready':
+                await repo.wait_ready()
+
+        await bench.run(start, 1, setup=setup, stage=stage, prefixes=prefix_cnt, groups=group_cnt)
+        for net, repo in started:
+            await repo.wait_ready()
+            for svs in repo.sync_handle.running_svs.values():
+                await svs.stop()
+            await net.stop()
+    aio.run(body())
@@ -0,0 +1,129 @@
+import asyncio as aio
+import itertools
+import os
+import pytest
+from ndn.encoding import Name
+from ndn_python_repo.storage import NameKey, SqliteStorage
+
+
+# Batch size of the fetching paths, see BatchWriter
+BATCH = 256
+
+
+def _sqlite(path: str):
+    return SqliteStorage(os.path.join(path, 'sqlite3.db'))
+
+
+def _leveldb(path: str):
+    try:
+        from ndn_python_repo.storage import LevelDBStorage
+    except ImportError:
+        pytest.skip('plyvel is not installed')
+    return LevelDBStorage(os.path.join(path, 'leveldb'))
+
+
+def _mongodb(path: str):
+    # needs a server, so only run when asked for
+    uri = os.environ.get('REPO_BENCH_MONGODB')
+    if not uri:
+        pytest.skip('REPO_BENCH_MONGODB is not set')
+    from ndn_python_repo.storage import MongoDBStorage
+    ret = MongoDBStorage('_bench_db', os.path.basename(path), uri)
+    ret.c_collection.delete_many({})
+    return ret
+
+
+BACKENDS = {'sqlite3': _sqlite, 'leveldb': _leveldb, 'mongodb': _mongodb}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def new_storage(request, tmp_path):
+    """
+    :return: Callable creating an empty storage of the backend in a new directory.
+    """
+    counter = itertools.count()
+
+    def _new_storage():
+        path = tmp_path / str(next(counter))
+        path.mkdir()
+        return BACKENDS[request.param](str(path))
+    _new_storage.backend = request.param
+    return _new_storage
+
+
+def _fill(storage, packets):
+    for i in range(0, len(packets), BATCH):
+        storage.put_data_packets([(name, wire, 3600000) for name, wire in packets[i:i + BATCH]])
+
+
+def bench_put_batch(bench, scale, packets, new_storage):
+    pkts = packets('/bench/storage', scale)
+
+    async def body():
+        bench(lambda storage: _fill(storage, pkts), scale, setup=new_storage, backend=new_storage.backend)
+    aio.run(body())
+
+
+def bench_put_write_back(bench, scale, packets, new_storage):
+    pkts = packets('/bench/storage', scale)
+
+    def put(storage):
+        for name, wire in pkts:
+            storage.put_data_packet(name, wire)
+        storage._write_back()
+
+    async def body():
+        bench(put, scale, setup=new_storage, backend=new_storage.backend)
+    aio.run(body())
+
+
+def bench_get(bench, scale, packets, new_storage):
+    pkts = packets('/bench/storage', scale)
+    keys = [NameKey.from_name(name) for name, _ in pkts]
+
+    def get():
+        for key in keys:
+            assert storage.get_data_packet(key) is not None
+
+    async def body():
+        nonlocal storage
+        storage = new_storage()
+        _fill(storage, pkts)
+        bench(get, scale, backend=new_storage.backend)
+    storage = None
+    aio.run(body())
+
+
+def bench_get_prefix(bench, scale, packets, new_storage):
+    pkts = packets('/bench/storage', scale)
+    # objects of 10 segments
+    prefixes = [NameKey.from_name(Name.from_str(f'/bench/storage/obj{i}')) for i in range(scale // 10)]
+
+    def get():
+        for prefix in prefixes:
+            assert storage.get_data_packet(prefix, can_be_prefix=True) is not None
+
+    async def body():
+        nonlocal storage
+        storage = new_storage()
+        _fill(storage, pkts)
+        bench(get, len(prefixes), backend=new_storage.backend)
+    storage = None
+    aio.run(body())
+
+
+def bench_remove(bench, scale, packets, new_storage):
+    pkts = packets('/bench/storage', scale)
+
+    def setup():
+        ret = new_storage()
+        _fill(ret, pkts)
+        return ret
+
+    def remove(storage):
+        for name, _ in pkts:
+            assert storage.remove_data_packet(name)
+
+    async def body():
+        bench(remove, scale, setup=setup, backend=new_storage.backend)
+    aio.run(body())
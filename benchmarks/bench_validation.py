@@ -0,0 +1,32 @@
+import asyncio as aio
+import pytest
+from Cryptodome.PublicKey import ECC
+from ndn.app_support.security_v2 import self_sign
+from ndn.encoding import Name, Component, MetaInfo, make_data
+from ndn.security import Sha256WithEcdsaSigner
+from ndn_python_repo.utils import DataValidator
+
+
+@pytest.mark.parametrize('processes,batch_size', [(0, 64), (2, 16), (2, 256)])
+def bench_verify(bench, scale, processes, batch_size):
+    key_name = Name.from_str('/bench/KEY/%01')
+    key = ECC.generate(curve='P-256')
+    signer = Sha256WithEcdsaSigner(key_name, key.export_key(format='DER'))
+    anchor = bytes(self_sign(key_name, key.public_key().export_key(format='DER'), signer)[1])
+    # packets signed by the anchor, so that no certificate is fetched
+    content = bytes(1000)
+    pkts = [bytes(make_data(Name.from_str('/bench/validation') + [Component.from_segment(i)], MetaInfo(),
+                            content, signer=signer)) for i in range(scale)]
+
+    async def body():
+        validator = DataValidator(None, [anchor], processes, batch_size)
+        # start the processes before measuring
+        assert await validator.verify(pkts[:1]) == [True]
+
+        async def verify():
+            assert all(await validator.verify(pkts))
+        try:
+            await bench.run(verify, scale, processes=processes, batch_size=batch_size)
+        finally:
+            validator.close()
+    aio.run(body())
@@ -0,0 +1,148 @@
+# -----------------------------------------------------------------------------
+# Fixtures of the benchmark suite.
+#
+# Run with ``pytest benchmarks``. Results are written as JSON to the path in
+# REPO_BENCH_OUTPUT (benchmarks/results.json by default), and the number of keys
+# is set by REPO_BENCH_SCALE (10000 by default).
+# -----------------------------------------------------------------------------
+
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Callable, Optional
+import pytest
+from ndn.encoding import Name, Component, MetaInfo, make_data
+from ndn.security import DigestSha256Signer
+
+
+SCALE = int(os.environ.get('REPO_BENCH_SCALE', 10000))
+ROUNDS = int(os.environ.get('REPO_BENCH_ROUNDS', 3))
+OUTPUT = os.environ.get('REPO_BENCH_OUTPUT', os.path.join(os.path.dirname(__file__), 'results.json'))
+
+_results = []
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench:
+    """
+    Time a function over several rounds and record the result under the current test name.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, func: Callable, items: int, setup: Optional[Callable]=None,
+                 rounds: int=ROUNDS, **params) -> dict:
+        """
+        :param func: Callable. The measured operation. It is given the value returned by ``setup``.
+        :param items: int. Number of items, e.g. packets, processed by one call of ``func``.
+        :param setup: Optional[Callable]. Called before each round, outside of the measurement.
+        :param rounds: int. Number of measured rounds.
+        :param params: Other parameters of the benchmark, recorded with the result.
+        :return: dict. The recorded result.
+        """
+        seconds = []
+        for _ in range(rounds):
+            args = (setup(), ) if setup else ()
+            start = time.perf_counter()
+            func(*args)
+            seconds.append(time.perf_counter() - start)
+        return self._record(seconds, items, params)
+
+    async def run(self, func: Callable, items: int, setup: Optional[Callable]=None,
+                  rounds: int=ROUNDS, **params) -> dict:
+        """
+        Same as calling the benchmark, for a coroutine function ``func`` and ``setup``.
+        """
+        seconds = []
+        for _ in range(rounds):
+            args = (await setup(), ) if setup else ()
+            start = time.perf_counter()
+            await func(*args)
+            seconds.append(time.perf_counter() - start)
+        return self._record(seconds, items, params)
+
+    def _record(self, seconds: list[float], items: int, params: dict) -> dict:
+        best = min(seconds)
+        result = {
+            'name': self.name,
+            'params': params,
+            'items': items,
+            'rounds': seconds,
+            'min': best,
+            'median': statistics.median(seconds),
+            'items_per_second': items / best if best > 0 else None,
+        }
+        _results.append(result)
+        return result
+
+
+@pytest.fixture
+def bench(request) -> Bench:
+    return Bench(request.node.name)
+
+
+@pytest.fixture
+def scale() -> int:
+    return SCALE
+
+
+@functools.lru_cache(maxsize=4)
+def _make_packets(prefix: str, count: int, segments: int, size: int) -> list[tuple[list, bytes]]:
+    signer = DigestSha256Signer()
+    content = os.urandom(size)
+    meta_info = MetaInfo(freshness_period=3600000)
+    ret = []
+    for i in range(count):
+        name = Name.from_str(f'{prefix}/obj{i // segments}') + [Component.from_segment(i % segments)]
+        ret.append((name, bytes(make_data(name, meta_info, content, signer=signer))))
+    return ret
+
+
+@pytest.fixture
+def packets() -> Callable:
+    """
+    :return: Callable. ``packets(prefix, count, segments=10, size=1000)`` returns ``(name, wire)``\
+        of ``count`` Data packets named ``<prefix>/obj<i>/seg=<j>``, with ``segments`` segments\
+        per object. Packets are cached between benchmarks.
+    """
+    def _packets(prefix: str, count: int, segments: int=10, size: int=1000):
+        return _make_packets(prefix, count, segments, size)
+    return _packets
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': SCALE,
+        'results': _results,
+    }
+    with open(OUTPUT, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section('benchmark results')
+    for result in _results:
+        params = ' '.join(f'{k}={v}' for k, v in result['params'].items())
+        rate = result['items_per_second'] or 0
+        terminalreporter.write_line(f'{result["name"]:<50} {params:<30} {result["min"] * 1000:>10.1f} ms'
+                                    f' {rate:>12.0f} items/s')
+    terminalreporter.write_line(f'written to {OUTPUT}')
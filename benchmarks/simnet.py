@@ -0,0 +1,293 @@
+# -----------------------------------------------------------------------------
+# In-process network of NDNApps, standing in for NFD in experiments.
+#
+# Every app is connected to a single forwarder by a pair of links with their
+# own delay, bandwidth and loss. The forwarder keeps a FIB filled by prefix
+# registration commands and a PIT, which is enough to run the repo and its
+# clients without NFD.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import random
+from hashlib import sha256
+from typing import Callable, Optional
+from ndn.app import NDNApp
+from ndn.app_support.nfd_mgmt import ControlParameters, ControlResponse
+from ndn.encoding import Name, Component, FormalName, MetaInfo, TypeNumber, make_data, parse_interest, \
+    parse_tl_num, DecodeError
+from ndn.encoding.tlv_var import write_tl_num, get_tl_num_size
+from ndn.name_tree import NameTrie
+from ndn.security import DigestSha256Signer, KeychainDigest
+from ndn.transport.face import Face
+from ndn_python_repo.storage import NameKey
+
+
+class Link:
+    """
+    One direction of the connection between an app and the forwarder.
+
+    Packets are serialized at ``bandwidth``, then arrive ``delay`` seconds later, in order.\
+        Losses are drawn from a seeded generator, so they are the same in every run.
+    """
+    def __init__(self, delay: float=0.0, bandwidth: Optional[float]=None, loss: float=0.0, seed: int=0):
+        """
+        :param delay: float. Propagation delay in seconds.
+        :param bandwidth: Optional[float]. Bits per second, unlimited if None.
+        :param loss: float. Probability that a packet is lost.
+        :param seed: int. Seed of the losses.
+        """
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.busy_until = 0.0
+        self.packets = 0
+        self.bytes = 0
+        self.lost = 0
+
+    def transmit(self, wire: bytes, deliver: Callable[[bytes], None]):
+        self.packets += 1
+        self.bytes += len(wire)
+        loop = aio.get_running_loop()
+        now = loop.time()
+        depart = now
+        if self.bandwidth:
+            depart = max(now, self.busy_until) + len(wire) * 8 / self.bandwidth
+            self.busy_until = depart
+        # the packet still takes its share of the bandwidth when it is lost
+        if self.loss > 0 and self.random.random() < self.loss:
+            self.lost += 1
+            return
+        arrival = depart + self.delay
+        if arrival <= now:
+            loop.call_soon(deliver, wire)
+        else:
+            loop.call_at(arrival, deliver, wire)
+
+
+class SimFace(Face):
+    """
+    The face of an app, connected to the forwarder of a :class:`SimNetwork`.
+    """
+    def __init__(self, network: 'SimNetwork', name: str, up: Link, down: Link):
+        super().__init__()
+        self.network = network
+        self.name = name
+        self.up = up
+        self.down = down
+        self.closed = None
+
+    async def open(self):
+        self.closed = aio.Event()
+        self.running = True
+
+    def shutdown(self):
+        self.running = False
+        if self.closed:
+            self.closed.set()
+
+    async def run(self):
+        await self.closed.wait()
+
+    def isLocalFace(self):
+        return True
+
+    def send(self, data: bytes):
+        self.up.transmit(bytes(data), lambda wire: self.network.forwarder.receive(self, wire))
+
+    def deliver(self, wire: bytes):
+        """
+        Send a packet from the forwarder to the app.
+        """
+        self.down.transmit(wire, self._on_arrival)
+
+    def _on_arrival(self, wire: bytes):
+        if self.running:
+            typ, _ = parse_tl_num(wire)
+            aio.create_task(self.callback(typ, memoryview(wire)))
+
+
+class _PitEntry:
+    __slots__ = ('face', 'can_be_prefix', 'expiry', 'nonce')
+
+    def __init__(self, face: SimFace, can_be_prefix: bool, expiry: float, nonce: Optional[int]):
+        self.face = face
+        self.can_be_prefix = can_be_prefix
+        self.expiry = expiry
+        self.nonce = nonce
+
+
+class SimForwarder:
+    """
+    A minimal forwarder: best route forwarding by longest prefix match, PIT aggregation by name,\
+        and the prefix registration commands of NFD.
+    """
+    def __init__(self):
+        self.fib = NameTrie()
+        self.pit = {}
+        self.logger = logging.getLogger(__name__)
+
+    def receive(self, face: SimFace, wire: bytes):
+        typ, _ = parse_tl_num(wire)
+        try:
+            if typ == TypeNumber.INTEREST:
+                self._on_interest(face, wire)
+            elif typ == TypeNumber.DATA:
+                self._on_data(wire)
+        except (DecodeError, IndexError, ValueError) as exc:
+            self.logger.warning(f'Dropped malformed packet from {face.name}: {exc}')
+
+    def _on_interest(self, face: SimFace, wire: bytes):
+        name, param, _, _ = parse_interest(wire)
+        if len(name) >= 2 and name[0] == Component.from_str('localhost') and name[1] == Component.from_str('nfd'):
+            self._on_command(face, name)
+            return
+        key = NameKey.from_packet(wire)
+        now = aio.get_running_loop().time()
+        entries = [e for e in self.pit.get(key, []) if e.expiry > now]
+        if any(e.nonce == param.nonce for e in entries):
+            # looping or duplicate Interest
+            return
+        entries.append(_PitEntry(face, bool(param.can_be_prefix), now + (param.lifetime or 4000) / 1000,
+                                 param.nonce))
+        self.pit[key] = entries
+        nexthop = self._nexthop(name, face)
+        if nexthop is not None:
+            nexthop.deliver(wire)
+
+    def _nexthop(self, name: FormalName, incoming: SimFace) -> Optional[SimFace]:
+        try:
+            step = self.fib.longest_prefix(name)
+        except KeyError:
+            return None
+        if not step:
+            return None
+        for face in step.value:
+            if face is not incoming:
+                return face
+        return None
+
+    def _on_data(self, wire: bytes):
+        key = NameKey.from_packet(wire)
+        now = aio.get_running_loop().time()
+        faces = []
+        # Interests for the full name, i.e. with the implicit digest
+        full_key = NameKey(key + Component.from_bytes(sha256(wire).digest(), Component.TYPE_IMPLICIT_SHA256))
+        for entry in self.pit.pop(full_key, []):
+            if entry.expiry > now and entry.face not in faces:
+                faces.append(entry.face)
+        for n in range(key.n_components, 0, -1):
+            prefix = key.prefix(n)
+            entries = self.pit.get(prefix)
+            if not entries:
+                continue
+            remaining = []
+            for entry in entries:
+                if entry.expiry <= now:
+                    continue
+                if n == key.n_components or entry.can_be_prefix:
+                    if entry.face not in faces:
+                        faces.append(entry.face)
+                else:
+                    remaining.append(entry)
+            if remaining:
+                self.pit[prefix] = remaining
+            else:
+                del self.pit[prefix]
+        for face in faces:
+            face.deliver(wire)
+
+    def _on_command(self, face: SimFace, name: FormalName):
+        module, verb = bytes(Component.get_value(name[2])), bytes(Component.get_value(name[3]))
+        params = ControlParameters.parse(Component.get_value(name[4])).cp
+        prefix = Name.normalize(params.name) if params.name is not None else []
+        if module == b'rib' and verb == b'register':
+            faces = self.fib.setdefault(prefix, [])
+            if face not in faces:
+                faces.append(face)
+        elif module == b'rib' and verb == b'unregister':
+            faces = self.fib.get(prefix, [])
+            if face in faces:
+                faces.remove(face)
+            if not faces:
+                self.fib.pop(prefix, None)
+        response = ControlResponse()
+        response.status_code = 200
+        response.status_text = 'OK'
+        response.body = params
+        value = response.encode()
+        content = bytearray(1 + get_tl_num_size(len(value)) + len(value))
+        content[0] = 0x65
+        offset = 1 + write_tl_num(len(value), content, 1)
+        content[offset:] = value
+        face.deliver(bytes(make_data(name, MetaInfo(freshness_period=0), bytes(content),
+                                     signer=DigestSha256Signer())))
+
+
+class SimNetwork:
+    """
+    A set of NDNApps connected to one forwarder, all running in the current event loop.
+
+    .. code-block:: python3
+
+        net = SimNetwork()
+        repo_app = net.add_app('repo', delay=0.005)
+        client_app = net.add_app('client', delay=0.005, bandwidth=100e6, loss=0.01)
+        await net.start()
+        ...
+        await net.stop()
+    """
+    def __init__(self, seed: int=0):
+        """
+        :param seed: int. Seed of the losses of all links.
+        """
+        self.seed = seed
+        self.forwarder = SimForwarder()
+        self.faces = {}
+        self.apps = {}
+        self.tasks = []
+
+    def add_app(self, name: str, delay: float=0.0, bandwidth: Optional[float]=None, loss: float=0.0) -> NDNApp:
+        """
+        Create an app connected to the forwarder. Each direction of its connection has the given\
+            delay, bandwidth and loss, so the round trip between two apps is four times ``delay``.
+
+        :param name: str. The name of the app in the network.
+        :return: NDNApp. An app signing with SHA-256 digests.
+        """
+        index = len(self.faces)
+        face = SimFace(self, name, Link(delay, bandwidth, loss, hash((self.seed, index, 0))),
+                       Link(delay, bandwidth, loss, hash((self.seed, index, 1))))
+        app = NDNApp(face, KeychainDigest())
+        self.faces[name] = face
+        self.apps[name] = app
+        return app
+
+    async def start(self):
+        """
+        Run the main loops of all apps, and wait until they are started.
+        """
+        # routes added while an app registers its initial routes would be registered twice
+        started = [aio.Event() for _ in self.apps]
+
+        async def after_start(event):
+            event.set()
+        for app, event in zip(self.apps.values(), started):
+            self.tasks.append(aio.create_task(app.main_loop(after_start(event))))
+        for event in started:
+            await event.wait()
+
+    async def stop(self):
+        for app in self.apps.values():
+            app.shutdown()
+        await aio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def stats(self) -> dict:
+        """
+        :return: Packets, bytes and losses on the links of each app, as ``up`` and ``down``.
+        """
+        return {name: {direction: {'packets': link.packets, 'bytes': link.bytes, 'lost': link.lost}
+                       for direction, link in (('up', face.up), ('down', face.down))}
+                for name, face in self.faces.items()}
@@ -8,6 +8,7 @@
 import argparse
 import logging
 import multiprocessing
+import os
 from ndn.app import NDNApp
 from ndn.encoding import Name
 from ndn.security import KeychainDigest
@@ -29,14 +30,18 @@ async def run_putfile_client(app: NDNApp, **kwargs):
     # inserting multiple files with one client
     check_prefix = kwargs['client_prefix']
 
-    await client.insert_file(file_path=kwargs['file_path'],
-                             name_at_repo=kwargs['name_at_repo'],
-                             segment_size=kwargs['segment_size'],
-                             freshness_period=kwargs['freshness_period'],
-                             cpu_count=kwargs['cpu_count'],
-                             forwarding_hint=kwargs['forwarding_hint'],
-                             register_prefix=kwargs['register_prefix'],
-                             check_prefix=check_prefix)
+    # a directory is inserted with one command, each file named after its path in the directory
+    insert = client.insert_directory if os.path.isdir(kwargs['file_path']) else client.insert_file
+    await insert(kwargs['file_path'],
+                 name_at_repo=kwargs['name_at_repo'],
+                 segment_size=kwargs['segment_size'],
+                 freshness_period=kwargs['freshness_period'],
+                 cpu_count=kwargs['cpu_count'],
+                 forwarding_hint=kwargs['forwarding_hint'],
+                 register_prefix=kwargs['register_prefix'],
+                 check_prefix=check_prefix,
+                 manifest=kwargs['manifest'])
+    client.close()
     app.shutdown()
 
 
@@ -45,7 +50,7 @@ def main():
     parser.add_argument('-r', '--repo_name',
                         required=True, help='Name of repo')
     parser.add_argument('-f', '--file_path',
-                        required=True, help='Path to input file')
+                        required=True, help='Path to input file, or to a directory of files')
     parser.add_argument('-n', '--name_at_repo',
                         required=True, help='Prefix used to store file at Repo')
     parser.add_argument('--client_prefix',
@@ -64,6 +69,8 @@ def main():
                         help='Forwarding hint used by the repo when fetching data')
     parser.add_argument('--register_prefix', default=None,
                         help='The prefix repo should register')
+    parser.add_argument('--manifest', action='store_true',
+                        help='Sign segments with digests, and only sign a manifest of each file with the key')
     args = parser.parse_args()
 
     logging.basicConfig(format='[%(asctime)s]%(levelname)s:%(message)s',
@@ -89,7 +96,8 @@ def main():
                                            freshness_period=args.freshness_period,
                                            cpu_count=args.cpu_count,
                                            forwarding_hint=args.forwarding_hint,
-                                           register_prefix=args.register_prefix))
+                                           register_prefix=args.register_prefix,
+                                           manifest=args.manifest))
     except FileNotFoundError:
         print('Error: could not connect to NFD.')
 
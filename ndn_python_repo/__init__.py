@@ -1,5 +1,13 @@
-from .handle import *
-from .storage import *
-from .repo import Repo
-from .config import get_yaml
-from .utils import *
+from . import handle as _handle, storage as _storage, utils as _utils
+from .utils.lazy import lazy_exports
+
+# names are imported when first used, so that clients and tools only load what they need
+_EXPORTS = {
+    **dict.fromkeys(_handle._EXPORTS, '.handle'),
+    **dict.fromkeys(_storage._EXPORTS, '.storage'),
+    'Repo': '.repo',
+    'get_yaml': '.config',
+    **dict.fromkeys(_utils._EXPORTS, '.utils'),
+}
+__all__ = [*_handle.__all__, *_storage.__all__, 'Repo', 'get_yaml', *_utils.__all__]
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
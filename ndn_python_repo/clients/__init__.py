@@ -1,5 +1,12 @@
-from .getfile import GetfileClient
-from .putfile import PutfileClient
-from .delete import DeleteClient
-from .sync import SyncClient
-from .command_checker import CommandChecker
\ No newline at end of file
+from ..utils.lazy import lazy_exports
+
+# a tool using one client does not import the others, e.g. multiprocessing for putfile
+_EXPORTS = {
+    'GetfileClient': '.getfile',
+    'PutfileClient': '.putfile',
+    'DeleteClient': '.delete',
+    'SyncClient': '.sync',
+    'CommandChecker': '.command_checker',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
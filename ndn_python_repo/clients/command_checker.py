@@ -9,24 +9,113 @@ import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
+import asyncio as aio
 import logging
 from typing import Optional
 from ndn.app import NDNApp
 from ndn.encoding import Name, NonStrictName, DecodeError
 from ndn.types import InterestNack, InterestTimeout
-from ..command.repo_commands import RepoStatQuery, RepoCommandRes
+from ..command.repo_commands import RepoStatQuery, RepoCommandRes, RepoStatCode
+from ..utils import PubSub
 
 
 class CommandChecker(object):
-    def __init__(self, app: NDNApp):
+    # Lifetime of check interests waiting for a status change
+    LONG_POLL_LIFETIME = 4000
+    # Seconds between two checks when the last one was not answered, or the process not found
+    RETRY_INTERVAL = 1.0
+    # Checks finding no process before giving up, as the repo may not have received the command yet
+    NOT_FOUND_RETRIES = 5
+    # Status codes after which a process does not change
+    FINAL_STATUS = (RepoStatCode.COMPLETED, RepoStatCode.FAILED, RepoStatCode.MALFORMED)
+
+    def __init__(self, app: NDNApp, pb: Optional[PubSub] = None):
         """
         This client sends check interests to the repo.
 
         :param app: NDNApp.
+        :param pb: Optional[PubSub]. If given, the checker can subscribe to the status messages\
+            the repo publishes to the check prefix of a command.
         """
         self.app = app
+        self.pb = pb
+        self.topics = set()
+        self.pushed = {}    # request_no -> future of the status published by the repo
         self.logger = logging.getLogger(__name__)
-    
+
+    def subscribe(self, check_prefix: NonStrictName):
+        """
+        Subscribe to the status messages published to ``<check_prefix>/check``. This should be\
+            done before the command is sent, not to miss a process finishing quickly.
+
+        :param check_prefix: NonStrictName. The check prefix of the commands.
+        """
+        topic = Name.normalize(check_prefix) + Name.from_str('check')
+        if Name.to_str(topic) not in self.topics:
+            self.topics.add(Name.to_str(topic))
+            self.pb.subscribe(topic, self._on_status_msg)
+
+    def _on_status_msg(self, msg: bytes):
+        try:
+            response = RepoCommandRes.parse(msg)
+        except (DecodeError, IndexError) as exc:
+            self.logger.warning(f'Status message decoding failed for {exc}')
+            return
+        if response.request_no is None or response.status_code not in self.FINAL_STATUS:
+            return
+        future = self.pushed.setdefault(bytes(response.request_no), aio.get_running_loop().create_future())
+        if not future.done():
+            future.set_result(response)
+
+    async def wait_for_finish(self, method: str, repo_name: NonStrictName, request_no: bytes,
+                              max_unanswered: Optional[int] = None) -> Optional[RepoCommandRes]:
+        """
+        Wait until a process completes or fails. The final status is either published by the repo\
+            to the subscribed check prefix, or received by check interests that the repo answers\
+            when the status of the process changes.
+
+        :param method: str. One of `insert` or `delete`.
+        :param repo_name: NonStrictName. The name of the remote repo.
+        :param request_no: bytes. The request id of the process to wait for.
+        :param max_unanswered: Optional[int]. If given, give up after this number of check\
+            interests are nacked or time out. By default, checking continues, as a long process\
+            on a lossy link may leave many checks unanswered.
+        :return: The final response from the repo, or None if the process cannot be found or\
+            ``max_unanswered`` checks are not answered.
+        """
+        pushed = self.pushed.setdefault(request_no, aio.get_running_loop().create_future())
+        try:
+            known_status = None
+            n_not_found = 0
+            n_unanswered = 0
+            while not pushed.done():
+                poll = aio.create_task(self._check(method, repo_name, request_no, known_status,
+                                                   self.LONG_POLL_LIFETIME))
+                await aio.wait([poll, pushed], return_when=aio.FIRST_COMPLETED)
+                if pushed.done():
+                    poll.cancel()
+                    break
+                response = poll.result()
+                if response is None:
+                    n_unanswered += 1
+                    if max_unanswered is not None and n_unanswered >= max_unanswered:
+                        return None
+                    await aio.wait([pushed], timeout=self.RETRY_INTERVAL)
+                # might receive 404 if repo has not yet processed the command msg
+                elif response.status_code == RepoStatCode.NOT_FOUND:
+                    n_not_found += 1
+                    if n_not_found >= self.NOT_FOUND_RETRIES:
+                        return None
+                    await aio.wait([pushed], timeout=self.RETRY_INTERVAL)
+                elif response.status_code in self.FINAL_STATUS:
+                    return response
+                else:
+                    self.logger.info(f'Process {request_no.hex()} status: {response.status_code}')
+                    known_status = response.status_code
+            return pushed.result()
+        finally:
+            self.pushed.pop(request_no, None)
+
     async def check_insert(self, repo_name: NonStrictName, request_no: bytes) -> RepoCommandRes:
         """
         Check the status of an insert process.
@@ -47,17 +136,21 @@ class CommandChecker(object):
         """
         return await self._check('delete', repo_name, request_no)
 
-    async def _check(self, method: str, repo_name: NonStrictName,
-                     request_no: bytes) -> Optional[RepoCommandRes]:
+    async def _check(self, method: str, repo_name: NonStrictName, request_no: bytes,
+                     wait_status: Optional[int] = None, lifetime: int = 1000) -> Optional[RepoCommandRes]:
         """
         Return parsed insert check response message.
 
         :param method: str. One of `insert` or `delete`.
         :param repo_name: NonStrictName. The name of the remote repo.
         :param request_no: bytes. The request id of the process to check.
+        :param wait_status: Optional[int]. If given, the repo replies once the status of the\
+            process is no longer ``wait_status``, or before the interest expires.
+        :param lifetime: int. Lifetime of the check interest in milliseconds.
         """
         cmd_param = RepoStatQuery()
         cmd_param.request_no = request_no
+        cmd_param.wait_status = wait_status
         cmd_param_bytes = cmd_param.encode()
 
         name = Name.normalize(repo_name)
@@ -66,7 +159,7 @@ class CommandChecker(object):
         try:
             self.logger.info(f'Expressing interest: {Name.to_str(name)}')
             data_name, meta_info, content = await self.app.express_interest(
-                name, cmd_param_bytes, must_be_fresh=True, can_be_prefix=False, lifetime=1000)
+                name, cmd_param_bytes, must_be_fresh=True, can_be_prefix=False, lifetime=lifetime)
             self.logger.info(f'Received data name: {Name.to_str(data_name)}')
         except InterestNack as e:
             self.logger.info(f'Nacked with reason={e.reason}')
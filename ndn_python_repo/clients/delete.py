@@ -32,6 +32,7 @@ class DeleteClient(object):
         self.prefix = prefix
         self.repo_name = Name.normalize(repo_name)
         self.pb = PubSub(self.app, self.prefix)
+        self.checker = CommandChecker(self.app, self.pb)
         self.logger = logging.getLogger(__name__)
 
     async def delete_file(self, prefix: NonStrictName, start_block_id: int = 0,
@@ -64,12 +65,16 @@ class DeleteClient(object):
         cmd_obj.end_block_id = end_block_id
         cmd_obj.register_prefix = EmbName()
         cmd_obj.register_prefix.name = register_prefix
+        if check_prefix is None:
+            check_prefix = self.prefix
+        cmd_param.check_prefix = EmbName.from_name(check_prefix)
 
         cmd_param_bytes = bytes(cmd_param.encode())
         request_no = sha256(cmd_param_bytes).digest()
 
         # publish msg to repo's delete topic
         await self.pb.wait_for_ready()
+        self.checker.subscribe(check_prefix)
         is_success = await self.pb.publish(self.repo_name + Name.from_str('delete'), cmd_param_bytes)
         if is_success:
             self.logger.info('Published an delete msg and was acknowledged by a subscriber')
@@ -79,42 +84,25 @@ class DeleteClient(object):
         # wait until repo delete all data
         delete_num = 0
         if is_success:
-            delete_num = await self._wait_for_finish(check_prefix, request_no)
+            delete_num = await self._wait_for_finish(request_no)
         return delete_num
 
-    async def _wait_for_finish(self, check_prefix: NonStrictName, request_no: bytes):
+    async def _wait_for_finish(self, request_no: bytes):
         """
-        Send delete check interest to wait until delete process completes
+        Wait until delete process completes, as notified by the repo.
 
-        :param check_prefix: NonStrictName. The prefix under which the check message will be\
-            published.
         :param request_no: int. The request number to check for delete process (formerly process id)
         :return: Number of deleted packets.
         """
-        # fixme: why is check_prefix never used?
-        checker = CommandChecker(self.app)
-        n_retries = 3
-        while n_retries > 0:
-            response = await checker.check_delete(self.repo_name, request_no)
-            if response is None:
-                self.logger.info(f'No response')
-                await aio.sleep(1)
-            # might receive 404 if repo has not yet processed delete command msg
-            elif response.status_code == RepoStatCode.NOT_FOUND:
-                n_retries -= 1
-                # self.logger.info(f'Deletion {request_no} not handled yet')
-                await aio.sleep(1)
-            elif response.status_code == RepoStatCode.IN_PROGRESS:
-                self.logger.info(f'Deletion {request_no} in progress')
-                await aio.sleep(1)
-            elif response.status_code == RepoStatCode.COMPLETED:
-                delete_num = 0
-                for obj in response.objs:
-                    delete_num += obj.delete_num
-                self.logger.info(f'Deletion request {request_no} complete, delete_num: {delete_num}')
-                return delete_num
-            elif response.status_code == RepoStatCode.FAILED:
-                self.logger.info(f'Deletion request {request_no} failed')
-            else:
-                # Shouldn't get here
-                self.logger.error(f'Received unrecognized status code {response.status_code}')
+        response = await self.checker.wait_for_finish('delete', self.repo_name, request_no)
+        if response is None:
+            self.logger.info(f'No response')
+            return 0
+        delete_num = 0
+        for obj in response.objs:
+            delete_num += obj.delete_num or 0
+        if response.status_code == RepoStatCode.COMPLETED:
+            self.logger.info(f'Deletion request {request_no.hex()} complete, delete_num: {delete_num}')
+        else:
+            self.logger.info(f'Deletion request {request_no.hex()} failed, delete_num: {delete_num}')
+        return delete_num
@@ -11,46 +11,84 @@ import sys
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
 import asyncio as aio
+import itertools
 from .command_checker import CommandChecker
 from ..command import RepoCommandParam, ObjParam, EmbName, RepoStatCode
-from ..utils import PubSub
+from ..utils import PubSub, full_name, make_manifest, manifest_name
 import logging
 import multiprocessing
+from multiprocessing import shared_memory
 from ndn.app import NDNApp
-from ndn.encoding import Name, NonStrictName, Component, Links
+from ndn.encoding import Name, NonStrictName, Component, Links, MetaInfo, make_data
+from ndn.security import DigestSha256Signer
 import os
 import platform
 from hashlib import sha256
 from typing import Optional
 
 
+# Most segments signed by one task of the signing pool
+MAX_SEGMENTS_PER_TASK = 256
+
+
 if not os.environ.get('READTHEDOCS'):
     # I don't think global variable is good design
-    app_to_create_packet = None   # used for _create_packets only
+    signer_to_create_packet = None   # used for _create_packets only
+
+    def _init_worker():
+        """
+        Initializer of the processes of the signing pool.
+        """
+        # The keychain's sqlite3 connection is not thread-safe. Create a new NDNApp instance for
+        # each process, so that each process gets a separate sqlite3 connection.
+        # The default key is looked up once, not for every packet
+        global signer_to_create_packet
+        signer_to_create_packet = NDNApp().keychain.get_signer({})
 
-    def _create_packets(name, content, freshness_period, final_block_id):
+    def _create_packets(shm_name, segment_size, freshness_period, ranges, digest_signing=False):
         """
-        Worker for parallelize prepare_data().
+        Worker for parallelize prepare_data(). Sign segments of the files in the shared memory\
+            block ``shm_name``. ``ranges`` lists ``(name, offset, file_size, start, end)``, for\
+            segments ``start`` to ``end - 1`` of the file of ``file_size`` bytes at ``offset``.
+            Segments are signed with SHA-256 digests if ``digest_signing`` is set, and with the\
+            default key otherwise.
         This function has to be defined at the top level, so that it can be pickled and used
         by multiprocessing.
         """
-        # The keychain's sqlite3 connection is not thread-safe. Create a new NDNApp instance for
-        # each process, so that each process gets a separate sqlite3 connection
-        global app_to_create_packet
-        if app_to_create_packet is None:
-            app_to_create_packet = NDNApp()
+        signer = DigestSha256Signer() if digest_signing else signer_to_create_packet
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            ret = []
+            for name, offset, file_size, start, end in ranges:
+                name = Name.from_bytes(name)
+                seg_cnt = (file_size + segment_size - 1) // segment_size
+                meta_info = MetaInfo(freshness_period=freshness_period,
+                                     final_block_id=Component.from_segment(seg_cnt - 1))
+                for seq in range(start, end):
+                    begin = offset + seq * segment_size
+                    content = bytes(shm.buf[begin : begin + min(segment_size, file_size - seq * segment_size)])
+                    packet = make_data(name + [Component.from_segment(seq)], meta_info, content, signer=signer)
+                    ret.append(bytes(packet))
+            return ret
+        finally:
+            shm.close()
 
-        packet = app_to_create_packet.prepare_data(name, content,
-                                                   freshness_period=freshness_period,
-                                                   final_block_id=final_block_id)
-        return bytes(packet)
+    def _sign_packets(freshness_period, packets):
+        """
+        Worker signing the roots of manifests with the default key. ``packets`` lists\
+            ``(name, content)``.
+        """
+        meta_info = MetaInfo(freshness_period=freshness_period)
+        return [bytes(make_data(Name.from_bytes(name), meta_info, content, signer=signer_to_create_packet))
+                for name, content in packets]
 
 
 class PutfileClient(object):
 
     def __init__(self, app: NDNApp, prefix: NonStrictName, repo_name: NonStrictName):
         """
-        A client to insert files into the repo.
+        A client to insert files into the repo. Packets are signed by a pool of processes, which\
+            is kept between files until ``close()`` is called.
 
         :param app: NDNApp.
         :param prefix: NonStrictName. The name of this client
@@ -60,51 +98,152 @@ class PutfileClient(object):
         self.prefix = prefix
         self.repo_name = Name.normalize(repo_name)
         self.encoded_packets = {}
+        # roots of manifests, by name
+        self.manifests = {}
+        # processes signing packets, kept between files
+        self.pool = None
+        self.pool_size = 0
         self.pb = PubSub(self.app, self.prefix)
         self.pb.base_prefix = self.prefix
+        self.checker = CommandChecker(self.app, self.pb)
         self.logger = logging.getLogger(__name__)
 
         # https://bugs.python.org/issue35219
         if platform.system() == 'Darwin':
             os.environ['OBJC_DISABLE_INITIALIZE_FORK_SAFETY'] = 'YES'
 
+    def _get_pool(self, cpu_count: int):
+        """
+        Get the signing pool, which is kept between files. It is recreated if the number of\
+            processes changes.
+
+        :param cpu_count: int. Number of processes.
+        """
+        if self.pool is not None and self.pool_size != cpu_count:
+            self.close()
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(processes=cpu_count, initializer=_init_worker)
+            self.pool_size = cpu_count
+        return self.pool
+
+    def close(self):
+        """
+        Stop the processes signing packets.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            self.pool_size = 0
+
     def _prepare_data(self, file_path: str, name_at_repo, segment_size: int, freshness_period: int,
-                      cpu_count: int):
+                      cpu_count: int, manifest: bool=False):
         """
         Shard file into data packets.
 
         :param file_path: Local FS path to file to insert
         :param name_at_repo: Name used to store file at repo
         """
-        if not os.path.exists(file_path):
-            self.logger.error(f'file {file_path} does not exist')
-            return 0
-        with open(file_path, 'rb') as binary_file:
-            b_array = bytearray(binary_file.read())
-        if len(b_array) == 0:
-            self.logger.warning("File is empty")
-            return 0
+        return len(self._prepare_files([(file_path, name_at_repo)], segment_size, freshness_period, cpu_count,
+                                       manifest))
 
-        # use multiple threads to speed up creating TLV
-        seg_cnt = (len(b_array) + segment_size - 1) // segment_size
-        final_block_id = Component.from_segment(seg_cnt - 1)
-        packet_params = [[
-            name_at_repo + [Component.from_segment(seq)],
-            b_array[seq * segment_size : (seq + 1) * segment_size],
-            freshness_period,
-            final_block_id,
-        ] for seq in range(seg_cnt)]
+    def _prepare_files(self, files: list, segment_size: int, freshness_period: int, cpu_count: int,
+                       manifest: bool=False) -> list:
+        """
+        Shard files into data packets, signed together by the signing pool.
+
+        :param files: list of (str, NonStrictName). Local FS paths and names used to store files at repo.
+        :param manifest: bool. If true, segments are signed with SHA-256 digests, and each file\
+            gets a manifest whose root is signed with the default key.
+        :return: list of FormalName. Names of the files prepared. Missing and empty files are skipped.
+        """
+        sizes = []
+        for file_path, name_at_repo in files:
+            if not os.path.exists(file_path):
+                self.logger.error(f'file {file_path} does not exist')
+                continue
+            file_size = os.path.getsize(file_path)
+            if file_size == 0:
+                self.logger.warning(f'File {file_path} is empty')
+                continue
+            sizes.append((file_path, Name.normalize(name_at_repo), file_size))
+        if not sizes:
+            return []
 
-        self.encoded_packets[Name.to_str(name_at_repo)] = []
+        # the files are shared with the signing processes, instead of pickling segments to them
+        shm = shared_memory.SharedMemory(create=True, size=sum(file_size for _, _, file_size in sizes))
+        try:
+            prepared = []
+            offset = 0
+            for file_path, name, file_size in sizes:
+                read = 0
+                with open(file_path, 'rb') as binary_file:
+                    while read < file_size:
+                        ret = binary_file.readinto(shm.buf[offset + read : offset + file_size])
+                        if not ret:
+                            break
+                        read += ret
+                if read > 0:
+                    prepared.append((name, offset, read))
+                offset += file_size
 
-        with multiprocessing.Pool(processes=cpu_count) as p:
-            self.encoded_packets[Name.to_str(name_at_repo)] = p.starmap(_create_packets, packet_params)
-        self.logger.info("Prepared {} data for {}".format(seg_cnt, Name.to_str(name_at_repo)))
+            # use multiple processes to speed up creating TLV, with several segments per task,
+            # and several small files per task
+            seg_cnts = [(file_size + segment_size - 1) // segment_size for _, _, file_size in prepared]
+            batch = max(1, min(MAX_SEGMENTS_PER_TASK, -(-sum(seg_cnts) // (cpu_count * 4))))
+            tasks = [[]]
+            task_size = 0
+            for (name, offset, file_size), seg_cnt in zip(prepared, seg_cnts):
+                name_bytes = bytes(Name.to_bytes(name))
+                start = 0
+                while start < seg_cnt:
+                    end = min(start + batch - task_size, seg_cnt)
+                    tasks[-1].append((name_bytes, offset, file_size, start, end))
+                    task_size += end - start
+                    start = end
+                    if task_size == batch:
+                        tasks.append([])
+                        task_size = 0
+            task_params = [(shm.name, segment_size, freshness_period, ranges, manifest)
+                           for ranges in tasks if ranges]
+            results = self._get_pool(cpu_count).starmap(_create_packets, task_params)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        packets = (packet for result in results for packet in result)
+        roots = []
+        for (name, _, _), seg_cnt in zip(prepared, seg_cnts):
+            self.encoded_packets[Name.to_str(name)] = list(itertools.islice(packets, seg_cnt))
+            self.logger.info("Prepared {} data for {}".format(seg_cnt, Name.to_str(name)))
+            if manifest:
+                full_names = [full_name(packet, name + [Component.from_segment(seq)])
+                              for seq, packet in enumerate(self.encoded_packets[Name.to_str(name)])]
+                root_name, root_content, leaves = make_manifest(name, full_names, freshness_period)
+                # leaves are served as segments under the name of the root
+                self.encoded_packets[Name.to_str(root_name)] = leaves
+                roots.append((bytes(Name.to_bytes(root_name)), root_content))
+        if roots:
+            # only the roots of the manifests are signed with the key, by the signing pool
+            packets = self._get_pool(cpu_count).apply(_sign_packets, (freshness_period, roots))
+            for (root_name, _), packet in zip(roots, packets):
+                self.manifests[Name.to_str(Name.from_bytes(root_name))] = packet
+        return [name for name, _, _ in prepared]
 
     def _on_interest(self, int_name, _int_param, _app_param):
         # use segment number to index into the encoded packets array
         self.logger.info(f'On interest: {Name.to_str(int_name)}')
-        seq = Component.to_number(int_name[-1])
+        # the requester checks the implicit digest of full names
+        if Component.get_type(int_name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+            int_name = int_name[:-1]
+        root = self.manifests.get(Name.to_str(int_name))
+        if root is not None:
+            self.app.put_raw_packet(root)
+            self.logger.info(f'Serve manifest: {Name.to_str(int_name)}')
+            return
+        seq = -1
+        if Component.get_type(int_name[-1]) == Component.TYPE_SEGMENT:
+            seq = Component.to_number(int_name[-1])
         name_wo_seq = Name.to_str(int_name[:-1])
         if name_wo_seq in self.encoded_packets and 0 <= seq < len(self.encoded_packets[name_wo_seq]):
             encoded_packets = self.encoded_packets[name_wo_seq]
@@ -117,7 +256,7 @@ class PutfileClient(object):
                           freshness_period: int, cpu_count: int,
                           forwarding_hint: Optional[NonStrictName]=None,
                           register_prefix: Optional[NonStrictName]=None,
-                          check_prefix: Optional[NonStrictName]=None) -> int:
+                          check_prefix: Optional[NonStrictName]=None, manifest: bool=False) -> int:
         """
         Insert a file to remote repo.
 
@@ -134,42 +273,89 @@ class PutfileClient(object):
             of using a predefined prefix, to make sure the subscriber can register this prefix\
             under the NDN prefix registration security model. If not specified, default value is\
             the client prefix.
-        :return: Number of packets inserted.
+        :param manifest: bool. If true, segments are only signed with SHA-256 digests, and the file\
+            is covered by a manifest signed with the key. This signs once per file instead of once per\
+            segment. The repo fetches the manifest, then all segments in parallel, and stores both.
+        :return: Number of packets inserted, including those of the manifest.
         """
-        self._prepare_data(file_path, name_at_repo, segment_size, freshness_period, cpu_count)
-        num_packets = len(self.encoded_packets[Name.to_str(name_at_repo)])
-        if num_packets == 0:
+        return await self.insert_files([(file_path, name_at_repo)], segment_size, freshness_period, cpu_count,
+                                       forwarding_hint, register_prefix, check_prefix, manifest)
+
+    async def insert_files(self, files: list, segment_size: int, freshness_period: int, cpu_count: int,
+                           forwarding_hint: Optional[NonStrictName]=None,
+                           register_prefix: Optional[NonStrictName]=None,
+                           check_prefix: Optional[NonStrictName]=None, manifest: bool=False) -> int:
+        """
+        Insert files to remote repo with one command. The files are signed together, and the\
+            repo reports the progress of all of them at once.
+
+        :param files: list of (str, NonStrictName). Local FS paths of the files to insert, and\
+            names used to store them at repo.
+        :param segment_size: Max size of data packets.
+        :param freshness_period: Freshness of data packets.
+        :param cpu_count: Cores used for converting files to TLV format.
+        :param forwarding_hint: NonStrictName. The forwarding hint the repo uses when fetching data.
+        :param register_prefix: NonStrictName. If repo is configured with ``register_root=False``,\
+            it registers ``register_prefix`` after receiving the insertion command.
+        :param check_prefix: NonStrictName. The prefix of process check messages, as in\
+            ``insert_file()``.
+        :param manifest: bool. If true, each file is covered by a manifest, as in ``insert_file()``.
+        :return: Number of packets inserted, for all files.
+        """
+        names = self._prepare_files(files, segment_size, freshness_period, cpu_count, manifest)
+        if not names:
             return 0
 
-        # If the uploaded file has the client's name as prefix, set an interest filter
+        # If the uploaded files have the client's name as prefix, set interest filters
         # for handling corresponding Interests from the repo
-        if Name.is_prefix(self.prefix, name_at_repo):
-            self.app.set_interest_filter(name_at_repo, self._on_interest)
-        else:
-            # Otherwise, register the file name as prefix for responding interests from the repo
-            self.logger.info(f'Register prefix for file upload: {Name.to_str(name_at_repo)}')
-            await self.app.register(name_at_repo, self._on_interest)
+        remote_names = []
+        for name in names:
+            if Name.is_prefix(self.prefix, name):
+                self.app.set_interest_filter(name, self._on_interest)
+            else:
+                remote_names.append(name)
+        # Otherwise, register the longest common prefix of the files for responding interests
+        # from the repo, or each file name if they have no common prefix
+        if remote_names:
+            common_prefix = remote_names[0]
+            for name in remote_names[1:]:
+                while not Name.is_prefix(common_prefix, name):
+                    common_prefix = common_prefix[:-1]
+            for prefix in ([common_prefix] if common_prefix else remote_names):
+                self.logger.info(f'Register prefix for file upload: {Name.to_str(prefix)}')
+                await self.app.register(prefix, self._on_interest)
 
         # construct insert cmd msg
         cmd_param = RepoCommandParam()
-        cmd_obj = ObjParam()
-        cmd_param.objs = [cmd_obj]
-        cmd_obj.name = name_at_repo
-        if forwarding_hint is not None:
-            cmd_obj.forwarding_hint = Links()
-            cmd_obj.forwarding_hint.names = [forwarding_hint]
-        else:
-            cmd_obj.forwarding_hint = None
-        cmd_obj.start_block_id = 0
-        cmd_obj.end_block_id = num_packets - 1
-        cmd_obj.register_prefix = EmbName()
-        cmd_obj.register_prefix.name = register_prefix
+        cmd_param.objs = []
+        for name in names:
+            cmd_obj = ObjParam()
+            if forwarding_hint is not None:
+                cmd_obj.forwarding_hint = Links()
+                cmd_obj.forwarding_hint.names = [forwarding_hint]
+            else:
+                cmd_obj.forwarding_hint = None
+            if manifest:
+                # the repo fetches the manifest, then the packets it lists
+                cmd_obj.name = manifest_name(name)
+                cmd_obj.manifest = True
+            else:
+                cmd_obj.name = name
+                cmd_obj.start_block_id = 0
+                cmd_obj.end_block_id = len(self.encoded_packets[Name.to_str(name)]) - 1
+            cmd_obj.register_prefix = EmbName()
+            cmd_obj.register_prefix.name = register_prefix
+            cmd_param.objs.append(cmd_obj)
+        if check_prefix is None:
+            check_prefix = self.prefix
+        cmd_param.check_prefix = EmbName.from_name(check_prefix)
 
         cmd_param_bytes = bytes(cmd_param.encode())
         request_no = sha256(cmd_param_bytes).digest()
 
         # publish msg to repo's insert topic
         await self.pb.wait_for_ready()
+        self.checker.subscribe(check_prefix)
         is_success = await self.pb.publish(self.repo_name + Name.from_str('insert'), cmd_param_bytes)
         if is_success:
             self.logger.info('Published an insert msg and was acknowledged by a subscriber')
@@ -179,42 +365,52 @@ class PutfileClient(object):
         # wait until finish so that repo can finish fetching the data
         insert_num = 0
         if is_success:
-            insert_num = await self._wait_for_finish(check_prefix, request_no)
+            insert_num = await self._wait_for_finish(request_no)
         return insert_num
 
-    async def _wait_for_finish(self, check_prefix: NonStrictName, request_no: bytes) -> int:
+    async def insert_directory(self, dir_path: str, name_at_repo: NonStrictName, segment_size: int,
+                               freshness_period: int, cpu_count: int,
+                               forwarding_hint: Optional[NonStrictName]=None,
+                               register_prefix: Optional[NonStrictName]=None,
+                               check_prefix: Optional[NonStrictName]=None, manifest: bool=False) -> int:
+        """
+        Insert all files under a directory to remote repo with one command, as ``insert_files()``.\
+            A file is stored with ``name_at_repo`` followed by a component for each part of its\
+            path relative to ``dir_path``.
+
+        :param dir_path: Local FS path to the directory to insert.
+        :param name_at_repo: NonStrictName. Prefix of the names used to store files at repo.
+        :param manifest: bool. If true, each file is covered by a manifest, as in ``insert_file()``.
+        :return: Number of packets inserted, for all files.
+        """
+        prefix = Name.normalize(name_at_repo)
+        files = []
+        for root, dirs, filenames in os.walk(dir_path):
+            dirs.sort()
+            rel_path = os.path.relpath(root, dir_path)
+            parts = [] if rel_path == os.curdir else rel_path.split(os.sep)
+            for filename in sorted(filenames):
+                name = prefix + [Component.from_bytes(part.encode()) for part in parts + [filename]]
+                files.append((os.path.join(root, filename), name))
+        return await self.insert_files(files, segment_size, freshness_period, cpu_count,
+                                       forwarding_hint, register_prefix, check_prefix, manifest)
+
+    async def _wait_for_finish(self, request_no: bytes) -> int:
         """
-        Wait until process `process_id` completes by sending check interests.
+        Wait until process `process_id` completes, as notified by the repo.
 
-        :param check_prefix: NonStrictName. The prefix under which the check message will be\
-            published.
         :param request_no: bytes. The request number to check.
         :return: int number of inserted packets.
         """
-        # fixme: why is check_prefix not used?
-        checker = CommandChecker(self.app)
-        n_retries = 5
-        while n_retries > 0:
-            response = await checker.check_insert(self.repo_name, request_no)
-            if response is None:
-                self.logger.info(f'No response')
-                n_retries -= 1
-                await aio.sleep(1)
-            # might receive 404 if repo has not yet processed insert command msg
-            elif response.status_code == RepoStatCode.NOT_FOUND:
-                n_retries -= 1
-                await aio.sleep(1)
-            elif response.status_code == RepoStatCode.IN_PROGRESS:
-                self.logger.info(f'Insertion {request_no} in progress')
-                await aio.sleep(1)
-            elif response.status_code == RepoStatCode.COMPLETED:
-                insert_num = 0
-                for obj in response.objs:
-                    insert_num += obj.insert_num
-                self.logger.info(f'Deletion request {request_no} complete, insert_num: {insert_num}')
-                return insert_num
-            elif response.status_code == RepoStatCode.FAILED:
-                self.logger.info(f'Deletion request {request_no} failed')
-            else:
-                # Shouldn't get here
-                self.logger.error(f'Received unrecognized status code {response.status_code}')
+        response = await self.checker.wait_for_finish('insert', self.repo_name, request_no)
+        if response is None:
+            self.logger.info(f'No response')
+            return 0
+        insert_num = 0
+        for obj in response.objs:
+            insert_num += obj.insert_num or 0
+        if response.status_code == RepoStatCode.COMPLETED:
+            self.logger.info(f'Insertion request {request_no.hex()} complete, insert_num: {insert_num}')
+        else:
+            self.logger.info(f'Insertion request {request_no.hex()} failed, insert_num: {insert_num}')
+        return insert_num
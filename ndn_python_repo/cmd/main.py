@@ -1,9 +1,14 @@
 import argparse
 import logging
-import importlib.metadata
 import sys
 from ndn.app import NDNApp
-from ndn_python_repo import *
+from ndn_python_repo import Repo
+from ndn_python_repo.config import get_yaml
+from ndn_python_repo.handle import ReadHandle, WriteCommandHandle, DeleteCommandHandle, SyncCommandHandle, \
+    TcpBulkInsertHandle
+from ndn_python_repo.storage import create_storage
+from ndn_python_repo.utils import DataValidator, FetchScheduler, MetricsServer, PROFILER, Profiler, PubSub, \
+    config_request_logging
 
 
 def process_cmd_opts():
@@ -11,6 +16,7 @@ def process_cmd_opts():
     Parse, process, and return cmd options.
     """
     def print_version():
+        import importlib.metadata
         pkg_name = 'ndn-python-repo'
         # version = pkg_resources.require(pkg_name)[0].version
         version = importlib.metadata.version(pkg_name)
@@ -25,6 +31,16 @@ def process_cmd_opts():
         parser.add_argument('-r', '--repo_name',
                             help="""repo's routable prefix. If this option is specified, it 
                                     overrides the prefix in the config file""")
+        parser.add_argument('--profile', action='store_true',
+                            help="""profile from startup. Profiling can also be toggled at runtime
+                                    by sending SIGUSR1, and a report is written when it stops""")
+        parser.add_argument('--profile-dir', default='.',
+                            help='directory where profiling reports are written')
+        parser.add_argument('--profile-mode', choices=Profiler.MODES, default='cprofile',
+                            help="""cprofile traces every call, sample periodically samples the
+                                    stack of the event loop at a much lower cost""")
+        parser.add_argument('--stall-threshold', type=float, default=0.1,
+                            help='seconds the event loop can be held before a stall is reported')
         args = parser.parse_args()
         return args
 
@@ -73,16 +89,29 @@ def config_logging(config: dict):
                             # datefmt='%Y-%m-%d %H:%M:%S',
                             level=log_level)
 
+    # per-packet events, sampled and only formatted when emitted
+    return config_request_logging(config.get('requests') or {})
+
+
+async def async_main(app: NDNApp, config, profile: bool=False):
+    PROFILER.install_signal_handler()
+    if profile:
+        PROFILER.start()
 
-async def async_main(app: NDNApp, config):
     storage = create_storage(config['db_config'])
 
     pb = PubSub(app)
     read_handle = ReadHandle(app, storage, config)
-    write_handle = WriteCommandHandle(app, storage, pb, read_handle, config)
-    sync_handle = SyncCommandHandle(app, storage, pb, read_handle, config)
+    scheduler = FetchScheduler.from_config(config['repo_config'])
+    validator = DataValidator.from_config(app, config)
+    write_handle = WriteCommandHandle(app, storage, pb, read_handle, config, scheduler, validator)
+    sync_handle = SyncCommandHandle(app, storage, pb, read_handle, config, scheduler, validator)
     delete_handle = DeleteCommandHandle(app, storage, pb, read_handle, config)
-    tcp_bulk_insert_handle = TcpBulkInsertHandle(storage, read_handle, config)
+    tcp_bulk_insert_handle = TcpBulkInsertHandle(storage, read_handle, config, validator)
+
+    metrics_server = MetricsServer.from_config(config)
+    if metrics_server:
+        await metrics_server.start()
 
     repo = Repo(app, storage, read_handle, write_handle, delete_handle, sync_handle, tcp_bulk_insert_handle, config)
     await repo.listen()
@@ -93,13 +122,19 @@ def main() -> int:
     config = process_config(cmdline_args)
     print(config)
 
-    config_logging(config['logging_config'])
+    access_log_listener = config_logging(config['logging_config'])
+
+    PROFILER.configure(cmdline_args.profile_dir, cmdline_args.profile_mode, cmdline_args.stall_threshold)
 
     app = NDNApp()
     try:
-        app.run_forever(after_start=async_main(app, config))
+        app.run_forever(after_start=async_main(app, config, cmdline_args.profile))
     except FileNotFoundError:
         print('Error: could not connect to NFD.')
+    finally:
+        PROFILER.stop()
+        if access_log_listener:
+            access_log_listener.stop()
     return 0
 
 
@@ -33,6 +33,7 @@ class RepoTypeNumber:
     FORWARDING_HINT = 211
     REGISTER_PREFIX = 212
     CHECK_PREFIX = 213
+    MANIFEST = 214
     OBJECT_PARAM = 301
     OBJECT_RESULT = 302
     SYNC_PARAM = 401
@@ -77,6 +78,8 @@ class ObjParam(enc.TlvModel):
     start_block_id = enc.UintField(RepoTypeNumber.START_BLOCK_ID)
     end_block_id = enc.UintField(RepoTypeNumber.END_BLOCK_ID)
     register_prefix = enc.ModelField(RepoTypeNumber.REGISTER_PREFIX, EmbName)
+    # the name is the root of a manifest, listing the packets of the object
+    manifest = enc.BoolField(RepoTypeNumber.MANIFEST)
 
 
 class SyncParam(enc.TlvModel):
@@ -93,10 +96,14 @@ class RepoCommandParam(enc.TlvModel):
     sync_groups = enc.RepeatedField(
         enc.ModelField(RepoTypeNumber.SYNC_PARAM, SyncParam)
     )
+    # the repo publishes the final status of the command to <check_prefix>/check
+    check_prefix = enc.ModelField(RepoTypeNumber.CHECK_PREFIX, EmbName)
 
 
 class RepoStatQuery(enc.TlvModel):
     request_no = enc.BytesField(RepoTypeNumber.REQUEST_NO)
+    # if set, the repo replies once the status of the process is no longer this one
+    wait_status = enc.UintField(RepoTypeNumber.STATUS_CODE)
 
 
 class ObjStatus(enc.TlvModel):
@@ -112,6 +119,7 @@ class SyncStatus(enc.TlvModel):
 
 
 class RepoCommandRes(enc.TlvModel):
+    request_no = enc.BytesField(RepoTypeNumber.REQUEST_NO)
     status_code = enc.UintField(RepoTypeNumber.STATUS_CODE)
     objs = enc.RepeatedField(enc.ModelField(RepoTypeNumber.OBJECT_RESULT, ObjStatus))
     sync_groups = enc.RepeatedField(
@@ -1,6 +1,12 @@
-from .read_handle import ReadHandle
-from .command_handle_base import CommandHandle
-from .write_command_handle import WriteCommandHandle
-from .delete_command_handle import DeleteCommandHandle
-from .sync_command_handle import SyncCommandHandle
-from .tcp_bulk_insert_handle import TcpBulkInsertHandle
\ No newline at end of file
+from ..utils.lazy import lazy_exports
+
+_EXPORTS = {
+    'ReadHandle': '.read_handle',
+    'CommandHandle': '.command_handle_base',
+    'WriteCommandHandle': '.write_command_handle',
+    'DeleteCommandHandle': '.delete_command_handle',
+    'SyncCommandHandle': '.sync_command_handle',
+    'TcpBulkInsertHandle': '.tcp_bulk_insert_handle',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
@@ -4,8 +4,9 @@ import json
 from ndn.app import NDNApp
 from ndn.encoding import Name, NonStrictName, FormalName, Component
 from ndn.encoding.tlv_model import DecodeError
+from typing import Optional
 
-from ..command import RepoStatQuery, RepoCommandRes, RepoStatCode, RepeatedNames, RepoCommandParam
+from ..command import RepoStatQuery, RepoCommandRes, RepoStatCode, RepeatedNames, RepoCommandParam, EmbName
 from ..storage import Storage
 from ..utils import PubSub
 
@@ -20,16 +21,19 @@ class CommandHandle(object):
         self.storage = storage
         self.pb = pb
         self.m_processes = dict()
+        # set when the status of a process changes, for check interests waiting for it
+        self.m_status_changed = dict()
         self.logger = logging.getLogger(__name__)
 
     async def listen(self, prefix: Name):
         raise NotImplementedError
 
-    def _on_check_interest(self, int_name, _int_param, app_param):
+    def _on_check_interest(self, int_name, int_param, app_param):
         self.logger.info('on_check_interest(): {}'.format(Name.to_str(int_name)))
 
         response = None
         request_no = None
+        parameter = None
         try:
             if not app_param:
                 raise DecodeError('Missing Parameters')
@@ -37,6 +41,7 @@ class CommandHandle(object):
             request_no = parameter.request_no
             if request_no is None:
                 raise DecodeError('Missing Request No.')
+            request_no = bytes(request_no)
         except (DecodeError, IndexError, RuntimeError) as exc:
             response = RepoCommandRes()
             response.status_code = RepoStatCode.MALFORMED
@@ -48,14 +53,45 @@ class CommandHandle(object):
             self.logger.warning(f'Process does not exist for id={request_no}')
 
         if response is None:
-            self.reply_with_response(int_name, self.m_processes[request_no])
+            if parameter.wait_status is not None and \
+                    self.m_processes[request_no].status_code == parameter.wait_status:
+                # long poll: reply once the status changes, or before the interest expires
+                timeout = (int_param.lifetime or 4000) / 2000
+                aio.create_task(self._reply_on_status_change(int_name, request_no, timeout))
+            else:
+                self.reply_with_response(int_name, self.m_processes[request_no])
         else:
             self.reply_with_response(int_name, response)
 
-    def reply_with_response(self, int_name, response: RepoCommandRes):
+    async def _reply_on_status_change(self, int_name, request_no: bytes, timeout: float):
+        event = self.m_status_changed.setdefault(request_no, aio.Event())
+        try:
+            await aio.wait_for(event.wait(), timeout)
+        except aio.TimeoutError:
+            pass
+        if request_no in self.m_processes:
+            # not cached, so a later check interest of the same name waits again
+            self.reply_with_response(int_name, self.m_processes[request_no], freshness_period=0)
+
+    def report_status(self, request_no: bytes, check_prefix: Optional[EmbName] = None):
+        """
+        Notify the clients that the status of a process changed. Waiting check interests are\
+            answered, and the status is published to ``<check_prefix>/check`` if given.
+
+        :param request_no: bytes. The request id of the process.
+        :param check_prefix: Optional[EmbName]. The check prefix of the command.
+        """
+        event = self.m_status_changed.pop(request_no, None)
+        if event is not None:
+            event.set()
+        if check_prefix is not None and check_prefix.name:
+            topic = Name.normalize(check_prefix.name) + Name.from_str('check')
+            aio.create_task(self.pb.publish(topic, bytes(self.m_processes[request_no].encode())))
+
+    def reply_with_response(self, int_name, response: RepoCommandRes, freshness_period: int = 1000):
         self.logger.info(f'Reply to command: {Name.to_str(int_name)} w/ code={response.status_code}')
         response_bytes = response.encode()
-        self.app.put_data(int_name, response_bytes, freshness_period=1000)
+        self.app.put_data(int_name, response_bytes, freshness_period=freshness_period)
 
     async def _delete_process_state_after(self, process_id: bytes, delay: int):
         """
@@ -213,4 +249,61 @@ class CommandHandle(object):
         ret = CommandHandle.remove_name_from_set_in_storage('sync_groups', storage, sync_group)
         if ret:
             logging.info(f'Removed existing sync_group from storage: {Name.to_str(sync_group)}')
-        return ret
\ No newline at end of file
+        return ret
+
+    # Wrapper for insertion jobs in progress
+    # The command and the progress of each object are stored under separate keys, so that saving
+    # the progress rewrites only the objects that changed
+    @staticmethod
+    def _insert_job_key(request_no: bytes, index: Optional[int] = None) -> bytes:
+        store_key = [Component.from_str('insert_jobs'), Component.from_bytes(request_no)]
+        if index is not None:
+            store_key.append(Component.from_number(index, Component.TYPE_SEGMENT))
+        return Name.to_str(store_key).encode('utf-8')
+
+    @staticmethod
+    def add_insert_job_in_storage(storage: Storage, request_no: bytes, job: dict):
+        store_key = [Component.from_str('insert_jobs'), Component.from_bytes(request_no)]
+        ret = CommandHandle.add_name_to_set_in_storage('insert_jobs', storage, store_key[1:])
+        head = {'cmd': job['cmd'], 'n_objs': len(job['objs'])}
+        keys = [CommandHandle._insert_job_key(request_no)]
+        values = [json.dumps(head).encode('utf-8')]
+        for i, progress in enumerate(job['objs']):
+            keys.append(CommandHandle._insert_job_key(request_no, i))
+            values.append(json.dumps(progress).encode('utf-8'))
+        storage._put_batch(keys, values, [None] * len(keys))
+        return ret
+
+    @staticmethod
+    def update_insert_job_in_storage(storage: Storage, request_no: bytes, objs: dict[int, dict]):
+        """
+        Save the progress of some objects of an insertion job, in one batch.
+
+        :param objs: dict[int, dict]. Map from the index of an object in the command to its progress.
+        """
+        keys = [CommandHandle._insert_job_key(request_no, i) for i in objs]
+        values = [json.dumps(progress).encode('utf-8') for progress in objs.values()]
+        storage._put_batch(keys, values, [None] * len(keys))
+
+    @staticmethod
+    def get_insert_jobs_in_storage(storage: Storage) -> dict[bytes, dict]:
+        ret = {}
+        for job_name in CommandHandle.get_name_from_set_in_storage('insert_jobs', storage):
+            request_no = bytes(Component.get_value(job_name[0]))
+            job = json.loads(storage._get(CommandHandle._insert_job_key(request_no)).decode('utf-8'))
+            job['objs'] = [json.loads(storage._get(CommandHandle._insert_job_key(request_no, i)).decode('utf-8'))
+                           for i in range(job.pop('n_objs'))]
+            ret[request_no] = job
+        return ret
+
+    @staticmethod
+    def remove_insert_job_in_storage(storage: Storage, request_no: bytes):
+        store_key = [Component.from_str('insert_jobs'), Component.from_bytes(request_no)]
+        CommandHandle.remove_name_from_set_in_storage('insert_jobs', storage, store_key[1:])
+        head_key = CommandHandle._insert_job_key(request_no)
+        head = storage._get(head_key)
+        if head is None:
+            return False
+        n_objs = json.loads(head.decode('utf-8'))['n_objs']
+        keys = [head_key] + [CommandHandle._insert_job_key(request_no, i) for i in range(n_objs)]
+        return storage._remove_batch(keys) > 0
@@ -70,6 +70,7 @@ class DeleteCommandHandle(CommandHandle):
 
         # Note: stat is hold by reference
         stat = RepoCommandRes()
+        stat.request_no = request_no
         stat.status_code = RepoStatCode.IN_PROGRESS
         stat.objs = [_init_obj_stat(obj) for obj in objs]
         self.m_processes[request_no] = stat
@@ -128,6 +129,7 @@ class DeleteCommandHandle(CommandHandle):
             stat.status_code = RepoStatCode.COMPLETED
         else:
             stat.status_code = RepoStatCode.FAILED
+        self.report_status(request_no, cmd_param.check_prefix)
 
         # Remove process state after some time
         await self._delete_process_state_after(request_no, 60)
@@ -1,8 +1,14 @@
-import asyncio as aio
 import logging
 from ndn.app import NDNApp
-from ndn.encoding import Name
-from ..storage import Storage
+from ndn.encoding import Name, FormalName
+from ..storage import NameKey, Storage
+from ..utils import PrefixRegistrar, REGISTRY, RequestLog, timed_callback
+
+
+INTERESTS = REGISTRY.counter('repo_interests_total', 'Interests received by the read handle', ['result'])
+_SERVED = INTERESTS.labels('served')
+_MISSED = INTERESTS.labels('missed')
+SERVED_BYTES = REGISTRY.counter('repo_served_bytes_total', 'Bytes of Data packets served')
 
 
 class ReadHandle(object):
@@ -18,33 +24,78 @@ class ReadHandle(object):
         self.app = app
         self.storage = storage
         self.register_root = config['repo_config']['register_root']
+        # prefixes longer than this are registered by their first components, 0 to register them as is
+        self.aggregate_depth = config['repo_config'].get('register_aggregate_depth', 0)
+        self.registrar = PrefixRegistrar.from_config(app, config['repo_config'])
+        # registered prefix -> number of prefixes listened to under it
+        self.routes = {}
         self.logger = logging.getLogger(__name__)
+        self.request_log = RequestLog.get('read')
         if self.register_root:
-            self.listen(Name.from_str('/'))
+            self.app.route(Name.from_str('/'), need_raw_packet=True)(self._on_interest)
+
+    def route_of(self, prefix) -> FormalName:
+        """
+        :param prefix: NonStrictName.
+        :return: FormalName. The prefix registered to listen to ``prefix``.
+        """
+        prefix = Name.normalize(prefix)
+        if 0 < self.aggregate_depth < len(prefix):
+            return prefix[:self.aggregate_depth]
+        return prefix
 
     def listen(self, prefix):
         """
         This function needs to be called for prefix of all data stored.
+        The prefix is registered in the background, and only once for all prefixes under the\
+            same aggregated prefix.
         :param prefix: NonStrictName.
         """
-        self.app.route(prefix)(self._on_interest)
-        self.logger.info(f'Read handle: listening to {Name.to_str(prefix)}')
-    
+        route = self.route_of(prefix)
+        key = bytes(Name.to_bytes(route))
+        self.routes[key] = self.routes.get(key, 0) + 1
+        if self.routes[key] > 1:
+            self.logger.debug(f'Read handle: {Name.to_str(prefix)} is covered by {Name.to_str(route)}')
+            return
+        self.app.set_interest_filter(route, self._on_interest, need_raw_packet=True)
+        self.registrar.register(route)
+        # the registrar only sends the command once, so the route is also kept where NDNApp keeps
+        # the routes of app.route, which it registers again with their Interest filters on reconnection
+        self.app._autoreg_routes.append((route, self._on_interest, None, True, False))
+        self.logger.info(f'Read handle: listening to {Name.to_str(route)}')
+
     def unlisten(self, prefix):
         """
+        The aggregated prefix is unregistered once no prefix under it is listened to.
         :param prefix: NonStrictName.
         """
-        aio.ensure_future(self.app.unregister(prefix))
-        self.logger.info(f'Read handle: stop listening to {Name.to_str(prefix)}')
+        route = self.route_of(prefix)
+        key = bytes(Name.to_bytes(route))
+        if key not in self.routes:
+            return
+        self.routes[key] -= 1
+        if self.routes[key] > 0:
+            return
+        del self.routes[key]
+        self.app._autoreg_routes = [entry for entry in self.app._autoreg_routes
+                                    if entry[0] != route or entry[1] != self._on_interest]
+        self.app.unset_interest_filter(route)
+        self.registrar.unregister(route)
+        self.logger.info(f'Read handle: stop listening to {Name.to_str(route)}')
 
-    def _on_interest(self, int_name, int_param, _app_param):
+    @timed_callback('ReadHandle._on_interest')
+    def _on_interest(self, int_name, int_param, _app_param, raw_packet):
         """
         Repo responds to Interests with mustBeFresh flag, following the same logic as the Content Store in NFD
         """
-        logging.debug(f'Repo got Interest with{"out" if not int_param.must_be_fresh else ""} '
-                      f'MustBeFresh flag set for name {Name.to_str(int_name)}')
-        data_bytes = self.storage.get_data_packet(int_name, int_param.can_be_prefix, int_param.must_be_fresh)
+        # the storage key is sliced from the Interest as is, instead of encoding int_name again
+        key = NameKey.from_packet(raw_packet)
+        data_bytes = self.storage.get_data_packet(key, int_param.can_be_prefix, int_param.must_be_fresh)
         if data_bytes is None:
+            _MISSED.inc()
+            self.request_log('miss', key, must_be_fresh=bool(int_param.must_be_fresh))
             return
         self.app.put_raw_packet(data_bytes)
-        self.logger.info(f'Read handle: serve data {Name.to_str(int_name)}')
+        _SERVED.inc()
+        SERVED_BYTES.inc(len(data_bytes))
+        self.request_log('serve', key, size=len(data_bytes))
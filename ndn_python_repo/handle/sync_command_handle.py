@@ -1,9 +1,11 @@
 import asyncio as aio
 import logging
+from contextlib import aclosing
 from hashlib import sha256
 
 from ndn.app import NDNApp
 from ndn.encoding import Component, DecodeError, Name, NonStrictName, parse_data
+from typing import Optional
 
 from ..command import (
     RepoCommandParam,
@@ -12,16 +14,19 @@ from ..command import (
     SyncParam,
     SyncStatus,
 )
-from ..storage import Storage
-from ..utils import concurrent_fetcher, IdNamingConv, PassiveSvs, PubSub
+from ..storage import BatchWriter, Storage
+from ..utils import concurrent_fetcher, DataValidator, FetchScheduler, IdNamingConv, PassiveSvs, PubSub, REGISTRY
 from . import CommandHandle, ReadHandle
 
 
+SYNC_LAG = REGISTRY.gauge('repo_sync_lag_publications',
+                          'Publications known from the state vector but not fetched yet', ['group'])
+
+
 class SyncCommandHandle(CommandHandle):
     """
     SyncCommandHandle processes insert command interests, and fetches corresponding data to
     store them into the database.
-    TODO: Add validator
     """
 
     def __init__(
@@ -31,6 +36,8 @@ class SyncCommandHandle(CommandHandle):
         pb: PubSub,
         read_handle: ReadHandle,
         config: dict,
+        scheduler: Optional[FetchScheduler] = None,
+        validator: Optional[DataValidator] = None,
     ):
         """
         Sync handle need to keep a reference to sync handle to register new prefixes.
@@ -39,16 +46,25 @@ class SyncCommandHandle(CommandHandle):
         :param storage: Storage.
         :param read_handle: ReadHandle. This param is necessary, because WriteCommandHandle need to
             call ReadHandle.listen() to register new prefixes.
+        :param scheduler: Optional[FetchScheduler]. The repo-wide fetch scheduler, shared with other
+            handles. If not given, the handle creates its own.
+        :param validator: Optional[DataValidator]. If given, the signatures of fetched publications\
+            are verified before they are stored. Invalid publications are skipped.
         """
         super(SyncCommandHandle, self).__init__(app, storage, pb, config)
         self.m_read_handle = read_handle
         self.prefix = None
         self.register_root = config["repo_config"]["register_root"]
+        self.scheduler = scheduler or FetchScheduler.from_config(config["repo_config"])
+        self.validator = validator
         # sync specific states
         self.states_on_disk = {}
         # runtime states
         self.running_svs = {}
         self.running_fetcher = {}
+        # groups stored but not resumed yet, which are resumed first when a command refers to them
+        self.unrecovered_groups = set()
+        SYNC_LAG.set_function(self._sync_lag)
 
     async def listen(self, prefix: NonStrictName):
         """
@@ -66,16 +82,36 @@ class SyncCommandHandle(CommandHandle):
         self.pb.subscribe(self.prefix + Name.from_str("sync/leave"), self._on_leave_msg)
 
     def recover_from_states(self, states: dict):
-        self.states_on_disk = states
         # recover sync
-        for sync_group, group_states in self.states_on_disk.items():
-            new_svs = PassiveSvs(sync_group, lambda svs: self.fetch_missing_data(svs))
-            new_svs.decode_from_states(group_states["svs_client_states"])
-            logging.info(f"Recover sync for {Name.to_str(sync_group)}")
-            group_fetched_dict = group_states["fetched_dict"]
-            logging.info(f"Sync progress: {group_fetched_dict}")
-            new_svs.start(self.app)
-            self.running_svs[Name.to_str(sync_group)] = new_svs
+        for sync_group, group_states in states.items():
+            self.recover_group(sync_group, group_states)
+
+    def recover_group(self, sync_group: str, group_states: Optional[dict] = None):
+        """
+        Resume a sync group that was joined before the repo restarted. Does nothing if the group\
+            is already running.
+
+        :param sync_group: str. The sync prefix of the group.
+        :param group_states: Optional[dict]. The states of the group, read from the storage if not\
+            given.
+        """
+        self.unrecovered_groups.discard(sync_group)
+        if sync_group in self.states_on_disk:
+            return
+        if group_states is None:
+            try:
+                group_states = self.get_sync_states_in_storage(self.storage, Name.from_str(sync_group))
+            except (AttributeError, ValueError) as exc:
+                logging.warning(f"Cannot recover sync for {sync_group}: {exc}")
+                return
+        self.states_on_disk[sync_group] = group_states
+        new_svs = PassiveSvs(sync_group, lambda svs: self.fetch_missing_data(svs))
+        new_svs.decode_from_states(group_states["svs_client_states"])
+        logging.info(f"Recover sync for {sync_group}")
+        group_fetched_dict = group_states["fetched_dict"]
+        logging.info(f"Sync progress: {group_fetched_dict}")
+        new_svs.start(self.app)
+        self.running_svs[sync_group] = new_svs
 
     def _on_sync_msg(self, msg):
         try:
@@ -139,6 +175,8 @@ class SyncCommandHandle(CommandHandle):
         for idx, group in enumerate(groups):
             # check duplicate
             sync_prefix = Name.to_str(group.sync_prefix.name)
+            if sync_prefix in self.unrecovered_groups:
+                self.recover_group(sync_prefix)
             if sync_prefix in self.states_on_disk:
                 # if asking for reset
                 if group.reset:
@@ -198,6 +236,8 @@ class SyncCommandHandle(CommandHandle):
 
         for idx, group in enumerate(groups):
             sync_prefix = Name.to_str(group.sync_prefix.name)
+            if sync_prefix in self.unrecovered_groups:
+                self.recover_group(sync_prefix)
             if sync_prefix in self.states_on_disk:
                 states = self.states_on_disk[sync_prefix]
                 logging.info(f"Leaving sync for: {sync_prefix}")
@@ -229,6 +269,17 @@ class SyncCommandHandle(CommandHandle):
             else:
                 logging.info(f"Leaving sync group that does not exist: {sync_prefix}")
 
+    def _sync_lag(self) -> list:
+        ret = []
+        for group, svs in self.running_svs.items():
+            group_states = self.states_on_disk.get(group)
+            if group_states is None:
+                continue
+            fetched_dict = group_states["fetched_dict"]
+            lag = sum(max(0, seq - fetched_dict.get(node_id, 0)) for node_id, seq in svs.local_sv.items())
+            ret.append(((group, ), lag))
+        return ret
+
     def fetch_missing_data(self, svs: PassiveSvs):
         if not svs.running:
             return
@@ -250,44 +301,61 @@ class SyncCommandHandle(CommandHandle):
             data_prefix = [i for n, i in enumerate(node_name) if i not in node_name[:n]]
         else:
             data_prefix = node_name
+        # the progress is saved once the publications are committed to the storage
+        def _on_flush(seqs: list[int]):
+            group_fetched_dict[node_id] = seqs[-1]
+            logging.info(f"Sync progress: {group_fetched_dict}")
+            group_states["svs_client_states"] = svs.encode_into_states()
+            CommandHandle.add_sync_states_in_storage(
+                self.storage, svs.base_prefix, group_states
+            )
+
         # I do not treat fetching failure as hard failure
         if fetched_seq < seq:
-            async for data_name, _, data_content, data_bytes in concurrent_fetcher(
-                self.app,
-                data_prefix,
-                start_id=fetched_seq + 1,
-                end_id=seq,
-                semaphore=aio.Semaphore(10),
-                name_conv=IdNamingConv.SEQUENCE,
-            ):
-                # put into storage asap
-                self.storage.put_data_packet(data_name, data_bytes)
-                # not very sure the side effect
-                group_fetched_dict[node_id] = Component.to_number(data_name[-1])
-                logging.info(f"Sync progress: {group_fetched_dict}")
-                group_states["svs_client_states"] = svs.encode_into_states()
-                CommandHandle.add_sync_states_in_storage(
-                    self.storage, svs.base_prefix, group_states
-                )
-                """
-                Python-repo specific logic: if the inner data content contains a data name,
-                assuming the data object pointed by is segmented, and fetching all
-                data segments related to this object name
-                """
-                try:
-                    _, _, inner_data_content, _ = parse_data(data_content)
-                    obj_pointer = Name.from_bytes(inner_data_content)
-                except (TypeError, IndexError, ValueError):
-                    logging.debug(f"Data does not include an object pointer, skip")
-                    continue
-                logging.info(
-                    f"Discovered a pointer, fetching data segments for {Name.to_str(obj_pointer)}"
-                )
-                async for loop_data_name, _, _, loop_data_bytes in concurrent_fetcher(
-                    self.app,
-                    obj_pointer,
-                    start_id=0,
-                    end_id=None,
-                    semaphore=aio.Semaphore(10),
-                ):
-                    self.storage.put_data_packet(loop_data_name, loop_data_bytes)
+            with self.scheduler.job("sync", Name.to_str(data_prefix)) as job:
+                # the fetchers are closed when returning early, so the rest is not fetched
+                async with BatchWriter(self.storage, on_flush=_on_flush, validator=self.validator) as writer, \
+                        aclosing(concurrent_fetcher(
+                            self.app,
+                            data_prefix,
+                            start_id=fetched_seq + 1,
+                            end_id=seq,
+                            semaphore=job,
+                            name_conv=IdNamingConv.SEQUENCE,
+                        )) as fetcher:
+                    async for data_name, meta_info, data_content, data_bytes in fetcher:
+                        if not writer.check_quota(data_name, len(data_bytes)):
+                            logging.warning(f"Quota exceeded, stop syncing {Name.to_str(data_prefix)}")
+                            return
+                        # put into storage asap
+                        writer.put(data_name, data_bytes, meta_info.freshness_period if meta_info else None,
+                                   Component.to_number(data_name[-1]))
+                        """
+                        Python-repo specific logic: if the inner data content contains a data name,
+                        assuming the data object pointed by is segmented, and fetching all
+                        data segments related to this object name
+                        """
+                        try:
+                            _, _, inner_data_content, _ = parse_data(data_content)
+                            obj_pointer = Name.from_bytes(inner_data_content)
+                        except (TypeError, IndexError, ValueError):
+                            logging.debug(f"Data does not include an object pointer, skip")
+                            continue
+                        logging.info(
+                            f"Discovered a pointer, fetching data segments for {Name.to_str(obj_pointer)}"
+                        )
+                        with self.scheduler.job("pointer", Name.to_str(obj_pointer)) as pointer_job:
+                            async with BatchWriter(self.storage, validator=self.validator) as pointer_writer, \
+                                    aclosing(concurrent_fetcher(
+                                        self.app,
+                                        obj_pointer,
+                                        start_id=0,
+                                        end_id=None,
+                                        semaphore=pointer_job,
+                                    )) as pointer_fetcher:
+                                async for loop_data_name, loop_meta_info, _, loop_data_bytes in pointer_fetcher:
+                                    if not pointer_writer.check_quota(loop_data_name, len(loop_data_bytes)):
+                                        logging.warning(f"Quota exceeded, stop fetching {Name.to_str(obj_pointer)}")
+                                        return
+                                    pointer_writer.put(loop_data_name, loop_data_bytes,
+                                                       loop_meta_info.freshness_period if loop_meta_info else None)
@@ -3,9 +3,20 @@ import io
 import logging
 import sys
 from . import ReadHandle, CommandHandle
-from ..storage import *
-from ndn.encoding import Name, read_tl_num_from_stream, parse_data
+from ..storage import BatchWriter, Storage
+from ..utils import DataValidator, REGISTRY, RequestLog
+from ndn.encoding import Name, read_tl_num_from_stream, DecodeError
 from ndn.encoding import TypeNumber, FormalName
+from typing import Optional
+
+
+TCP_PACKETS = REGISTRY.counter('repo_tcp_insert_packets_total', 'Data packets received by TCP bulk insert',
+                               ['result'])
+_TCP_INSERTED = TCP_PACKETS.labels('inserted')
+_TCP_MALFORMED = TCP_PACKETS.labels('malformed')
+_TCP_OVER_QUOTA = TCP_PACKETS.labels('over_quota')
+_TCP_INVALID = TCP_PACKETS.labels('invalid')
+TCP_BYTES = REGISTRY.counter('repo_tcp_insert_bytes_total', 'Bytes of Data packets inserted by TCP bulk insert')
 
 
 class TcpBulkInsertHandle(object):
@@ -14,20 +25,26 @@ class TcpBulkInsertHandle(object):
         """
         An instance of this nested class will be created for every new connection.
         """
-        def __init__(self, reader, writer, storage: Storage, read_handle: ReadHandle, config: dict):
+        def __init__(self, reader, writer, storage: Storage, read_handle: ReadHandle, config: dict,
+                     validator: Optional[DataValidator] = None):
             """
             TCP Bulk insertion client need to keep a reference to ReadHandle to register new prefixes.
+            With a validator, data packets with invalid signatures are dropped.
             """
             self.logger = logging.getLogger(__name__)
+            self.request_log = RequestLog.get('tcp')
             self.reader = reader
             self.writer = writer
             self.storage = storage
             self.read_handle = read_handle
             self.config = config
+            self.validator = validator
             self.m_inputBufferSize = 0
             prefix_strs = self.config['tcp_bulk_insert'].get('prefixes', [])
             self.reg_root = self.config['repo_config']['register_root']
             self.reg_prefix = self.config['tcp_bulk_insert']['register_prefix']
+            # prefixes already registered for this connection
+            self.checked_prefixes = set()
             self.prefixes = [Name.from_str(s) for s in prefix_strs]
             self.logger.info("New connection")
 
@@ -36,40 +53,67 @@ class TcpBulkInsertHandle(object):
             Handle one incoming TCP connection.
             Multiple data packets may be transferred over a single connection.
             """
-            while True:
-                try:
-                    bio = io.BytesIO()
-                    ret = await read_tl_num_from_stream(self.reader, bio)
-                    # only accept data packets
-                    if ret != TypeNumber.DATA:
-                        self.logger.fatal('TCP handle received non-data type, closing connection ...')
+            # packets are counted once they are verified and committed
+            def _on_flush(sizes: list[int]):
+                _TCP_INSERTED.inc(len(sizes))
+                TCP_BYTES.inc(sum(sizes))
+
+            async with BatchWriter(self.storage, on_flush=_on_flush, validator=self.validator) as batch_writer:
+                while True:
+                    try:
+                        bio = io.BytesIO()
+                        ret = await read_tl_num_from_stream(self.reader, bio)
+                        # only accept data packets
+                        if ret != TypeNumber.DATA:
+                            self.logger.fatal('TCP handle received non-data type, closing connection ...')
+                            self.writer.close()
+                            break
+                        siz = await read_tl_num_from_stream(self.reader, bio)
+                        bio.write(await self.reader.readexactly(siz))
+                        data_bytes = bio.getvalue()
+                    except aio.IncompleteReadError:
                         self.writer.close()
-                        return
-                    siz = await read_tl_num_from_stream(self.reader, bio)
-                    bio.write(await self.reader.readexactly(siz))
-                    data_bytes = bio.getvalue()
-                except aio.IncompleteReadError:
-                    self.writer.close()
-                    self.logger.info('Closed TCP connection')
-                    return
-                except Exception as exc:
-                    print(exc)
-                    return
-                # Parse data again to obtain the name
-                data_name, _, _, _ = parse_data(data_bytes, with_tl=True)
-                self.storage.put_data_packet(data_name, data_bytes)
-                self.logger.info(f'Inserted data: {Name.to_str(data_name)}')
-
-                # Register prefix
-                if not self.reg_root and self.reg_prefix:
-                    prefix = self.check_prefix(data_name)
-                    self.logger.info(f'Try to register prefix: {Name.to_str(prefix)}')
-                    is_existing = CommandHandle.add_registered_prefix_in_storage(self.storage, prefix)
-                    if not is_existing:
-                        self.logger.info(f'Registered prefix: {Name.to_str(prefix)}')
-                        self.read_handle.listen(prefix)
-
-                await aio.sleep(0)
+                        self.logger.info('Closed TCP connection')
+                        break
+                    except Exception as exc:
+                        self.logger.warning(f'TCP handle failed to read data, closing connection: {exc}')
+                        break
+                    # Only scan the name and freshness period, the storage does not need the rest
+                    try:
+                        name_tlv, freshness_period = Storage.scan_data_packet(data_bytes)
+                        data_name = Name.from_bytes(name_tlv)
+                    except (DecodeError, IndexError, ValueError) as exc:
+                        _TCP_MALFORMED.inc()
+                        self.logger.warning(f'Dropped malformed data: {exc}')
+                        continue
+                    if not batch_writer.check_quota(data_name, len(data_bytes)):
+                        _TCP_OVER_QUOTA.inc()
+                        self.logger.warning(f'Quota exceeded, dropped data: {Name.to_str(data_name)}')
+                        continue
+                    batch_writer.put(data_name, data_bytes, freshness_period, len(data_bytes))
+                    self.count_rejected(batch_writer)
+                    self.request_log('insert', data_name, size=len(data_bytes))
+
+                    # Register prefix
+                    if not self.reg_root and self.reg_prefix:
+                        prefix = self.check_prefix(data_name)
+                        prefix_bytes = Name.to_bytes(prefix)
+                        if prefix_bytes not in self.checked_prefixes:
+                            self.checked_prefixes.add(prefix_bytes)
+                            self.logger.info(f'Try to register prefix: {Name.to_str(prefix)}')
+                            is_existing = CommandHandle.add_registered_prefix_in_storage(self.storage, prefix)
+                            if not is_existing:
+                                self.logger.info(f'Registered prefix: {Name.to_str(prefix)}')
+                                self.read_handle.listen(prefix)
+
+                    await aio.sleep(0)
+            self.count_rejected(batch_writer)
+
+        def count_rejected(self, batch_writer: BatchWriter):
+            if batch_writer.rejected:
+                _TCP_INVALID.inc(batch_writer.rejected)
+                self.logger.warning(f'Dropped {batch_writer.rejected} data with invalid signatures')
+                batch_writer.rejected = 0
 
         def check_prefix(self, data_name: FormalName) -> FormalName:
             for prefix in self.prefixes:
@@ -77,9 +121,13 @@ class TcpBulkInsertHandle(object):
                     return prefix
             return data_name
 
-    def __init__(self, storage: Storage, read_handle: ReadHandle, config: dict):
+    def __init__(self, storage: Storage, read_handle: ReadHandle, config: dict,
+                 validator: Optional[DataValidator] = None):
         """
         TCP bulk insertion handle need to keep a reference to ReadHandle to register new prefixes.
+
+        :param validator: Optional[DataValidator]. If given, the signatures of inserted data packets\
+            are verified before they are stored.
         """
         self.logger = logging.getLogger(__name__)
 
@@ -93,6 +141,7 @@ class TcpBulkInsertHandle(object):
         self.storage = storage
         self.read_handle = read_handle
         self.config = config
+        self.validator = validator
 
         server_addr = self.config['tcp_bulk_insert']['addr']
         server_port = self.config['tcp_bulk_insert']['port']
@@ -111,18 +160,8 @@ class TcpBulkInsertHandle(object):
         Create a new client for every new connection.
         """
         self.logger.info("Accepted new TCP connection")
-        client = TcpBulkInsertHandle.TcpBulkInsertClient(reader, writer, self.storage, self.read_handle, self.config)
+        client = TcpBulkInsertHandle.TcpBulkInsertClient(reader, writer, self.storage, self.read_handle, self.config,
+                                                         self.validator)
         event_loop = aio.get_event_loop()
         event_loop.create_task(client.handle_receive())
 
-
-if __name__ == "__main__":
-    logging.basicConfig(format='[%(asctime)s]%(levelname)s:%(message)s',
-                        datefmt='%Y-%m-%d %H:%M:%S',
-                        level=logging.INFO)
-
-    storage = LevelDBStorage() # fixme: this should have a parameter for the location of the db
-    handle = TcpBulkInsertHandle(storage) # fixme: read_handle and config parameters are unfilled
-
-    event_loop = aio.get_event_loop()
-    event_loop.run_forever()
@@ -1,24 +1,89 @@
 import asyncio as aio
+import base64
 import logging
+import time
+from contextlib import aclosing
+from hashlib import sha256
 from ndn.app import NDNApp
-from ndn.encoding import Name, NonStrictName
+from ndn.encoding import Name, NonStrictName, FormalName, Component, DecodeError, SignatureType, parse_data
 from ndn.types import InterestNack, InterestTimeout
 from . import ReadHandle, CommandHandle
-from ..command import RepoCommandRes, RepoCommandParam, ObjParam, ObjStatus, RepoStatCode
-from ..utils import concurrent_fetcher, PubSub
-from ..storage import Storage
-from typing import Optional
+from ..command import RepoCommandRes, RepoCommandParam, ObjParam, ObjStatus, RepoStatCode, RepeatedNames
+from ..utils import concurrent_fetcher, DataValidator, FetchScheduler, PubSub
+from ..storage import BatchWriter, Storage
+from typing import Callable, Optional
 from .utils import normalize_block_ids
 
 
+class _InsertCheckpoint:
+    """
+    Coalesce the saves of the progress of one insertion command. Objects whose progress changed\
+        are saved together, once enough packets were stored or enough time passed.
+    """
+    def __init__(self, handle: 'WriteCommandHandle', request_no: bytes, job: dict):
+        self.handle = handle
+        self.request_no = request_no
+        self.job = job
+        self.changed = set()
+        self.updates = 0
+        self.last_save = time.monotonic()
+        self.timer = None
+
+    def mark(self, index: int):
+        """
+        Record that the progress of an object changed, saving it if a threshold is reached.
+
+        :param index: int. The index of the object in the command.
+        """
+        self.changed.add(index)
+        self.updates += 1
+        if (self.updates >= self.handle.CHECKPOINT_INTERVAL or
+                time.monotonic() - self.last_save >= self.handle.CHECKPOINT_PERIOD):
+            self.save()
+        elif self.timer is None:
+            # a change is saved at the latest one period after it is made
+            self.timer = aio.get_running_loop().call_later(self.handle.CHECKPOINT_PERIOD, self.save)
+
+    def save(self):
+        """
+        Save the progress of the objects changed since the last save.
+        """
+        self.close()
+        self.updates = 0
+        self.last_save = time.monotonic()
+        if not self.changed:
+            return
+        storage = self.handle.storage
+        # the progress recorded must not cover packets still in the write-back cache
+        storage._write_back()
+        self.handle.update_insert_job_in_storage(storage, self.request_no,
+                                                 {i: self.job['objs'][i] for i in sorted(self.changed)})
+        self.changed.clear()
+
+    def close(self):
+        """
+        Stop the pending timed save, if any.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
 class WriteCommandHandle(CommandHandle):
     """
     WriteCommandHandle processes insert command interests, and fetches corresponding data to
     store them into the database.
-    TODO: Add validator
     """
+    # Number of progress updates (packets stored, objects finished) between two saves of a command's progress
+    CHECKPOINT_INTERVAL = 1000
+    # Longest time in seconds a progress update waits before it is saved
+    CHECKPOINT_PERIOD = 1.0
+    # Number of Interests sent for a packet listed by a manifest before giving up
+    MANIFEST_RETRIES = 15
+
     def __init__(self, app: NDNApp, storage: Storage, pb: PubSub, read_handle: ReadHandle,
-                 config: dict):
+                 config: dict, scheduler: Optional[FetchScheduler] = None,
+                 validator: Optional[DataValidator] = None):
         """
         Write handle need to keep a reference to write handle to register new prefixes.
 
@@ -26,11 +91,19 @@ class WriteCommandHandle(CommandHandle):
         :param storage: Storage.
         :param read_handle: ReadHandle. This param is necessary, because WriteCommandHandle need to
             call ReadHandle.listen() to register new prefixes.
+        :param scheduler: Optional[FetchScheduler]. The repo-wide fetch scheduler, shared with other
+            handles. If not given, the handle creates its own.
+        :param validator: Optional[DataValidator]. If given, the signatures of fetched data packets\
+            are verified before they are stored.
         """
         super(WriteCommandHandle, self).__init__(app, storage, pb, config)
         self.m_read_handle = read_handle
         self.prefix = None
         self.register_root = config['repo_config']['register_root']
+        # objects fetched at the same time, shared by all insertion commands
+        self.obj_semaphore = aio.Semaphore(config['repo_config'].get('max_concurrent_objects', 16))
+        self.scheduler = scheduler or FetchScheduler.from_config(config['repo_config'])
+        self.validator = validator
         self.logger = logging.getLogger(__name__)
 
     async def listen(self, prefix: NonStrictName):
@@ -52,10 +125,33 @@ class WriteCommandHandle(CommandHandle):
         cmd_param, request_no = self.parse_msg(msg)
         aio.create_task(self._process_insert(cmd_param, request_no))
 
-    async def _process_insert(self, cmd_param: RepoCommandParam, request_no: bytes):
+    def recover_insert_jobs(self):
+        """
+        Resume the insertion commands that were in progress when the repo stopped.
+        Objects already inserted are not fetched again, and segmented objects continue from the
+        first segment not stored.
+
+        :return: int. The number of insertion commands resumed.
+        """
+        resumed = 0
+        for request_no, job in self.get_insert_jobs_in_storage(self.storage).items():
+            try:
+                cmd_param = RepoCommandParam.parse(base64.b64decode(job['cmd']))
+            except (DecodeError, IndexError, KeyError, ValueError) as exc:
+                self.logger.warning(f'Dropping unreadable insertion job {request_no.hex()}: {exc}')
+                self.remove_insert_job_in_storage(self.storage, request_no)
+                continue
+            self.logger.info(f'Resuming insertion {request_no.hex()}')
+            aio.create_task(self._process_insert(cmd_param, request_no, job))
+            resumed += 1
+        return resumed
+
+    async def _process_insert(self, cmd_param: RepoCommandParam, request_no: bytes, job: Optional[dict] = None):
         """
         Process segmented insertion command.
         Return to client with status code 100 immediately, and then start data fetching process.
+
+        :param job: Optional[dict]. The saved state of the command, if it is being resumed.
         """
         objs = cmd_param.objs
         self.logger.info(f'Recved insert command: {request_no.hex()}')
@@ -72,83 +168,140 @@ class WriteCommandHandle(CommandHandle):
 
         # Note: stat is hold by reference
         stat = RepoCommandRes()
+        stat.request_no = request_no
         stat.status_code = RepoStatCode.IN_PROGRESS
         stat.objs = [_init_obj_stat(obj) for obj in objs]
         self.m_processes[request_no] = stat
 
-        # Start fetching
-        global_inserted = 0
-        global_succeeded = True
-        for i, obj in enumerate(objs):
-            name = obj.name
-            if obj.register_prefix and obj.register_prefix.name:
-                register_prefix = obj.register_prefix.name
-            else:
-                register_prefix = None
-            if obj.forwarding_hint and obj.forwarding_hint.names:
-                forwarding_hint = obj.forwarding_hint.names
-            else:
-                forwarding_hint = None
+        # Persist the command and the progress of each object, to resume after a restart
+        if job is None:
+            job = {
+                'cmd': base64.b64encode(bytes(cmd_param.encode())).decode(),
+                'objs': [{'next': None, 'inserted': 0, 'status': None} for _ in objs],
+            }
+            self.add_insert_job_in_storage(self.storage, request_no, job)
+
+        # Start fetching objects concurrently, bounded by the repo-wide budget
+        checkpoint = _InsertCheckpoint(self, request_no, job)
+        try:
+            results = await aio.gather(*[self._process_insert_obj(obj, stat.objs[i], request_no, checkpoint, i)
+                                         for i, obj in enumerate(objs)])
+        finally:
+            checkpoint.close()
+        global_inserted = sum(obj_stat.insert_num for obj_stat in stat.objs)
+        global_succeeded = all(results)
+
+        # All fetches finished
+        self.logger.info(f'Insertion {request_no.hex()} done, total {global_inserted} inserted.')
+        if global_succeeded:
+            stat.status_code = RepoStatCode.COMPLETED
+        else:
+            stat.status_code = RepoStatCode.FAILED
+        self.remove_insert_job_in_storage(self.storage, request_no)
+        self.report_status(request_no, cmd_param.check_prefix)
+
+        # Delete process state after some time
+        await self._delete_process_state_after(request_no, 60)
+
+    async def _process_insert_obj(self, obj: ObjParam, obj_stat: ObjStatus, request_no: bytes,
+                                  checkpoint: _InsertCheckpoint, index: int) -> bool:
+        """
+        Fetch one object of an insertion command, updating its status in place.
 
-            self.logger.debug(f'Proc ins cmd {request_no.hex()} w/'
+        :param obj: ObjParam. The object to fetch.
+        :param obj_stat: ObjStatus. The status of this object in the command's response.
+        :param request_no: bytes.
+        :param checkpoint: _InsertCheckpoint. Saves the persisted state of the command.
+        :param index: int. The index of this object in the command.
+        :return: True if the object is completely inserted.
+        """
+        name = obj.name
+        progress = checkpoint.job['objs'][index]
+        obj_stat.insert_num = progress['inserted']
+        if progress['status'] is not None:
+            # finished before the repo restarted
+            obj_stat.status_code = progress['status']
+            return progress['status'] == RepoStatCode.COMPLETED
+        if obj.register_prefix and obj.register_prefix.name:
+            register_prefix = obj.register_prefix.name
+        else:
+            register_prefix = None
+        if obj.forwarding_hint and obj.forwarding_hint.names:
+            forwarding_hint = obj.forwarding_hint.names
+        else:
+            forwarding_hint = None
+
+        self.logger.debug(f'Proc ins cmd {request_no.hex()} w/'
                           f'name={Name.to_str(name)}, start={obj.start_block_id}, end={obj.end_block_id}')
 
-            # rejects any data that overlaps with repo's own namespace
-            if Name.is_prefix(self.prefix, name) or Name.is_prefix(name, self.prefix):
-                self.logger.warning('Inserted data name overlaps with repo prefix, rejected')
-                stat.objs[i].status_code = RepoStatCode.MALFORMED
-                global_succeeded = False
-                continue
+        def _finish(status_code: int) -> bool:
+            obj_stat.status_code = status_code
+            progress['status'] = status_code
+            checkpoint.mark(index)
+            return status_code == RepoStatCode.COMPLETED
+
+        # rejects any data that overlaps with repo's own namespace
+        if Name.is_prefix(self.prefix, name) or Name.is_prefix(name, self.prefix):
+            self.logger.warning('Inserted data name overlaps with repo prefix, rejected')
+            return _finish(RepoStatCode.MALFORMED)
+        if obj.manifest:
+            # the manifest lists the packets, block ids are meaningless
+            valid = obj.start_block_id is None and obj.end_block_id is None
+            start_block_id = end_block_id = None
+        else:
             valid, start_block_id, end_block_id = normalize_block_ids(obj)
-            if not valid:
-                self.logger.warning('Insert command malformed')
-                stat.objs[i].status_code = RepoStatCode.MALFORMED
-                global_succeeded = False
-                continue
+        if not valid:
+            self.logger.warning('Insert command malformed')
+            return _finish(RepoStatCode.MALFORMED)
 
-            # Remember the prefixes to register
-            if register_prefix:
-                is_existing = CommandHandle.add_registered_prefix_in_storage(self.storage, register_prefix)
-                # If repo does not register root prefix, the client tells repo what to register
-                if not self.register_root and not is_existing:
-                    self.m_read_handle.listen(register_prefix)
+        # Remember the prefixes to register
+        if register_prefix:
+            is_existing = CommandHandle.add_registered_prefix_in_storage(self.storage, register_prefix)
+            # If repo does not register root prefix, the client tells repo what to register
+            if not self.register_root and not is_existing:
+                self.m_read_handle.listen(register_prefix)
 
-            # Remember the files inserted, this is useful for enumerating all inserted files
-            # CommandHandle.add_inserted_filename_in_storage(self.storage, name)
+        # Remember the files inserted, this is useful for enumerating all inserted files
+        # CommandHandle.add_inserted_filename_in_storage(self.storage, name)
 
+        def _on_stored(block_id: Optional[int] = None):
+            if block_id is not None:
+                progress['next'] = block_id + 1
+            progress['inserted'] += 1
+            obj_stat.insert_num = progress['inserted']
+            checkpoint.mark(index)
+
+        async with self.obj_semaphore:
             # Start data fetching process
-            stat.objs[i].status_code = RepoStatCode.IN_PROGRESS
+            obj_stat.status_code = RepoStatCode.IN_PROGRESS
 
-            if start_block_id is not None:
+            if obj.manifest:
+                # packets stored before the repo restarted are found again, and counted again
+                progress['inserted'] = 0
+                is_success = await self.fetch_manifest_data(name, forwarding_hint, on_stored=_on_stored)
+            elif start_block_id is not None:
                 # Fetch data packets with block ids appended to the end
-                insert_num = await self.fetch_segmented_data(name, start_block_id, end_block_id, forwarding_hint)
-                is_success = end_block_id is None or start_block_id + insert_num - 1 == end_block_id
+                # segments are stored in order, so a resumed object continues after the last one stored
+                if progress['next'] is not None:
+                    start_block_id = progress['next']
+                if end_block_id is None or start_block_id <= end_block_id:
+                    await self.fetch_segmented_data(name, start_block_id, end_block_id, forwarding_hint,
+                                                    on_stored=_on_stored)
+                is_success = end_block_id is None or progress['next'] == end_block_id + 1
             else:
                 # Both start_block_id and end_block_id are None, fetch a single data packet
-                insert_num = await self.fetch_single_data(name, forwarding_hint)
-                is_success = insert_num == 1
+                progress['inserted'] = await self.fetch_single_data(name, forwarding_hint)
+                is_success = progress['inserted'] == 1
+        insert_num = obj_stat.insert_num = progress['inserted']
 
-            if is_success:
-                stat.objs[i].status_code = RepoStatCode.COMPLETED
-                self.logger.info(f'Insertion {request_no.hex()} name={Name.to_str(name)} finish:'
+        if is_success:
+            self.logger.info(f'Insertion {request_no.hex()} name={Name.to_str(name)} finish:'
                              f'{insert_num} inserted')
-            else:
-                global_succeeded = False
-                stat.objs[i].status_code = RepoStatCode.FAILED
-                self.logger.info(f'Insertion {request_no.hex()} name={Name.to_str(name)} fail:'
-                             f'{insert_num} inserted')
-            stat.objs[i].insert_num = insert_num
-            global_inserted += insert_num
-
-        # All fetches finished
-        self.logger.info(f'Insertion {request_no.hex()} done, total {global_inserted} inserted.')
-        if global_succeeded:
-            stat.status_code = RepoStatCode.COMPLETED
+            return _finish(RepoStatCode.COMPLETED)
         else:
-            stat.status_code = RepoStatCode.FAILED
-
-        # Delete process state after some time
-        await self._delete_process_state_after(request_no, 60)
+            self.logger.info(f'Insertion {request_no.hex()} name={Name.to_str(name)} fail:'
+                             f'{insert_num} inserted')
+            return _finish(RepoStatCode.FAILED)
 
     async def fetch_single_data(self, name: NonStrictName, forwarding_hint: Optional[list[NonStrictName]]):
         """
@@ -158,34 +311,201 @@ class WriteCommandHandle(CommandHandle):
         :return:  Number of data packets fetched.
         """
         try:
-            data_name, _, _, data_bytes = await self.app.express_interest(
-                name, need_raw_packet=True, can_be_prefix=False, lifetime=1000,
-                forwarding_hint=forwarding_hint)
+            with self.scheduler.job('insert', Name.to_str(name)) as job:
+                async with job:
+                    data_name, meta_info, _, data_bytes = await self.app.express_interest(
+                        name, need_raw_packet=True, can_be_prefix=False, lifetime=1000,
+                        forwarding_hint=forwarding_hint)
         except InterestNack as e:
             self.logger.info(f'Nacked with reason={e.reason}')
             return 0
         except InterestTimeout:
             self.logger.info(f'Timeout')
             return 0
-        self.storage.put_data_packet(data_name, data_bytes)
+        if not self.storage.check_quota(data_name, len(data_bytes)):
+            self.logger.warning(f'Quota exceeded, rejected {Name.to_str(data_name)}')
+            return 0
+        if self.validator is not None and not (await self.validator.verify([data_bytes]))[0]:
+            self.logger.warning(f'Invalid signature, rejected {Name.to_str(data_name)}')
+            return 0
+        self.storage.put_data_packet(data_name, data_bytes, meta_info)
         return 1
 
+    async def fetch_manifest_data(self, name: NonStrictName, forwarding_hint: Optional[list[NonStrictName]],
+                                  on_stored: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Fetch an object from its manifest. The root of the manifest is fetched first, then all\
+            packets it lists, by their full names and in any order. Packets listed under the name\
+            of the root are manifests, and the packets they list are fetched in turn.
+        Packets listed by a manifest are authenticated by the implicit digest of their full name,\
+            so only the signature of the root is verified, unless the validator is configured to\
+            verify the key signatures of listed packets too. Listed packets signed with a digest\
+            are authenticated by the manifest only.
+        :param name: NonStrictName. The name of the root of the manifest.
+        :param forwarding_hint: Optional[list[NonStrictName]]
+        :param on_stored: Optional[Callable[[], None]]. Called for each data packet committed to\
+            the storage, or found already stored.
+        :return: True if the root and all packets listed are stored.
+        """
+        root_name = Name.normalize(name)
+        queue = aio.Queue()
+        failed = False
+
+        def _on_flush(tags: list):
+            if on_stored:
+                for _ in tags:
+                    on_stored()
+
+        listed_authenticated = self.validator is None or not self.validator.verify_listed
+        with self.scheduler.job('insert', Name.to_str(root_name)) as job:
+            async with BatchWriter(self.storage, on_flush=_on_flush, validator=self.validator) as writer:
+
+                async def _fetch(int_name: FormalName) -> Optional[bytes]:
+                    is_full_name = Component.get_type(int_name[-1]) == Component.TYPE_IMPLICIT_SHA256
+                    validator = _accept_listed if is_full_name else None
+                    for _ in range(self.MANIFEST_RETRIES):
+                        try:
+                            async with job:
+                                _, _, _, data_bytes = await self.app.express_interest(
+                                    int_name, need_raw_packet=True, can_be_prefix=False, lifetime=1000,
+                                    forwarding_hint=forwarding_hint, validator=validator)
+                            return bytes(data_bytes)
+                        except (InterestNack, InterestTimeout):
+                            continue
+                    return None
+
+                def _store(data_name: FormalName, data_bytes: bytes, authenticated: bool) -> bool:
+                    if not writer.check_quota(data_name, len(data_bytes)):
+                        self.logger.warning(f'Quota exceeded, rejected {Name.to_str(data_name)}')
+                        return False
+                    _, meta_info, _, sig_ptrs = parse_data(data_bytes, with_tl=True)
+                    # the validator rejects digest signatures, the digest listed is what authenticates them
+                    sig_info = sig_ptrs.signature_info
+                    authenticated = authenticated or (
+                        sig_info is not None and sig_info.signature_type == SignatureType.DIGEST_SHA256)
+                    writer.put(data_name, data_bytes, meta_info.freshness_period if meta_info else None,
+                               authenticated=authenticated)
+                    return True
+
+                def _list(content) -> None:
+                    # the packets already stored are not fetched again, manifests are read from the storage
+                    entries = RepeatedNames.parse(content).names
+                    stored = self.storage.exists_data_packets([entry[:-1] for entry in entries])
+                    for entry, is_stored in zip(entries, stored):
+                        if is_stored:
+                            # a packet stored under the same name but with another digest is fetched again
+                            data_bytes = self.storage.get_data_packet(entry)
+                            if data_bytes is not None:
+                                _on_flush([None])
+                                if Name.is_prefix(root_name, entry[:-1]):
+                                    _list(parse_data(data_bytes, with_tl=True)[2])
+                                continue
+                        queue.put_nowait(entry)
+
+                async def _worker():
+                    nonlocal failed
+                    while True:
+                        entry = await queue.get()
+                        try:
+                            if failed:
+                                continue
+                            data_bytes = await _fetch(entry)
+                            digest = bytes(Component.get_value(entry[-1]))
+                            if data_bytes is None or sha256(data_bytes).digest() != digest:
+                                self.logger.info(f'Cannot fetch {Name.to_str(entry)}')
+                                failed = True
+                                continue
+                            if not _store(entry[:-1], data_bytes, listed_authenticated):
+                                failed = True
+                                continue
+                            if Name.is_prefix(root_name, entry[:-1]):
+                                _list(parse_data(data_bytes, with_tl=True)[2])
+                        except (DecodeError, IndexError, ValueError) as exc:
+                            self.logger.info(f'Malformed manifest {Name.to_str(entry)}: {exc}')
+                            failed = True
+                        except Exception as exc:
+                            # e.g. the Interest canceled or the storage failing, the worker keeps
+                            # draining the queue so that the object fails instead of hanging
+                            self.logger.warning(f'Cannot store {Name.to_str(entry)}: {exc!r}')
+                            failed = True
+                        finally:
+                            queue.task_done()
+
+                root = await _fetch(root_name)
+                if root is None:
+                    self.logger.info(f'Cannot fetch manifest {Name.to_str(root_name)}')
+                    return False
+                # the root authenticates everything it lists, so it is verified before they are fetched
+                if self.validator is not None and not (await self.validator.verify([root]))[0]:
+                    self.logger.warning(f'Invalid signature, rejected manifest {Name.to_str(root_name)}')
+                    return False
+                try:
+                    _list(parse_data(root, with_tl=True)[2])
+                except (DecodeError, IndexError, ValueError) as exc:
+                    self.logger.info(f'Malformed manifest {Name.to_str(root_name)}: {exc}')
+                    return False
+                # the Interests in flight are bounded by the scheduler, not by the number of workers
+                workers = [aio.create_task(_worker()) for _ in range(self.scheduler.window)]
+                await queue.join()
+                for worker in workers:
+                    worker.cancel()
+                # the root is stored last, once everything it covers is stored
+                if failed or not _store(root_name, root, True):
+                    return False
+        if writer.rejected:
+            self.logger.warning(f'Invalid signatures, rejected {writer.rejected} packets of '
+                                f'{Name.to_str(root_name)}')
+            return False
+        return True
+
     async def fetch_segmented_data(self, name, start_block_id: int, end_block_id: Optional[int],
-                                   forwarding_hint: Optional[list[NonStrictName]]):
+                                   forwarding_hint: Optional[list[NonStrictName]],
+                                   on_stored: Optional[Callable[[int], None]] = None):
         """
         Fetch segmented Data packets.
         :param name: NonStrictName.
         :param start_block_id: int
         :param end_block_id: Optional[int]
         :param forwarding_hint: Optional[list[NonStrictName]]
+        :param on_stored: Optional[Callable[[int], None]]. Called with the block id of each\
+            data packet once it is committed to the storage, in order.
         :return: Number of data packets fetched.
         """
-        semaphore = aio.Semaphore(10)
         block_id = start_block_id
-        async for (data_name, _, _, data_bytes) in (
-                concurrent_fetcher(self.app, name, start_block_id, end_block_id,
-                                   semaphore, forwarding_hint=forwarding_hint)):
-            self.storage.put_data_packet(data_name, data_bytes)
-            block_id += 1
-        insert_num = block_id - start_block_id
+        # segments already stored, e.g. by an earlier insertion of the same object, are not fetched
+        # again when the range is known
+        def _on_flush(block_ids: list[int]):
+            if on_stored:
+                for stored_block_id in block_ids:
+                    on_stored(stored_block_id)
+
+        # segments after an invalid one are not stored, so the progress stops at the invalid one
+        with self.scheduler.job('insert', Name.to_str(name)) as job:
+            # the fetcher is closed when the loop stops early, so the rest of the range is not fetched
+            async with BatchWriter(self.storage, on_flush=_on_flush, validator=self.validator,
+                                   in_order=True) as writer, \
+                    aclosing(concurrent_fetcher(self.app, name, start_block_id, end_block_id, job,
+                                                forwarding_hint=forwarding_hint,
+                                                exists=self.storage.exists_data_packets)) as fetcher:
+                async for (data_name, meta_info, _, data_bytes) in fetcher:
+                    if writer.rejected:
+                        break
+                    if data_bytes is None:
+                        # keep reporting segments in order
+                        writer.skip(block_id)
+                        block_id += 1
+                        continue
+                    if not writer.check_quota(data_name, len(data_bytes)):
+                        self.logger.warning(f'Quota exceeded, rejected {Name.to_str(data_name)}')
+                        break
+                    writer.put(data_name, data_bytes, meta_info.freshness_period if meta_info else None, block_id)
+                    block_id += 1
+        if writer.rejected:
+            self.logger.warning(f'Invalid signature, stopped fetching {Name.to_str(name)}')
+        insert_num = block_id - start_block_id - writer.rejected
         return insert_num
+
+
+async def _accept_listed(_name, _sig) -> bool:
+    # the implicit digest in the Interest already authenticates the packet
+    return True
@@ -1,12 +1,24 @@
+import asyncio as aio
 import logging
+import time
 from ndn.app import NDNApp
 from ndn.encoding import Name
 
-from .storage import *
-from .handle import *
+from .storage import Storage
+from .handle import ReadHandle, WriteCommandHandle, DeleteCommandHandle, SyncCommandHandle, \
+    TcpBulkInsertHandle
+from .utils import REGISTRY
+
+
+RECOVERY_ITEMS = REGISTRY.gauge('repo_recovery_items', 'State recovered after startup, and to recover',
+                                ['kind', 'state'])
+READY = REGISTRY.gauge('repo_ready', '1 once the state stored before startup is recovered')
 
 
 class Repo(object):
+    # Prefixes registered between two yields to the event loop while recovering
+    RECOVERY_BATCH = 1000
+
     def __init__(self, app: NDNApp, storage: Storage, read_handle: ReadHandle,
                  write_handle: WriteCommandHandle, delete_handle: DeleteCommandHandle,
                  sync_handle: SyncCommandHandle, tcp_bulk_insert_handle: TcpBulkInsertHandle, config: dict):
@@ -25,6 +37,13 @@ class Repo(object):
         self.running = True
         self.register_root = config['repo_config']['register_root']
         self.logger = logging.getLogger(__name__)
+        # set once the state stored before startup is recovered
+        self.ready = aio.Event()
+        # kind -> [recovered, total]
+        self.recovery = {kind: [0, 0] for kind in ('prefixes', 'sync_groups', 'insert_jobs')}
+        self.recovery_task = None
+        RECOVERY_ITEMS.set_function(self._recovery_items)
+        READY.set_function(self._is_ready)
 
     async def listen(self):
         """
@@ -32,12 +51,8 @@ class Repo(object):
         done once.
 
         This method need to be called to make repo working.
+        The state stored before the repo restarted is recovered in the background, see ``recover``.
         """
-        # Recover registered prefix to enable hot restart
-        if not self.register_root:
-            self.recover_registered_prefixes()
-        self.recover_sync_states()
-
         # Init PubSub
         self.write_handle.pb.set_publisher_prefix(self.prefix)
         self.write_handle.pb.set_base_prefix(self.prefix)
@@ -49,16 +64,63 @@ class Repo(object):
         await self.delete_handle.listen(self.prefix)
         await self.sync_handle.listen(self.prefix)
 
-    def recover_registered_prefixes(self):
+        self.recovery_task = aio.create_task(self.recover())
+
+    async def wait_ready(self):
+        """
+        Wait until the state stored before startup is recovered.
+        """
+        await self.ready.wait()
+
+    async def recover(self):
+        """
+        Recover the state stored before the repo restarted, while the repo already accepts commands:
+        first the registered prefixes, so that their data can be read, then the sync groups, then\
+            the insertion jobs. Sets ``ready`` once all prefixes are registered.
+        """
+        start = time.monotonic()
+        # Recover registered prefix to enable hot restart
+        if not self.register_root:
+            await self.recover_registered_prefixes()
+        await self.recover_sync_states()
+        # Resume insertions interrupted by a restart
+        self.recover_insert_jobs()
+        await self.read_handle.registrar.join()
+        self.ready.set()
+        self.logger.info(f'Repo ready, recovered in {time.monotonic() - start:.3f} s')
+
+    async def recover_registered_prefixes(self):
+        # registered in the background, prefixes under a common aggregated prefix only once
         prefixes = self.write_handle.get_registered_prefix_in_storage(self.storage)
+        progress = self.recovery['prefixes']
+        progress[1] = len(prefixes)
         for prefix in prefixes:
-            self.logger.info(f'Existing Prefix Found: {Name.to_str(prefix)}')
+            self.logger.debug(f'Existing Prefix Found: {Name.to_str(prefix)}')
             self.read_handle.listen(prefix)
+            progress[0] += 1
+            if progress[0] % self.RECOVERY_BATCH == 0:
+                await aio.sleep(0)
+        self.logger.info(f'Recovered {len(prefixes)} prefixes, registering {len(self.read_handle.routes)} routes')
 
-    def recover_sync_states(self):
-        states = {}
-        groups = self.sync_handle.get_sync_groups_in_storage(self.storage)
+    async def recover_sync_states(self):
+        groups = [Name.to_str(group) for group in self.sync_handle.get_sync_groups_in_storage(self.storage)]
+        progress = self.recovery['sync_groups']
+        progress[1] = len(groups)
+        # a command for a group not recovered yet recovers it first
+        self.sync_handle.unrecovered_groups.update(groups)
         for group in groups:
-            group_states = self.sync_handle.get_sync_states_in_storage(self.storage, group)
-            states[Name.to_str(group)] = group_states
-        self.sync_handle.recover_from_states(states)
\ No newline at end of file
+            self.sync_handle.recover_group(group)
+            progress[0] += 1
+            await aio.sleep(0)
+
+    def recover_insert_jobs(self):
+        progress = self.recovery['insert_jobs']
+        progress[1] = self.write_handle.recover_insert_jobs()
+        progress[0] = progress[1]
+
+    def _recovery_items(self) -> list:
+        return [((kind, state), progress[i]) for kind, progress in self.recovery.items()
+                for i, state in enumerate(('recovered', 'total'))]
+
+    def _is_ready(self) -> int:
+        return int(self.ready.is_set())
\ No newline at end of file
@@ -1,14 +1,20 @@
-from .storage_base import Storage
-from .storage_factory import create_storage
-from .sqlite import SqliteStorage
+from ..utils.lazy import lazy_exports
 
-# import only supported storage backends
-try:
-    from .leveldb import LevelDBStorage
-except ImportError as exc:
-    pass
-
-try:
-    from .mongodb import MongoDBStorage
-except ImportError as exc:
-    pass
\ No newline at end of file
+# submodules are imported when a name is first used, so that only the backend configured is loaded
+_EXPORTS = {
+    'NameKey': '.name_key',
+    'Storage': '.storage_base',
+    'BatchWriter': '.batch_writer',
+    'create_storage': '.storage_factory',
+    'SqliteStorage': '.sqlite',
+    # supported only if their drivers are installed
+    'LevelDBStorage': '.leveldb',
+    'MongoDBStorage': '.mongodb',
+}
+# the driver each optional backend needs
+_OPTIONAL = {
+    'LevelDBStorage': 'plyvel',
+    'MongoDBStorage': 'pymongo',
+}
+__all__ = ['NameKey', 'Storage', 'BatchWriter', 'create_storage', 'SqliteStorage']
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS, _OPTIONAL)
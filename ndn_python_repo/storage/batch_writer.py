@@ -0,0 +1,174 @@
+import asyncio as aio
+from ndn.encoding import FormalName, NonStrictName
+from typing import Any, Callable, Optional
+from .storage_base import Storage
+from ..utils.data_validator import DataValidator
+
+
+class BatchWriter:
+    """
+    Accumulate fetched data packets and commit them to the storage in batches, when ``max_packets``\
+        packets are pending or ``max_delay`` seconds after the first pending packet.
+    Use it as a context manager, so pending packets are committed when fetching stops. With a\
+        validator, use it as an async context manager, so the last batches are also verified.
+    """
+    def __init__(self, storage: Storage, max_packets: int=256, max_delay: float=0.1,
+                 on_flush: Optional[Callable[[list], None]]=None, validator: Optional[DataValidator]=None,
+                 in_order: bool=False):
+        """
+        :param storage: Storage.
+        :param max_packets: int. Number of pending packets that triggers a commit.
+        :param max_delay: float. Longest time in seconds a packet stays pending.
+        :param on_flush: Optional[Callable[[list], None]]. Called with the tags of the packets\
+            after they are committed, in the order they were put.
+        :param validator: Optional[DataValidator]. If given, each batch is verified before it is\
+            committed, while the next one accumulates. Invalid packets are dropped, and their tags\
+            are not given to ``on_flush``.
+        :param in_order: bool. If true, packets put after an invalid one are dropped too, so\
+            ``on_flush`` only reports the packets put before the first invalid one.
+        """
+        self.storage = storage
+        self.max_packets = max_packets
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.validator = validator
+        self.in_order = in_order
+        self.packets = []
+        self.tags = []
+        self.authenticated = []
+        self.pending_bytes = 0
+        self.timer = None
+        # the last batch being verified, batches are committed in order
+        self.committing = None
+        # number of packets that failed verification, or were dropped after one in order
+        self.rejected = 0
+        self.stopped = False
+
+    def check_quota(self, name: NonStrictName, size: int) -> bool:
+        """
+        Check the quotas for one more packet, counting all pending packets against them.
+        """
+        return self.storage.check_quota(name, size + self.pending_bytes)
+
+    def put(self, name: FormalName, data: bytes, freshness_period: Optional[int], tag: Any=None,
+            authenticated: bool=False):
+        """
+        Add a data packet to the next batch.
+
+        :param name: FormalName. The name of the data packet, as obtained when fetching it.
+        :param data: bytes. The data packet.
+        :param freshness_period: Optional[int]. The freshnessPeriod of the data packet.
+        :param tag: Any. Given back to ``on_flush`` once the packet is committed.
+        :param authenticated: bool. If true, the packet is not verified by the validator, e.g.\
+            because it matched the implicit digest listed by a verified manifest.
+        """
+        if self.stopped:
+            self.rejected += 1
+            return
+        self.pending_bytes += len(data)
+        self._add((name, data, freshness_period), tag, authenticated)
+
+    def _add(self, packet: Optional[tuple], tag: Any, authenticated: bool):
+        self.packets.append(packet)
+        self.tags.append(tag)
+        self.authenticated.append(authenticated)
+        if len(self.packets) >= self.max_packets:
+            self.flush()
+        elif self.timer is None:
+            self.timer = aio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def skip(self, tag: Any):
+        """
+        Give ``tag`` to ``on_flush`` once the packets put before are committed, for a packet\
+            that is already stored.
+        """
+        if self.stopped:
+            return
+        # an entry without a packet keeps the tag in order with the pending packets
+        self._add(None, tag, True)
+
+    def flush(self):
+        """
+        Commit all pending packets. With a validator, they are committed once verified.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.packets:
+            return
+        packets, tags, authenticated = self.packets, self.tags, self.authenticated
+        self.packets, self.tags, self.authenticated = [], [], []
+        if self.validator is not None and not all(authenticated):
+            self._chain(self._verify_and_commit, packets, tags, authenticated)
+        elif self.committing is not None:
+            self._chain(self._commit, packets, tags)
+        else:
+            self._commit(packets, tags)
+
+    def _chain(self, func: Callable, *args):
+        previous = self.committing
+
+        async def _run():
+            if previous is not None:
+                await previous
+            result = func(*args)
+            if aio.iscoroutine(result):
+                await result
+        task = aio.ensure_future(_run())
+        self.committing = task
+
+        def _on_done(_):
+            if self.committing is task:
+                self.committing = None
+        task.add_done_callback(_on_done)
+
+    async def _verify_and_commit(self, packets: list, tags: list, authenticated: list):
+        to_verify = [i for i, is_authenticated in enumerate(authenticated) if not is_authenticated]
+        results = await self.validator.verify([packets[i][1] for i in to_verify])
+        invalid = {i for i, valid in zip(to_verify, results) if not valid}
+        if invalid and self.in_order:
+            # the packets before the first invalid one are still committed
+            invalid = set(range(min(invalid), len(packets)))
+        if invalid:
+            dropped = [packets[i] for i in invalid if packets[i] is not None]
+            self.rejected += len(dropped)
+            self.pending_bytes -= sum(len(data) for _, data, _ in dropped)
+            packets = [packet for i, packet in enumerate(packets) if i not in invalid]
+            tags = [tag for i, tag in enumerate(tags) if i not in invalid]
+        self._commit(packets, tags)
+        if invalid and self.in_order:
+            self.stopped = True
+
+    def _commit(self, packets: list, tags: list):
+        # entries of skipped packets only carry their tag
+        packets = [packet for packet in packets if packet is not None]
+        if self.stopped:
+            # after an invalid packet, in order
+            self.rejected += len(packets)
+            self.pending_bytes -= sum(len(data) for _, data, _ in packets)
+            return
+        if packets:
+            self.pending_bytes -= sum(len(data) for _, data, _ in packets)
+            self.storage.put_data_packets(packets)
+        if self.on_flush and tags:
+            self.on_flush(tags)
+
+    async def drain(self):
+        """
+        Commit all pending packets, and wait until all batches are verified and committed.
+        """
+        self.flush()
+        while self.committing is not None:
+            await self.committing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.drain()
@@ -2,18 +2,19 @@ import os
 import pickle
 import plyvel # fixme: my ide tells me this doesn't exist
 from .storage_base import Storage
-from typing import Optional
+from typing import Iterator, Optional
 
 
 class LevelDBStorage(Storage):
 
-    def __init__(self, level_dir: str):
+    def __init__(self, level_dir: str, **kwargs):
         """
         Creates a LevelDB storage instance at disk location ``str``.
 
         :param level_dir: str. The disk location of the database directory.
+        :param kwargs: Options passed to :class:`Storage`.
         """
-        super().__init__()
+        super().__init__(**kwargs)
         db_dir = os.path.expanduser(level_dir)
         if not os.path.exists(db_dir):
             try:
@@ -22,7 +23,7 @@ class LevelDBStorage(Storage):
                 raise PermissionError(f'Could not create database directory: {db_dir}') from None
         self.db = plyvel.DB(db_dir, create_if_missing=True)
 
-    def _put(self, key: bytes, value: bytes, expire_time_ms: int=None):
+    def _put(self, key: bytes, value: bytes, expire_time_ms: int=None, digest: bytes=None):
         """
         Insert value and its expiration time into levelDB, overwrite if already exists.
 
@@ -30,42 +31,57 @@ class LevelDBStorage(Storage):
         :param value: bytes.
         :param expire_time_ms: Optional[int]. This data is marked unfresh after ``expire_time_ms``\
             milliseconds.
+        :param digest: Optional[bytes]. The implicit digest of the data packet.
         """
-        self.db.put(key, pickle.dumps((value, expire_time_ms)))
+        self.db.put(key, pickle.dumps((value, expire_time_ms, digest)))
 
-    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]]):
+    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]],
+                   digests: list[Optional[bytes]]=None):
         """
         Batch insert.
 
         :param keys: list[bytes].
         :param values: list[bytes].
         :param expire_time_mss: list[Optional[int]]. The expiration time for each data in ``value``.
+        :param digests: list[Optional[bytes]]. The implicit digest for each data in ``value``.
         """
+        if digests is None:
+            digests = [None] * len(keys)
         with self.db.write_batch() as b:
-            for key, value, expire_time_ms in zip(keys, values, expire_time_mss):
-                b.put(key, pickle.dumps((value, expire_time_ms)))
+            for key, value, expire_time_ms, digest in zip(keys, values, expire_time_mss, digests):
+                b.put(key, pickle.dumps((value, expire_time_ms, digest)))
 
-    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False) -> bytes | None:
+    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False, digest: bytes=None) -> bytes | None:
         """
         Get value from levelDB.
 
         :param key: bytes.
         :param can_be_prefix: bool. If true, use prefix match instead of exact match.
         :param must_be_fresh: bool. If true, ignore expired data.
+        :param digest: Optional[bytes]. If given, only match the data with this implicit digest.
         :return: bytes. The value of the data packet in bytes or None if it can't be found or is not fresh when must_be_fresh is True.
         """
         if not can_be_prefix:
             record = self.db.get(key)
             if record is None:
                 return None
-            value, expire_time_ms = pickle.loads(record)
+            value, expire_time_ms, *stored_digest = pickle.loads(record)
+            if digest is not None:
+                if not stored_digest:
+                    # Records written by older versions do not carry the implicit digest
+                    stored_digest = [self._digest_of(value)]
+                    self.db.put(key, pickle.dumps((value, expire_time_ms, stored_digest[0])))
+                if stored_digest[0] != digest:
+                    return None
             if not must_be_fresh or expire_time_ms is not None and expire_time_ms > self._time_ms():
                 return value
             else:
                 return None
         else:
-            for _, v_e in self.db.iterator(prefix=key):
-                value, expire_time_ms = pickle.loads(v_e)
+            # the empty name matches every packet, but not the reserved keys before them
+            records = self.db.iterator(prefix=key) if key else self.db.iterator(start=self.DATA_KEYS_START)
+            for _, v_e in records:
+                value, expire_time_ms, *_ = pickle.loads(v_e)
                 if not must_be_fresh or expire_time_ms is not None and expire_time_ms > self._time_ms():
                     return value
             return None
@@ -81,4 +97,36 @@ class LevelDBStorage(Storage):
             self.db.delete(key)
             return True
         else:
-            return False
\ No newline at end of file
+            return False
+
+    def _remove_batch(self, keys: list[bytes]) -> int:
+        """
+        Remove values from levelDB in one batch.
+
+        :param keys: list[bytes].
+        :return: The number of keys removed.
+        """
+        keys = [key for key in keys if self.db.get(key) is not None]
+        with self.db.write_batch() as b:
+            for key in keys:
+                b.delete(key)
+        return len(keys)
+
+    def _exists(self, keys: list[bytes]) -> list[bool]:
+        """
+        Check which keys are stored in levelDB, regardless of freshness.
+
+        :param keys: list[bytes].
+        :return: list[bool]. Whether each key is stored.
+        """
+        return [self.db.get(key) is not None for key in keys]
+
+    def _iter_keys(self, start: bytes, stop: Optional[bytes], reverse: bool=False) -> Iterator[bytes]:
+        """
+        Iterate keys in ``[start, stop)`` in order.
+
+        :param start: bytes. The first key, inclusive.
+        :param stop: Optional[bytes]. The last key, exclusive. None means no upper bound.
+        :param reverse: bool. If true, iterate from the largest key.
+        """
+        yield from self.db.iterator(start=start, stop=stop, reverse=reverse, include_value=False)
\ No newline at end of file
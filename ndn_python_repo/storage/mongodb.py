@@ -1,19 +1,20 @@
 import base64
-from pymongo import MongoClient, ReplaceOne
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne
 from .storage_base import Storage
-from typing import Optional
+from typing import Iterator, Optional
 
 
 class MongoDBStorage(Storage):
 
-    def __init__(self, db: str, collection: str, uri: str = 'mongodb://127.0.0.1:27017/'):
+    def __init__(self, db: str, collection: str, uri: str = 'mongodb://127.0.0.1:27017/', **kwargs):
         """
         Init a MongoDB storage with unique index on key.
 
         :param db: str. Database name.
         :param collection: str. Collection name.
+        :param kwargs: Options passed to :class:`Storage`.
         """
-        super().__init__()
+        super().__init__(**kwargs)
         self._db = db
         self._collection = collection
         self._uri = uri
@@ -27,7 +28,11 @@ class MongoDBStorage(Storage):
         c_collection = c_db[self._collection]
         c_collection.create_index('key', unique=True)
 
-    def _put(self, key: bytes, value: bytes, expire_time_ms: int=None):
+        # Documents written by older versions do not store the implicit digest
+        for doc in c_collection.find({'digest': {'$exists': False}}, {'key': 1, 'value': 1}):
+            c_collection.update_one({'_id': doc['_id']}, {'$set': {'digest': self._digest_of(doc['value'])}})
+
+    def _put(self, key: bytes, value: bytes, expire_time_ms: int=None, digest: bytes=None):
         """
         Insert document into MongoDB, overwrite if already exists. MongoDB supports prefix search\
             only on strings, so keys are stored in base16 format.
@@ -37,51 +42,63 @@ class MongoDBStorage(Storage):
         :param value: bytes.
         :param expire_time_ms: Optional[int]. This data is marked unfresh after ``expire_time_ms``\
             milliseconds.
+        :param digest: Optional[bytes]. The implicit digest of the data packet.
         """
         key = base64.b16encode(key).decode()
         replace = {
             'key': key,
             'value': value,
             'expire_time_ms': expire_time_ms,
+            'digest': digest,
         }
         self.c_collection.replace_one({'key': key}, replace, upsert=True)
 
-    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]]):
+    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]],
+                   digests: list[Optional[bytes]]=None):
         """
         Batch insert.
 
         :param keys: list[bytes].
         :param values: list[bytes].
         :param expire_time_mss: list[Optional[int]]. The expiration time for each data in ``value``.
+        :param digests: list[Optional[bytes]]. The implicit digest for each data in ``value``.
         """
+        if digests is None:
+            digests = [None] * len(keys)
         keys = [base64.b16encode(key).decode() for key in keys]
         replaces = []
-        for key, value, expire_time_ms in zip(keys, values, expire_time_mss):
+        for key, value, expire_time_ms, digest in zip(keys, values, expire_time_mss, digests):
             replaces.append(ReplaceOne({'key': key}, {
                 'key': key,
                 'value': value,
                 'expire_time_ms': expire_time_ms,
+                'digest': digest,
             }, upsert=True))
         self.c_collection.bulk_write(replaces, ordered=False)
 
-    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False) -> Optional[bytes]:
+    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False, digest: bytes=None) -> Optional[bytes]:
         """
         Get document from MongoDB.
 
         :param key: bytes.
         :param can_be_prefix: bool. If true, use prefix match instead of exact match.
         :param must_be_fresh: bool. If true, ignore expired data.
+        :param digest: Optional[bytes]. If given, only match the data with this implicit digest.
         :return: The value of the data packet.
         """
         key = base64.b16encode(key).decode()
         query = dict()
         if not can_be_prefix:
             query.update({'key': key})
+            if digest is not None:
+                query.update({'digest': digest})
         else:
-            query.update({'key': {'$regex': '^' + key}})
+            # the empty name matches every packet, but not the reserved keys before them
+            query.update({'key': {'$regex': '^' + key, '$gte': base64.b16encode(self.DATA_KEYS_START).decode()}})
         if must_be_fresh:
             query.update({'expire_time_ms': {'$gt': self._time_ms()}})
-        ret = self.c_collection.find_one(query)
+        # base16 preserves the order of keys, return the leftmost match
+        ret = self.c_collection.find_one(query, sort=[('key', ASCENDING)])
         if ret:
             return ret['value']
         else:
@@ -95,4 +112,41 @@ class MongoDBStorage(Storage):
         :return: True if a data packet is being removed.
         """
         key = base64.b16encode(key).decode()
-        return self.c_collection.delete_one({"key": key}).deleted_count > 0
\ No newline at end of file
+        return self.c_collection.delete_one({"key": key}).deleted_count > 0
+
+    def _remove_batch(self, keys: list[bytes]) -> int:
+        """
+        Remove documents from MongoDB in one request.
+
+        :param keys: list[bytes].
+        :return: The number of keys removed.
+        """
+        keys = [base64.b16encode(key).decode() for key in keys]
+        return self.c_collection.delete_many({'key': {'$in': keys}}).deleted_count
+
+    def _exists(self, keys: list[bytes]) -> list[bool]:
+        """
+        Check which keys are stored in MongoDB, regardless of freshness.
+
+        :param keys: list[bytes].
+        :return: list[bool]. Whether each key is stored.
+        """
+        keys = [base64.b16encode(key).decode() for key in keys]
+        found = {doc['key'] for doc in self.c_collection.find({'key': {'$in': keys}}, {'key': 1})}
+        return [key in found for key in keys]
+
+    def _iter_keys(self, start: bytes, stop: Optional[bytes], reverse: bool=False) -> Iterator[bytes]:
+        """
+        Iterate keys in ``[start, stop)`` in order.
+
+        :param start: bytes. The first key, inclusive.
+        :param stop: Optional[bytes]. The last key, exclusive. None means no upper bound.
+        :param reverse: bool. If true, iterate from the largest key.
+        """
+        key_range = {'$gte': base64.b16encode(start).decode()}
+        if stop is not None:
+            key_range['$lt'] = base64.b16encode(stop).decode()
+        cursor = self.c_collection.find({'key': key_range}, {'key': 1}).sort(
+            'key', DESCENDING if reverse else ASCENDING)
+        for doc in cursor:
+            yield base64.b16decode(doc['key'])
\ No newline at end of file
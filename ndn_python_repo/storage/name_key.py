@@ -0,0 +1,101 @@
+from ndn.encoding import Name, NonStrictName, FormalName, TypeNumber, DecodeError
+from ndn.encoding.tlv_var import parse_tl_num
+
+
+class NameKey(bytes):
+    """
+    The storage key of a name: the TLV-VALUE of its Name element, i.e. its encoded components.
+
+    A key is created once per request, e.g. sliced from the raw Interest, and passed down to the\
+        backend as is. Being ``bytes``, its hash is computed once. The component boundaries are\
+        only located when a prefix or the components are needed.
+    """
+    @staticmethod
+    def from_name(name: NonStrictName) -> 'NameKey':
+        """
+        :param name: NonStrictName. A name, or a NameKey returned as is.
+        """
+        if isinstance(name, NameKey):
+            return name
+        return NameKey.from_name_tlv(Name.to_bytes(name))
+
+    @staticmethod
+    def from_name_tlv(wire) -> 'NameKey':
+        """
+        :param wire: bytes. An encoded Name element, with TL.
+        """
+        offset = parse_tl_num(wire, 0)[1]
+        size, size_len = parse_tl_num(wire, offset)
+        offset += size_len
+        return NameKey(wire[offset:offset + size])
+
+    @staticmethod
+    def from_packet(wire) -> 'NameKey':
+        """
+        Slice the name of an encoded Interest or Data packet, where the Name is the first element.
+
+        :param wire: bytes. The packet, with TL.
+        :raises DecodeError: The packet does not start with a Name.
+        """
+        offset = parse_tl_num(wire, 0)[1]
+        offset += parse_tl_num(wire, offset)[1]
+        typ, typ_len = parse_tl_num(wire, offset)
+        if typ != TypeNumber.NAME:
+            raise DecodeError('Packet does not start with a Name')
+        offset += typ_len
+        size, size_len = parse_tl_num(wire, offset)
+        offset += size_len
+        return NameKey(wire[offset:offset + size])
+
+    @property
+    def offsets(self) -> list[int]:
+        """
+        Start offsets of the components, followed by the length of the key.
+        """
+        try:
+            return self._offsets
+        except AttributeError:
+            pass
+        ret = []
+        offset = 0
+        while offset < len(self):
+            ret.append(offset)
+            typ_len = parse_tl_num(self, offset)[1]
+            size, size_len = parse_tl_num(self, offset + typ_len)
+            offset += typ_len + size_len + size
+        ret.append(len(self))
+        self._offsets = ret
+        return ret
+
+    @property
+    def n_components(self) -> int:
+        return len(self.offsets) - 1
+
+    def prefix(self, n: int) -> 'NameKey':
+        """
+        :param n: int. Number of components, negative to count from the end as in slicing.
+        :return: The key of the prefix with ``n`` components.
+        """
+        offsets = self.offsets
+        if n < 0:
+            n += len(offsets) - 1
+        ret = NameKey(self[:offsets[n]])
+        ret._offsets = offsets[:n + 1]
+        return ret
+
+    def component(self, i: int) -> bytes:
+        """
+        :return: The ``i``-th encoded component, with TL.
+        """
+        offsets = self.offsets
+        if i < 0:
+            i += len(offsets) - 1
+        return self[offsets[i]:offsets[i + 1]]
+
+    def to_name(self) -> FormalName:
+        """
+        :return: The components as read-only views into the key, without copying.
+        """
+        view = memoryview(self)
+        offsets = self.offsets
+        return [view[start:end] for start, end in zip(offsets, offsets[1:])]
@@ -0,0 +1,282 @@
+"""
+    Byte quotas and eviction for the repo storage.
+
+    The accounting index is kept in the storage itself under reserved keys, so quota checks only
+    look at in-memory counters and eviction walks an ordered index instead of the database.
+"""
+
+import asyncio as aio
+import json
+import logging
+import struct
+from contextlib import suppress
+from itertools import islice
+from ndn.encoding import Name, NonStrictName, parse_data, TypeNumber
+from typing import Iterator, Optional
+
+
+class StorageQuota:
+    # Keys of Data packets never start with 0x00, see Storage
+    USAGE_KEY = b'\x00quota/usage'
+    META_PREFIX = b'\x00quota/meta/'
+    ORDER_PREFIX = b'\x00quota/order/'
+    EVICTION_POLICIES = ('none', 'lru', 'oldest', 'expired')
+    # Order index entries visited per eviction round, to keep the event loop responsive
+    EVICTION_BATCH = 1000
+    NEVER_EXPIRE = 2 ** 63 - 1
+
+    def __init__(self, storage, config: dict):
+        """
+        Track the bytes stored under the whole repo and under configured prefixes.
+
+        :param storage: Storage. The storage to account for.
+        :param config: dict. The ``quota`` section of ``db_config``, with keys ``max_bytes``\
+            (global quota, 0 means unlimited), ``prefixes`` (mapping from prefix to its quota),\
+            ``eviction`` (one of ``none``, ``lru``, ``oldest``, ``expired``), ``high_watermark``\
+            and ``low_watermark`` (fractions of a quota between which eviction runs).
+        """
+        self.storage = storage
+        self.max_bytes = int(config.get('max_bytes', 0) or 0)
+        self.prefix_limits = {}
+        for prefix, limit in (config.get('prefixes') or {}).items():
+            prefix = Name.to_str(Name.from_str(prefix))
+            self.prefix_limits[prefix] = (bytes(storage._get_name_bytes_wo_tl(Name.from_str(prefix))), int(limit))
+        self.eviction = config.get('eviction', 'none') or 'none'
+        if self.eviction not in self.EVICTION_POLICIES:
+            raise ValueError(f'Unsupported eviction policy: {self.eviction}')
+        self.high_watermark = float(config.get('high_watermark', 0.9))
+        self.low_watermark = float(config.get('low_watermark', 0.8))
+        self.usage = None
+        self.read_times = {}
+        self.eviction_cursor = None
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_enabled(config: Optional[dict]) -> bool:
+        """
+        Whether a ``quota`` section limits anything. Without a limit nor eviction, the accounting\
+            index is not kept at all.
+        """
+        if not config:
+            return False
+        return (int(config.get('max_bytes', 0) or 0) > 0 or bool(config.get('prefixes'))
+                or (config.get('eviction', 'none') or 'none') != 'none')
+
+    ###### accounting
+    def _load(self) -> dict:
+        """
+        Load the usage counters. The index is rebuilt once if it does not cover the configured\
+            prefixes, e.g. when quotas are enabled on an existing database.
+        """
+        if self.usage is None:
+            ret = self.storage._get(self.USAGE_KEY)
+            usage = json.loads(bytes(ret).decode('utf-8')) if ret else None
+            if usage is None or any(prefix not in usage['prefixes'] for prefix in self.prefix_limits):
+                self._rebuild()
+            else:
+                usage['prefixes'] = {prefix: usage['prefixes'][prefix] for prefix in self.prefix_limits}
+                self.usage = usage
+        return self.usage
+
+    def _rebuild(self):
+        self.logger.info('Building storage accounting index')
+        self.storage._remove_batch(list(self.storage._iter_prefix_keys(self.META_PREFIX)) +
+                                   list(self.storage._iter_prefix_keys(self.ORDER_PREFIX)))
+        self.usage = {'total': 0, 'prefixes': {prefix: 0 for prefix in self.prefix_limits}}
+        keys = []
+        sizes = []
+        expire_time_mss = []
+        now = self.storage._time_ms()
+        for key in list(self.storage._iter_keys(self.storage.DATA_KEYS_START, None)):
+            data = self.storage._restore_packet(self.storage._get(key))
+            if not data or data[0] != TypeNumber.DATA:
+                continue
+            _, meta_info, _, _ = parse_data(data)
+            keys.append(bytes(key))
+            sizes.append(len(data))
+            expire_time_mss.append(now + (meta_info.freshness_period or 0))
+            self._add_usage(key, len(data))
+        put_keys, put_values, _ = self.on_write_back(keys, sizes, expire_time_mss)
+        self.storage._put_batch(put_keys, put_values, [None] * len(put_keys))
+
+    def _scopes(self, key: bytes) -> Iterator[str]:
+        for prefix, (prefix_key, _) in self.prefix_limits.items():
+            if key.startswith(prefix_key):
+                yield prefix
+
+    def _add_usage(self, key: bytes, size: int):
+        self.usage['total'] += size
+        for prefix in self._scopes(key):
+            self.usage['prefixes'][prefix] += size
+
+    def _get_meta(self, key: bytes) -> Optional[tuple[int, int, int, int]]:
+        """
+        :return: ``(size, insert_time_ms, expire_time_ms, order_time_ms)`` of a stored packet.\
+            ``order_time_ms`` is where the packet currently is in the eviction order.
+        """
+        ret = self.storage._get(self.META_PREFIX + key)
+        return struct.unpack('!QQQQ', ret) if ret else None
+
+    def _order_key(self, key: bytes, order_time_ms: int) -> bytes:
+        return self.ORDER_PREFIX + struct.pack('!Q', order_time_ms) + key
+
+    def check(self, name: NonStrictName, size: int) -> bool:
+        """
+        Check whether ``size`` more bytes under ``name`` fit in the quotas.
+
+        :param name: NonStrictName.
+        :param size: int.
+        :return: True if the data can be stored.
+        """
+        usage = self._load()
+        if 0 < self.max_bytes < usage['total'] + size:
+            return False
+        if self.prefix_limits:
+            key = bytes(self.storage._get_name_bytes_wo_tl(name))
+            for prefix in self._scopes(key):
+                if usage['prefixes'][prefix] + size > self.prefix_limits[prefix][1]:
+                    return False
+        return True
+
+    def on_put(self, key: bytes, size: int, cached_size: Optional[int]):
+        """
+        Account for a packet written into the write-back cache, replacing the live packet.
+
+        :param cached_size: Optional[int]. Size of the packet it replaces in the cache, if any.
+        """
+        self._load()
+        if cached_size is None:
+            meta = self._get_meta(key)
+            cached_size = meta[0] if meta else 0
+        self._add_usage(key, size - cached_size)
+
+    def on_put_batch(self, keys: list[bytes], sizes: list[int], cached_sizes: list[Optional[int]]):
+        """
+        Same as ``on_put`` for several packets, looking up at once which ones replace a packet\
+            in the backend, so that the index is only read for those.
+        """
+        self._load()
+        uncached = [i for i, cached_size in enumerate(cached_sizes) if cached_size is None]
+        stored = self.storage._exists([self.META_PREFIX + keys[i] for i in uncached])
+        cached_sizes = list(cached_sizes)
+        for i, is_stored in zip(uncached, stored):
+            meta = self._get_meta(keys[i]) if is_stored else None
+            cached_sizes[i] = meta[0] if meta else 0
+        for key, size, cached_size in zip(keys, sizes, cached_sizes):
+            self._add_usage(key, size - cached_size)
+
+    def on_write_back(self, keys: list[bytes], sizes: list[int],
+                      expire_time_mss: list[Optional[int]]) -> tuple[list[bytes], list[bytes], list[bytes]]:
+        """
+        Update the index for packets being written back to the backend. The index is written by\
+            the caller, in the same batches as the packets.
+
+        :return: ``(put_keys, put_values, remove_keys)``. The index entries and usage to write,\
+            and the stale index entries to remove.
+        """
+        self._load()
+        now = self.storage._time_ms()
+        put_keys = []
+        put_values = []
+        remove_keys = []
+
+        def _put_meta(key: bytes, meta: tuple[int, int, int, int]):
+            put_keys.extend([self.META_PREFIX + key, self._order_key(key, meta[3])])
+            put_values.extend([struct.pack('!QQQQ', *meta), b''])
+
+        # the index of a packet is only read if one is stored under its key already
+        stored = self.storage._exists([self.META_PREFIX + key for key in keys])
+        for key, size, expire_time_ms, is_stored in zip(keys, sizes, expire_time_mss, stored):
+            old_meta = self._get_meta(key) if is_stored else None
+            if old_meta:
+                remove_keys.append(self._order_key(key, old_meta[3]))
+            if expire_time_ms is None:
+                expire_time_ms = self.NEVER_EXPIRE
+            _put_meta(key, (size, now, expire_time_ms, expire_time_ms if self.eviction == 'expired' else now))
+            self.read_times.pop(key, None)
+        # move recently read packets to the end of the LRU order
+        for key, read_time_ms in self.read_times.items():
+            meta = self._get_meta(key)
+            if meta:
+                remove_keys.append(self._order_key(key, meta[3]))
+                _put_meta(key, meta[:3] + (read_time_ms, ))
+        self.read_times.clear()
+        put_keys.append(self.USAGE_KEY)
+        put_values.append(json.dumps(self.usage).encode('utf-8'))
+        return put_keys, put_values, remove_keys
+
+    def on_read(self, key: bytes):
+        if self.eviction == 'lru':
+            self.read_times[key] = self.storage._time_ms()
+
+    def on_remove(self, key: bytes, cached_size: Optional[int]=None) -> list[bytes]:
+        """
+        Account for a packet being removed.
+
+        :param cached_size: Optional[int]. Size of the packet if it was still in the write-back\
+            cache, which supersedes the one in the backend.
+        :return: The index entries to remove, together with the packet.
+        """
+        self._load()
+        meta = self._get_meta(key)
+        self.read_times.pop(key, None)
+        if cached_size is not None:
+            self._add_usage(key, -cached_size)
+        elif meta:
+            self._add_usage(key, -meta[0])
+        return [self._order_key(key, meta[3]), self.META_PREFIX + key] if meta else []
+
+    ###### eviction
+    def _over_quota(self, watermark: float) -> list[Optional[bytes]]:
+        """
+        :return: The keys of prefixes using more than ``watermark`` of their quota. None stands\
+            for the global quota.
+        """
+        usage = self._load()
+        ret = []
+        if self.max_bytes > 0 and usage['total'] > self.max_bytes * watermark:
+            ret.append(None)
+        for prefix, (prefix_key, limit) in self.prefix_limits.items():
+            if usage['prefixes'][prefix] > limit * watermark:
+                ret.append(prefix_key)
+        return ret
+
+    def evict(self) -> int:
+        """
+        Run one round of eviction, visiting at most ``EVICTION_BATCH`` index entries.
+
+        :return: The number of packets evicted.
+        """
+        if self.eviction == 'none':
+            return 0
+        if self.eviction_cursor is None and not self._over_quota(self.high_watermark):
+            return 0
+        # entries of the write-back cache are not in the index yet
+        self.storage._write_back()
+        evicted = 0
+        # resume where the last round stopped, since it may have skipped entries of other prefixes
+        start = self.eviction_cursor or self.ORDER_PREFIX
+        order_keys = list(islice(self.storage._iter_keys(
+            start, self.storage._prefix_upper_bound(self.ORDER_PREFIX)), self.EVICTION_BATCH))
+        self.eviction_cursor = bytes(order_keys[-1]) + b'\x00' if len(order_keys) == self.EVICTION_BATCH else None
+        for order_key in order_keys:
+            targets = self._over_quota(self.low_watermark)
+            if not targets:
+                self.eviction_cursor = None
+                break
+            key = bytes(order_key[len(self.ORDER_PREFIX) + 8:])
+            if None in targets or any(key.startswith(t) for t in targets):
+                evicted += self.storage._remove_packet(key)
+        if evicted > 0:
+            self.storage._put(self.USAGE_KEY, json.dumps(self.usage).encode('utf-8'))
+            self.logger.info(f'Evicted {evicted} items by {self.eviction} policy')
+        return evicted
+
+    async def periodic_evict(self, interval: float=1.0):
+        with suppress(aio.CancelledError):
+            while True:
+                self.evict()
+                while self.eviction_cursor is not None:
+                    await aio.sleep(0)
+                    self.evict()
+                await aio.sleep(interval)
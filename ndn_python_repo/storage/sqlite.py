@@ -1,18 +1,20 @@
 import os
 import sqlite3
-from typing import Optional
+from typing import Iterator, Optional
 from .storage_base import Storage
 
 
 class SqliteStorage(Storage):
+    EXISTS_BATCH = 500
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, **kwargs):
         """
         Init table "data" with the attribute ``key`` being the primary key.
 
         :param db_path: str. Path to database file.
+        :param kwargs: Options passed to :class:`Storage`.
         """
-        super().__init__()
+        super().__init__(**kwargs)
         db_path = os.path.expanduser(db_path)
         if len(os.path.dirname(db_path)) > 0 and not os.path.exists(os.path.dirname(db_path)):
             try:
@@ -26,12 +28,20 @@ class SqliteStorage(Storage):
             CREATE TABLE IF NOT EXISTS data (
                 key BLOB PRIMARY KEY,
                 value BLOB,
-                expire_time_ms INTEGER
+                expire_time_ms INTEGER,
+                digest BLOB
             )
         """)
+        # Databases created by older versions do not store the implicit digest
+        columns = [row[1] for row in c.execute('PRAGMA table_info(data)')]
+        if 'digest' not in columns:
+            c.execute('ALTER TABLE data ADD COLUMN digest BLOB')
+            rows = c.execute('SELECT key, value FROM data').fetchall()
+            c.executemany('UPDATE data SET digest = ? WHERE key = ?',
+                          [(self._digest_of(value), key) for key, value in rows])
         self.conn.commit()
 
-    def _put(self, key: bytes, value: bytes, expire_time_ms=None):
+    def _put(self, key: bytes, value: bytes, expire_time_ms=None, digest=None):
         """
         Insert value and its expiration time into sqlite3, overwrite if already exists.
 
@@ -39,32 +49,38 @@ class SqliteStorage(Storage):
         :param value: bytes.
         :param expire_time_ms: Optional[int]. This data is marked unfresh after ``expire_time_ms``\
             milliseconds.
+        :param digest: Optional[bytes]. The implicit digest of the data packet.
         """
         c = self.conn.cursor()
-        c.execute('INSERT OR REPLACE INTO data (key, value, expire_time_ms) VALUES (?, ?, ?)',
-            (key, value, expire_time_ms))
+        c.execute('INSERT OR REPLACE INTO data (key, value, expire_time_ms, digest) VALUES (?, ?, ?, ?)',
+            (key, value, expire_time_ms, digest))
         self.conn.commit()
 
-    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]]):
+    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]],
+                   digests: list[Optional[bytes]]=None):
         """
         Batch insert.
 
         :param keys: list[bytes].
         :param values: list[bytes].
         :param expire_time_mss: list[Optional[int]]. The expiration time for each data in ``value``.
+        :param digests: list[Optional[bytes]]. The implicit digest for each data in ``value``.
         """
+        if digests is None:
+            digests = [None] * len(keys)
         c = self.conn.cursor()
-        c.executemany('INSERT OR REPLACE INTO data (key, value, expire_time_ms) VALUES (?, ?, ?)',
-            zip(keys, values, expire_time_mss))
+        c.executemany('INSERT OR REPLACE INTO data (key, value, expire_time_ms, digest) VALUES (?, ?, ?, ?)',
+            zip(keys, values, expire_time_mss, digests))
         self.conn.commit()
 
-    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False) -> Optional[bytes]:
+    def _get(self, key: bytes, can_be_prefix=False, must_be_fresh=False, digest=None) -> Optional[bytes]:
         """
         Get value from sqlite3.
 
         :param key: bytes.
         :param can_be_prefix: bool. If true, use prefix match instead of exact match.
         :param must_be_fresh: bool. If true, ignore expired data.
+        :param digest: Optional[bytes]. If given, only match the data with this implicit digest.
         :return: The value of the data packet.
         """
         c = self.conn.cursor()
@@ -72,8 +88,18 @@ class SqliteStorage(Storage):
         if must_be_fresh:
             query += f'(expire_time_ms > {self._time_ms()}) AND '
         if can_be_prefix:
-            query += 'hex(key) LIKE ?'
-            c.execute(query, (key.hex() + '%', ))
+            # range scan on the primary key, BLOBs compare with memcmp()
+            upper = self._prefix_upper_bound(key)
+            if upper is None:
+                # the empty name matches every packet, but not the reserved keys before them
+                query += 'key >= ? ORDER BY key LIMIT 1'
+                c.execute(query, (key or self.DATA_KEYS_START, ))
+            else:
+                query += 'key >= ? AND key < ? ORDER BY key LIMIT 1'
+                c.execute(query, (key, upper))
+        elif digest is not None:
+            query += 'key = ? AND digest = ?'
+            c.execute(query, (key, digest))
         else:
             query += 'key = ?'
             c.execute(query, (key, ))
@@ -90,4 +116,49 @@ class SqliteStorage(Storage):
         c = self.conn.cursor()
         n_removed = c.execute('DELETE FROM data WHERE key = ?', (key, )).rowcount
         self.conn.commit()
-        return n_removed > 0
\ No newline at end of file
+        return n_removed > 0
+
+    def _remove_batch(self, keys: list[bytes]) -> int:
+        """
+        Remove values from sqlite in one transaction.
+
+        :param keys: list[bytes].
+        :return: The number of keys removed.
+        """
+        c = self.conn.cursor()
+        n_removed = c.executemany('DELETE FROM data WHERE key = ?', [(key, ) for key in keys]).rowcount
+        self.conn.commit()
+        return n_removed
+
+    def _exists(self, keys: list[bytes]) -> list[bool]:
+        """
+        Check which keys are stored in sqlite3, regardless of freshness.
+
+        :param keys: list[bytes].
+        :return: list[bool]. Whether each key is stored.
+        """
+        c = self.conn.cursor()
+        found = set()
+        # stay below the default limit of host parameters in a statement
+        for i in range(0, len(keys), self.EXISTS_BATCH):
+            batch = keys[i:i + self.EXISTS_BATCH]
+            c.execute(f'SELECT key FROM data WHERE key IN ({", ".join("?" * len(batch))})', batch)
+            found.update(row[0] for row in c)
+        return [key in found for key in keys]
+
+    def _iter_keys(self, start: bytes, stop: Optional[bytes], reverse: bool=False) -> Iterator[bytes]:
+        """
+        Iterate keys in ``[start, stop)`` in order.
+
+        :param start: bytes. The first key, inclusive.
+        :param stop: Optional[bytes]. The last key, exclusive. None means no upper bound.
+        :param reverse: bool. If true, iterate from the largest key.
+        """
+        c = self.conn.cursor()
+        order = 'DESC' if reverse else 'ASC'
+        if stop is None:
+            c.execute(f'SELECT key FROM data WHERE key >= ? ORDER BY key {order}', (start, ))
+        else:
+            c.execute(f'SELECT key FROM data WHERE key >= ? AND key < ? ORDER BY key {order}', (start, stop))
+        for row in c:
+            yield row[0]
\ No newline at end of file
@@ -1,39 +1,95 @@
 import asyncio as aio
 from hashlib import sha256
+import json
 import logging
+import struct
 from contextlib import suppress
 from ndn.encoding.tlv_var import parse_tl_num
-from ndn.encoding import Name, Component, parse_data, NonStrictName
+from ndn.encoding import Name, Component, NonStrictName, FormalName, TypeNumber, MetaInfo, DecodeError
 from ndn.name_tree import NameTrie
 import time
-from typing import Optional
+from .name_key import NameKey
+from .quota import StorageQuota
+from typing import Iterator, Optional
+from ..utils.metrics import REGISTRY
+from ..utils.request_log import RequestLog
+
+
+STORAGE_SECONDS = REGISTRY.histogram('repo_storage_operation_seconds', 'Latency of storage operations', ['op'])
+_GET_SECONDS = STORAGE_SECONDS.labels('get')
+_PUT_SECONDS = STORAGE_SECONDS.labels('put')
+_COMMIT_SECONDS = STORAGE_SECONDS.labels('commit')
+COMMITTED_PACKETS = REGISTRY.counter('repo_storage_committed_packets_total',
+                                     'Data packets written to the database')
+WRITE_BACK_PACKETS = REGISTRY.gauge('repo_write_back_packets', 'Data packets waiting in the write-back cache')
 
 
 class Storage:
     cache = NameTrie()
 
-    def __init__(self):
+    # Keys of Data packets start at this key, the keys before are reserved for bookkeeping
+    DATA_KEYS_START = b'\x01'
+    # Reserved keys used by content-addressed deduplication. Keys of Data packets never start
+    # with 0x00, since it is not a valid name component type.
+    DEDUP_BLOCK_PREFIX = b'\x00dedup/block/'
+    DEDUP_STATS_KEY = b'\x00dedup/stats'
+    # Records pointing to a shared payload block start with this byte instead of TLV-TYPE Data
+    DEDUP_RECORD_MARKER = 0xdd
+    # Payloads smaller than this are not worth a separate block
+    DEDUP_MIN_SIZE = 64
+
+    def __init__(self, dedup: bool=False, version_retention: int=0, quota: Optional[dict]=None):
         """
         Interface for a unified key-value storage API.
+
+        :param dedup: bool. If true, the Content of Data packets is stored once per distinct\
+            SHA-256 digest, and each packet only keeps a record pointing to that block.
+        :param version_retention: int. If positive, only keep this number of latest versions of\
+            each object. Older versions are removed when a new one is written back.
+        :param quota: Optional[dict]. Byte quotas and eviction policy, see :class:`StorageQuota`.\
+            Ignored if it sets no quota and no eviction.
         """
+        self.cache = NameTrie()
+        self.dedup = dedup
+        self.version_retention = version_retention
+        self._dedup_stats = None
+        self._quota_usage_dropped = False
+        self.quota = StorageQuota(self, quota) if StorageQuota.is_enabled(quota) else None
         self.write_back_task = aio.create_task(self._periodic_write_back())
+        self.eviction_task = aio.create_task(self.quota.periodic_evict()) \
+            if self.quota and self.quota.eviction != 'none' else None
         self.logger = logging.getLogger(__name__)
+        self.request_log = RequestLog.get('storage')
+        WRITE_BACK_PACKETS.set_function(self._write_back_size)
 
     def __del__(self):
         self.write_back_task.cancel()
+        if self.eviction_task:
+            self.eviction_task.cancel()
 
-    def _put(self, key: bytes, data: bytes, expire_time_ms: int=None):
+    def _put(self, key: bytes, data: bytes, expire_time_ms: int=None, digest: bytes=None):
         raise NotImplementedError
 
-    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]]):
+    def _put_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss:list[Optional[int]],
+                   digests: list[Optional[bytes]]=None):
         raise NotImplementedError
 
-    def _get(self, key: bytes, can_be_prefix: bool=False, must_be_fresh: bool=False) -> bytes:
+    def _get(self, key: bytes, can_be_prefix: bool=False, must_be_fresh: bool=False,
+             digest: bytes=None) -> bytes:
         raise NotImplementedError
 
     def _remove(self, key: bytes) -> bool:
         raise NotImplementedError
 
+    def _remove_batch(self, keys: list[bytes]) -> int:
+        raise NotImplementedError
+
+    def _exists(self, keys: list[bytes]) -> list[bool]:
+        raise NotImplementedError
+
+    def _iter_keys(self, start: bytes, stop: Optional[bytes], reverse: bool=False) -> Iterator[bytes]:
+        raise NotImplementedError
+
 
     ###### wrappers around key-value store
     async def _periodic_write_back(self):
@@ -43,49 +99,463 @@ class Storage:
                 await aio.sleep(10)
 
     @staticmethod
-    def _get_name_bytes_wo_tl(name: NonStrictName) -> bytes:
+    def _get_name_bytes_wo_tl(name: NonStrictName) -> NameKey:
         # remove name's TL as key to support efficient prefix search
-        name = Name.to_bytes(name)
-        offset = 0
-        offset += parse_tl_num(name, offset)[1]
-        offset += parse_tl_num(name, offset)[1]
-        return name[offset:]
+        return NameKey.from_name(name)
     
+    @staticmethod
+    def scan_data_packet(data: bytes) -> tuple[memoryview, Optional[int]]:
+        """
+        Extract the Name and FreshnessPeriod of an encoded Data packet, without decoding the other\
+            fields.
+
+        :param data: bytes. The Data packet, with TL.
+        :return: The Name element with its TL, and the FreshnessPeriod if any.
+        :raises DecodeError: ``data`` is not a Data packet starting with a Name.
+        """
+        data = memoryview(data)
+        try:
+            typ, typ_len = parse_tl_num(data, 0)
+            size, size_len = parse_tl_num(data, typ_len)
+            offset = typ_len + size_len
+            end = offset + size
+            if typ != TypeNumber.DATA or end > len(data):
+                raise DecodeError('Not a Data packet')
+            # the Name comes first, followed by the optional MetaInfo
+            typ, typ_len = parse_tl_num(data, offset)
+            size, size_len = parse_tl_num(data, offset + typ_len)
+            if typ != TypeNumber.NAME:
+                raise DecodeError('Data packet without Name')
+            name = data[offset:offset + typ_len + size_len + size]
+            offset += len(name)
+            freshness_period = None
+            if offset < end:
+                typ, typ_len = parse_tl_num(data, offset)
+                size, size_len = parse_tl_num(data, offset + typ_len)
+                offset += typ_len + size_len
+                meta_end = offset + size
+                while typ == TypeNumber.META_INFO and offset < meta_end:
+                    inner_typ, typ_len = parse_tl_num(data, offset)
+                    size, size_len = parse_tl_num(data, offset + typ_len)
+                    offset += typ_len + size_len
+                    if inner_typ == TypeNumber.FRESHNESS_PERIOD:
+                        freshness_period = int.from_bytes(data[offset:offset + size], 'big')
+                    offset += size
+        except IndexError:
+            raise DecodeError('Truncated Data packet') from None
+        return name, freshness_period
+
+    @staticmethod
+    def _get_key_of_packet(data: bytes) -> NameKey:
+        return NameKey.from_packet(data)
+
     @staticmethod
     def _time_ms():
         return int(time.time() * 1000)
 
+    @staticmethod
+    def _prefix_upper_bound(prefix: bytes) -> Optional[bytes]:
+        """
+        Get the smallest key that is larger than all keys starting with ``prefix``.
+        Keys of names sort in the NDN canonical order, since each component starts with its TL.
+
+        :return: The upper bound, or None if there is no upper bound.
+        """
+        prefix = bytes(prefix).rstrip(b'\xff')
+        if not prefix:
+            return None
+        return prefix[:-1] + bytes([prefix[-1] + 1])
+
+    def _iter_prefix_keys(self, prefix: bytes, reverse: bool=False) -> Iterator[bytes]:
+        return self._iter_keys(prefix, self._prefix_upper_bound(prefix), reverse)
+
     def _write_back(self):
         keys = []
         values = []
         expire_time_mss = []
-        for name, (data, expire_time_ms) in self.cache.iteritems(prefix=[], shallow=True):
+        digests = []
+        for name, (data, expire_time_ms, digest) in self.cache.iteritems(prefix=[], shallow=True):
             keys.append(self._get_name_bytes_wo_tl(name))
             values.append(data)
             expire_time_mss.append(expire_time_ms)
+            digests.append(digest)
         if len(keys) > 0:
-            self._put_batch(keys, values, expire_time_mss)
-            self.logger.info(f'Cache write back {len(keys)} items')
+            self._commit_batch(keys, values, expire_time_mss, digests, 'Cache write back')
         self.cache = NameTrie()
 
-    def put_data_packet(self, name: NonStrictName, data: bytes):
+    def _write_back_size(self) -> int:
+        return len(self.cache)
+
+    def _commit_batch(self, keys: list[bytes], values: list[bytes], expire_time_mss: list[Optional[int]],
+                      digests: list[Optional[bytes]], reason: str):
+        """
+        Write Data packets to the backend in one batch, maintaining the payload blocks, quota\
+            index and version retention.
+        """
+        start = time.perf_counter()
+        sizes = [len(value) for value in values]
+        remove_keys = []
+        stale = []
+        if self.version_retention > 0:
+            stale, written = self._stale_versions(keys)
+            if written:
+                # packets of old versions are not written at all, only accounted as removed
+                dropped = [i for i, key in enumerate(keys) if bytes(key) in written]
+                if self.quota:
+                    for i in dropped:
+                        remove_keys.extend(self.quota.on_remove(bytes(keys[i]), sizes[i]))
+                kept = [i for i, key in enumerate(keys) if bytes(key) not in written]
+                keys, values, sizes = [keys[i] for i in kept], [values[i] for i in kept], [sizes[i] for i in kept]
+                expire_time_mss, digests = [expire_time_mss[i] for i in kept], [digests[i] for i in kept]
+            if self.quota:
+                for key in set(stale) - written:
+                    remove_keys.extend(self.quota.on_remove(key))
+            remove_keys.extend(stale)
+        if self.dedup:
+            values, dead_blocks = self._dedup_put_batch(keys, values, stale)
+            remove_keys.extend(dead_blocks)
+        index_keys = []
+        index_values = []
+        if self.quota:
+            # the quota index is written in the same batch as the packets
+            index_keys, index_values, superseded = self.quota.on_write_back(keys, sizes, expire_time_mss)
+            remove_keys.extend(superseded)
+        else:
+            self._drop_quota_usage()
+        # old versions, their index entries and released blocks are removed in one batch
+        if remove_keys:
+            self._remove_batch(remove_keys)
+        if keys or index_keys:
+            self._put_batch(keys + index_keys, values + index_values, expire_time_mss + [None] * len(index_keys),
+                            digests + [None] * len(index_keys))
+        _COMMIT_SECONDS.observe(time.perf_counter() - start)
+        COMMITTED_PACKETS.inc(len(keys))
+        if stale:
+            self.logger.info(f'Version retention removed {len(stale)} items')
+        if self.dedup:
+            self.logger.info(f'{reason} {len(keys)} items, dedup ratio {self.get_dedup_ratio():.2f}')
+        else:
+            self.logger.info(f'{reason} {len(keys)} items')
+
+    ###### versions
+    @staticmethod
+    def _component_end(key: bytes, offset: int) -> int:
+        """
+        Get the end offset of the name component starting at ``offset`` in ``key``.
+        """
+        _, typ_len = parse_tl_num(key, offset)
+        size, size_len = parse_tl_num(key, offset + typ_len)
+        return offset + typ_len + size_len + size
+
+    def _latest_version(self, key: NameKey) -> Optional[bytes]:
+        """
+        Find the latest version component right under ``key``, in the cache and in the backend.
+
+        :param key: NameKey.
+        :return: The encoded version component, or None if there is no versioned child.
+        """
+        candidates = []
+
+        if self.cache:
+            n_components = key.n_components
+
+            def _visit(_key_from_path, path, children, *_value):
+                if len(path) > n_components:
+                    return path[-1]
+                return list(children)
+            try:
+                children = self.cache.traverse(_visit, prefix=key.to_name())
+                candidates.extend(bytes(c) for c in children if c[0] == Component.TYPE_VERSION)
+            except KeyError:
+                pass
+
+        # All version components have the same TLV-TYPE byte, and the keys sort in canonical order,
+        # so the last key in this range is under the latest version
+        version_key = key + bytes([Component.TYPE_VERSION])
+        last_key = next(self._iter_prefix_keys(version_key, reverse=True), None)
+        if last_key is not None:
+            candidates.append(bytes(last_key[len(key):self._component_end(last_key, len(key))]))
+        return max(candidates) if candidates else None
+
+    def _stale_versions(self, keys: list[bytes]) -> tuple[list[bytes], set[bytes]]:
+        """
+        Find the packets of all but the latest ``version_retention`` versions of objects having\
+            ``keys`` written, counting the versions stored and the ones being written.
+        The object is the name prefix before the last version component.
+
+        :return: ``(stored, written)``. The keys stored under old versions, and the keys among\
+            ``keys`` under old versions.
+        """
+        objects = {}    # object -> version prefix -> keys written under it
+        for key in keys:
+            offset = 0
+            obj_end = None
+            while offset < len(key):
+                if key[offset] == Component.TYPE_VERSION:
+                    obj_end = offset
+                offset = self._component_end(key, offset)
+            if obj_end is not None:
+                version_prefix = bytes(key[:self._component_end(key, obj_end)])
+                objects.setdefault(bytes(key[:obj_end]), {}).setdefault(version_prefix, []).append(bytes(key))
+
+        stored = []
+        written = set()
+        for obj, written_versions in objects.items():
+            # skip-scan from the latest version downwards, visiting each version once
+            version_key = obj + bytes([Component.TYPE_VERSION])
+            stop = self._prefix_upper_bound(version_key)
+            stored_versions = set()
+            while True:
+                last_key = next(self._iter_keys(version_key, stop, reverse=True), None)
+                if last_key is None:
+                    break
+                version_prefix = bytes(last_key[:self._component_end(last_key, len(obj))])
+                stored_versions.add(version_prefix)
+                stop = version_prefix
+            # encoded version components sort like the versions, as their length comes first
+            versions = sorted(stored_versions | set(written_versions), reverse=True)
+            for version_prefix in versions[self.version_retention:]:
+                if version_prefix in stored_versions:
+                    stored.extend(bytes(key) for key in self._iter_prefix_keys(version_prefix))
+                written.update(written_versions.get(version_prefix, ()))
+        return stored, written
+
+    ###### content-addressed deduplication
+    @staticmethod
+    def _split_content(data: bytes) -> Optional[tuple[int, int]]:
+        """
+        Locate the value of the Content element in an encoded Data packet.
+
+        :param data: bytes. The Data packet, with TL.
+        :return: ``(start, end)`` offsets of the Content value, or None if there is no Content.
+        """
+        _, offset = parse_tl_num(data, 0)
+        _, size_len = parse_tl_num(data, offset)
+        offset += size_len
+        while offset < len(data):
+            typ, typ_len = parse_tl_num(data, offset)
+            size, size_len = parse_tl_num(data, offset + typ_len)
+            offset += typ_len + size_len
+            if typ == TypeNumber.CONTENT:
+                return offset, offset + size
+            offset += size
+        return None
+
+    def _load_dedup_stats(self) -> dict:
+        if self._dedup_stats is None:
+            ret = self._get(self.DEDUP_STATS_KEY)
+            if ret:
+                self._dedup_stats = json.loads(bytes(ret).decode('utf-8'))
+            else:
+                self._dedup_stats = {'logical_bytes': 0, 'physical_bytes': 0}
+        return self._dedup_stats
+
+    def _dedup_put_batch(self, keys: list[bytes], values: list[bytes],
+                         removed: list[bytes]=()) -> tuple[list[bytes], list[bytes]]:
+        """
+        Move the payloads of ``values`` into shared blocks, and return the records to store under\
+            ``keys`` instead. Block refcounts of overwritten and removed records are released.
+
+        :param keys: list[bytes].
+        :param values: list[bytes]. Data packets.
+        :param removed: list[bytes]. Keys of stored packets the caller removes.
+        :return: ``(values, dead_blocks)``. The values to store under ``keys``, and the keys of\
+            the blocks no longer referenced, for the caller to remove.
+        """
+        stats = self._load_dedup_stats()
+        blocks = {}     # digest -> [refcount, payload, existed], loaded lazily from the backend
+        ret = []
+
+        def _block(digest: bytes) -> list:
+            if digest not in blocks:
+                block = self._get(self.DEDUP_BLOCK_PREFIX + digest)
+                if block:
+                    blocks[digest] = [struct.unpack_from('!I', block)[0], bytes(block[4:]), True]
+                else:
+                    blocks[digest] = [0, b'', False]
+            return blocks[digest]
+
+        def _release(old: Optional[bytes]):
+            if old and old[0] == self.DEDUP_RECORD_MARKER:
+                block = _block(bytes(old[1:33]))
+                block[0] -= 1
+                stats['logical_bytes'] -= len(block[1])
+
+        for key in removed:
+            _release(self._get(key))
+        # only the records of packets already stored are read, to release their blocks
+        stored = self._exists(keys)
+        for key, value, is_stored in zip(keys, values, stored):
+            _release(self._get(key) if is_stored else None)
+
+            bounds = self._split_content(value)
+            if bounds is None or bounds[1] - bounds[0] < self.DEDUP_MIN_SIZE:
+                ret.append(value)
+                continue
+            start, end = bounds
+            payload = bytes(value[start:end])
+            digest = sha256(payload).digest()
+            block = _block(digest)
+            block[0] += 1
+            block[1] = payload
+            stats['logical_bytes'] += len(payload)
+            ret.append(struct.pack('!B32sI', self.DEDUP_RECORD_MARKER, digest, start)
+                       + bytes(value[:start]) + bytes(value[end:]))
+
+        block_keys = []
+        block_values = []
+        dead_blocks = []
+        for digest, (refcount, payload, existed) in blocks.items():
+            key = self.DEDUP_BLOCK_PREFIX + digest
+            if refcount > 0:
+                if not existed:
+                    stats['physical_bytes'] += len(payload)
+                block_keys.append(key)
+                block_values.append(struct.pack('!I', refcount) + payload)
+            elif existed:
+                stats['physical_bytes'] -= len(payload)
+                dead_blocks.append(key)
+        block_keys.append(self.DEDUP_STATS_KEY)
+        block_values.append(json.dumps(stats).encode('utf-8'))
+        self._put_batch(block_keys, block_values, [None] * len(block_keys))
+        return ret, dead_blocks
+
+    def _restore_packet(self, value: Optional[bytes]) -> Optional[bytes]:
+        """
+        Reconstruct the Data packet from a stored value, which is either the packet itself, or\
+            a record pointing to a payload block.
+        """
+        if not value or value[0] != self.DEDUP_RECORD_MARKER:
+            return value
+        _, digest, start = struct.unpack_from('!B32sI', value)
+        block = self._get(self.DEDUP_BLOCK_PREFIX + digest)
+        if block is None:
+            self.logger.error(f'Missing payload block {digest.hex()}')
+            return None
+        header = value[37:37 + start]
+        return bytes(header) + bytes(block[4:]) + bytes(value[37 + start:])
+
+    def _digest_of(self, value: Optional[bytes]) -> Optional[bytes]:
+        """
+        Compute the implicit digest of a stored value. Used to fill in the digest of records\
+            written by older versions, which did not store it.
+
+        :return: The SHA-256 digest of the Data packet, or None if ``value`` is not a Data packet.
+        """
+        data = self._restore_packet(value)
+        if data and data[0] == TypeNumber.DATA:
+            return sha256(data).digest()
+        return None
+
+    def _remove_packet(self, key: bytes, cached_size: Optional[int]=None) -> bool:
+        """
+        Remove a stored Data packet, releasing its payload block if it was deduplicated.
+
+        :param cached_size: Optional[int]. Size of the packet removed from the write-back cache\
+            under the same name, if any.
+        """
+        if self.quota:
+            index_keys = self.quota.on_remove(key, cached_size)
+        else:
+            index_keys = []
+            self._drop_quota_usage()
+        old = self._get(key)
+        if old and old[0] == self.DEDUP_RECORD_MARKER:
+            stats = self._load_dedup_stats()
+            block_key = self.DEDUP_BLOCK_PREFIX + bytes(old[1:33])
+            block = self._get(block_key)
+            if block is not None:
+                refcount = struct.unpack_from('!I', block)[0] - 1
+                stats['logical_bytes'] -= len(block) - 4
+                if refcount > 0:
+                    self._put(block_key, struct.pack('!I', refcount) + bytes(block[4:]))
+                else:
+                    stats['physical_bytes'] -= len(block) - 4
+                    self._remove(block_key)
+                self._put(self.DEDUP_STATS_KEY, json.dumps(stats).encode('utf-8'))
+        if not index_keys:
+            return self._remove(key)
+        # the index entries of a stored packet exist, so the packet was removed if more keys were
+        return self._remove_batch(index_keys + [key]) > len(index_keys)
+
+    def _drop_quota_usage(self):
+        """
+        Forget the quota usage recorded, once the stored packets change while quotas are disabled,\
+            so that the accounting index is rebuilt if quotas are enabled again.
+        """
+        if not self._quota_usage_dropped:
+            self._quota_usage_dropped = True
+            self._remove(StorageQuota.USAGE_KEY)
+
+    def get_dedup_ratio(self) -> float:
+        """
+        Get the ratio between the size of all deduplicated payloads and the size actually stored.
+
+        :return: float. 1.0 if nothing has been deduplicated.
+        """
+        stats = self._load_dedup_stats()
+        if stats['physical_bytes'] <= 0:
+            return 1.0
+        return stats['logical_bytes'] / stats['physical_bytes']
+
+    def put_data_packet(self, name: NonStrictName, data: bytes, meta_info: Optional[MetaInfo]=None):
         """
         Insert a data packet named ``name`` with value ``data``.
-        This method will parse ``data`` to get its freshnessPeriod, and compute its expiration time\
-            by adding the freshnessPeriod to the current time.
+        This method will scan ``data`` for its freshnessPeriod, unless ``meta_info`` is given, and\
+            compute its expiration time by adding the freshnessPeriod to the current time.\
+            The implicit digest of ``data`` is computed once here and stored with the packet.
         
         :param name: NonStrictName. The name of the data packet.
         :param data: bytes. The value of the data packet.
+        :param meta_info: Optional[MetaInfo]. The MetaInfo of the data packet, if it has already\
+            been decoded, e.g. when fetching it.
         """
-        _, meta_info, _, _ = parse_data(data)
+        start = time.perf_counter()
+        if meta_info is not None:
+            freshness_period = meta_info.freshness_period
+        else:
+            _, freshness_period = self.scan_data_packet(data)
         expire_time_ms = self._time_ms()
-        if meta_info.freshness_period:
-            expire_time_ms += meta_info.freshness_period
+        if freshness_period:
+            expire_time_ms += freshness_period
 
-        # write data packet and freshness_period to cache
+        # write data packet, freshness_period and implicit digest to cache
         name = Name.normalize(name)
-        self.cache[name] = (data, expire_time_ms)
-        self.logger.info(f'Cache save: {Name.to_str(name)}')
+        if self.quota:
+            cached = self.cache.get(name)
+            self.quota.on_put(self._get_name_bytes_wo_tl(name), len(data), len(cached[0]) if cached else None)
+        self.cache[name] = (data, expire_time_ms, sha256(data).digest())
+        _PUT_SECONDS.observe(time.perf_counter() - start)
+        self.request_log('cache_save', name, size=len(data))
+
+    def put_data_packets(self, packets: list[tuple[FormalName, bytes, Optional[int]]]):
+        """
+        Insert data packets directly into the database in one batch, bypassing the write-back cache.
+        Their names and freshnessPeriods are given by the caller, e.g. as obtained by the fetcher,\
+            so the packets are not parsed again.
+
+        :param packets: list[tuple[FormalName, bytes, Optional[int]]]. The name, value and\
+            freshnessPeriod of each data packet.
+        """
+        keys = []
+        values = []
+        expire_time_mss = []
+        digests = []
+        cached_sizes = []
+        now = self._time_ms()
+        for name, data, freshness_period in packets:
+            key = self._get_name_bytes_wo_tl(name)
+            # the packet supersedes any older one waiting in the cache
+            cached = self.cache.pop(name, None) if self.cache else None
+            cached_sizes.append(len(cached[0]) if cached else None)
+            keys.append(key)
+            values.append(data)
+            expire_time_mss.append(now + (freshness_period or 0))
+            digests.append(sha256(data).digest())
+        if self.quota and keys:
+            self.quota.on_put_batch(keys, [len(value) for value in values], cached_sizes)
+        if len(keys) > 0:
+            self._commit_batch(keys, values, expire_time_mss, digests, 'Batch write')
 
     def get_data_packet(self, name: NonStrictName, can_be_prefix: bool=False,
                         must_be_fresh: bool=False) -> Optional[bytes]:
@@ -99,33 +569,67 @@ class Storage:
         """
         # can_be_prefix must be set to False by default because _delete_single_data would not otherwise be specific enough.
         # must_be_fresh must be set to False by default because we want the delete commands to find data we want deleted, regardless of whether it is fresh or not.
-        name = Name.normalize(name)
-        if Component.get_type(name[-1]) == Component.TYPE_IMPLICIT_SHA256:
-            data = self.get_data_packet(name[:-1], can_be_prefix, must_be_fresh)
-            if sha256(data).digest() == Component.get_value(name[-1]):
-                self.logger.info('Data digest matches the ImplicitSha256Digest')
+        start = time.perf_counter()
+        data = self._get_data_packet(NameKey.from_name(name), can_be_prefix, must_be_fresh)
+        if data is not None and data[0] != TypeNumber.DATA:
+            # a record of the command handles, whose keys are not names
+            data = None
+        if data is not None and self.quota:
+            self.quota.on_read(self._get_key_of_packet(data))
+        _GET_SECONDS.observe(time.perf_counter() - start)
+        return data
+
+    def _get_cached(self, key: NameKey) -> Optional[tuple[bytes, int, bytes]]:
+        # the cache is keyed by components, only split the key if there is anything cached
+        if not self.cache:
+            return None
+        return self.cache.get(key.to_name())
+
+    def _get_data_packet(self, key: NameKey, can_be_prefix: bool, must_be_fresh: bool) -> Optional[bytes]:
+        if key and Component.get_type(key.component(-1)) == Component.TYPE_IMPLICIT_SHA256:
+            # A full name identifies exactly one packet, resolve it by (name, digest)
+            digest = bytes(Component.get_value(key.component(-1)))
+            key = key.prefix(-1)
+            cached = self._get_cached(key)
+            if cached is None:
+                return self._restore_packet(self._get(key, False, must_be_fresh, digest))
+            data, expire_time_ms, cached_digest = cached
+            # The cached packet supersedes the stored one, so no need to look further
+            if cached_digest == digest and (not must_be_fresh or expire_time_ms > self._time_ms()):
+                self.request_log('cache_hit', key)
                 return data
-            else:
-                raise ValueError("Data digest does not match ImplicitSha256Digest")
+            return None
+        elif can_be_prefix:
+            # Following the NDN naming conventions, answer with the latest version if there is any
+            version = self._latest_version(key)
+            if version is not None:
+                data = self._get_data_packet_by_prefix(NameKey(key + version), must_be_fresh)
+                if data is not None:
+                    return data
+            return self._get_data_packet_by_prefix(key, must_be_fresh)
         else:
             # cache lookup
+            cached = self._get_cached(key)
+            # not in cache, lookup in storage
+            if cached is None:
+                return self._restore_packet(self._get(key, False, must_be_fresh))
+            data, expire_time_ms, _ = cached
+            if not must_be_fresh or expire_time_ms > self._time_ms():
+                self.request_log('cache_hit', key)
+                return data
+
+    def _get_data_packet_by_prefix(self, key: NameKey, must_be_fresh: bool) -> Optional[bytes]:
+        # cache lookup
+        if self.cache:
             try:
-                if not can_be_prefix:
-                    data, expire_time_ms = self.cache[name]
+                for data, expire_time_ms, _ in self.cache.itervalues(prefix=key.to_name(), shallow=True):
                     if not must_be_fresh or expire_time_ms > self._time_ms():
-                        self.logger.info('get from cache')
+                        self.request_log('cache_hit', key)
                         return data
-                else:
-                    it = self.cache.itervalues(prefix=name, shallow=True)
-                    while True:
-                        data, expire_time_ms = next(it)
-                        if not must_be_fresh or expire_time_ms > self._time_ms():
-                            self.logger.info('get from cache')
-                            return data
-            # not in cache, lookup in storage
-            except (KeyError, StopIteration):
-                key = self._get_name_bytes_wo_tl(name)
-                return self._get(key, can_be_prefix, must_be_fresh)
+            except KeyError:
+                pass
+        # not in cache, lookup in storage
+        return self._restore_packet(self._get(key, True, must_be_fresh))
 
     def remove_data_packet(self, name: NonStrictName) -> bool:
         """
@@ -135,12 +639,49 @@ class Storage:
         :return: True if a data packet is being removed.
         """
         removed = False
+        cached_size = None
         name = Name.normalize(name)
         try:
-            del self.cache[name]
+            cached_size = len(self.cache.pop(name)[0])
             removed = True
         except KeyError:
             pass
-        if self._remove(self._get_name_bytes_wo_tl(name)):
+        if self._remove_packet(self._get_name_bytes_wo_tl(name), cached_size):
             removed = True
         return removed
+
+    def exists_data_packets(self, names: list[NonStrictName]) -> list[bool]:
+        """
+        Check which data packets are stored, regardless of freshness, with one lookup in the\
+            database for all names not in the write-back cache.
+
+        :param names: list[NonStrictName]. The names of the data packets.
+        :return: list[bool]. Whether each data packet is stored.
+        """
+        ret = []
+        missing = []
+        for name in names:
+            name = Name.normalize(name)
+            if name in self.cache:
+                ret.append(True)
+            else:
+                missing.append(len(ret))
+                ret.append(self._get_name_bytes_wo_tl(name))
+        if missing:
+            found = self._exists([bytes(ret[i]) for i in missing])
+            for i, exists in zip(missing, found):
+                ret[i] = exists
+        return ret
+
+    def check_quota(self, name: NonStrictName, size: int) -> bool:
+        """
+        Check whether a data packet of ``size`` bytes named ``name`` can be inserted without\
+            exceeding the quotas. Handles call this before ``put_data_packet``.
+
+        :param name: NonStrictName. The name of the data packet.
+        :param size: int. The size of the data packet.
+        :return: True if the data packet can be inserted.
+        """
+        if self.quota is None:
+            return True
+        return self.quota.check(name, size)
@@ -5,18 +5,9 @@
     @Date   2020-02-16
 """
 
-from .sqlite import SqliteStorage
-
-# import only supported storage backends
-try:
-    from .leveldb import LevelDBStorage
-except ImportError as exc:
-    pass
-
-try:
-    from .mongodb import MongoDBStorage
-except ImportError as exc:
-    pass
+import importlib
+from . import _OPTIONAL
+from ..utils.lazy import is_missing
 
 
 def create_storage(config):
@@ -26,23 +17,38 @@ def create_storage(config):
     :return: handle
     """
     db_type = config['db_type']
+    options = {
+        'dedup': config.get('dedup', False),
+        'version_retention': config.get('version_retention', 0),
+        'quota': config.get('quota'),
+    }
     
-    try:
-        if db_type == 'sqlite3':
-            db_path = config[db_type]['path']
-            ret = SqliteStorage(db_path)
-        elif db_type == 'leveldb':
-            db_dir = config[db_type]['dir']
-            ret = LevelDBStorage(db_dir)
-        elif db_type == 'mongodb':
-            db_name = config[db_type]['db']
-            db_collection = config[db_type]['collection']
-            db_uri = config[db_type]['uri']
-            ret = MongoDBStorage(db_name, db_collection, db_uri)
-        else:
-            raise NameError()
-
-    except NameError:
+    # a backend is imported only if configured, as its driver may not be installed
+    if db_type == 'sqlite3':
+        from .sqlite import SqliteStorage
+        db_path = config[db_type]['path']
+        ret = SqliteStorage(db_path, **options)
+    elif db_type == 'leveldb':
+        LevelDBStorage = _import_backend(db_type, '.leveldb', 'LevelDBStorage')
+        db_dir = config[db_type]['dir']
+        ret = LevelDBStorage(db_dir, **options)
+    elif db_type == 'mongodb':
+        MongoDBStorage = _import_backend(db_type, '.mongodb', 'MongoDBStorage')
+        db_name = config[db_type]['db']
+        db_collection = config[db_type]['collection']
+        db_uri = config[db_type]['uri']
+        ret = MongoDBStorage(db_name, db_collection, db_uri, **options)
+    else:
         raise NotImplementedError(f'Unsupported database backend: {db_type}')
-    
-    return ret
\ No newline at end of file
+
+    return ret
+
+
+def _import_backend(db_type: str, module: str, name: str):
+    # only a missing driver makes the backend unsupported, other import errors are bugs
+    try:
+        return getattr(importlib.import_module(module, __package__), name)
+    except ImportError as exc:
+        if not is_missing(exc, _OPTIONAL[name]):
+            raise
+        raise NotImplementedError(f'Unsupported database backend: {db_type} ({exc})') from exc
@@ -1,3 +1,29 @@
-from .concurrent_fetcher import concurrent_fetcher, IdNamingConv
-from .pubsub import PubSub
-from .passive_svs import PassiveSvs
\ No newline at end of file
+from .lazy import lazy_exports
+
+_EXPORTS = {
+    'concurrent_fetcher': '.concurrent_fetcher',
+    'IdNamingConv': '.concurrent_fetcher',
+    'FetchScheduler': '.fetch_scheduler',
+    'FetchJob': '.fetch_scheduler',
+    'PubSub': '.pubsub',
+    'PrefixRegistrar': '.prefix_registrar',
+    'PassiveSvs': '.passive_svs',
+    'RequestLog': '.request_log',
+    'config_request_logging': '.request_log',
+    'PROFILER': '.profiler',
+    'Profiler': '.profiler',
+    'timed_callback': '.profiler',
+    'REGISTRY': '.metrics',
+    'MetricsRegistry': '.metrics',
+    'MetricsServer': '.metrics',
+    'Counter': '.metrics',
+    'Gauge': '.metrics',
+    'Histogram': '.metrics',
+    'MANIFEST_COMPONENT': '.manifest',
+    'manifest_name': '.manifest',
+    'full_name': '.manifest',
+    'make_manifest': '.manifest',
+    'DataValidator': '.data_validator',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
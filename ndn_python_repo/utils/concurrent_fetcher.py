@@ -7,10 +7,25 @@
 
 import asyncio as aio
 import logging
+import time
 from ndn.app import NDNApp
 from ndn.types import InterestNack, InterestTimeout, InterestCanceled
 from ndn.encoding import Name, NonStrictName, Component
-from typing import Optional
+from typing import Optional, Union
+from .fetch_scheduler import FetchJob
+from .metrics import REGISTRY
+from .request_log import RequestLog
+
+# Number of ids checked at once for existing data
+EXISTS_WINDOW = 64
+
+FETCH_INTERESTS = REGISTRY.counter('repo_fetch_interests_total', 'Interests sent by fetchers, by outcome',
+                                   ['result'])
+_FETCH_DATA = FETCH_INTERESTS.labels('data')
+_FETCH_NACK = FETCH_INTERESTS.labels('nack')
+_FETCH_TIMEOUT = FETCH_INTERESTS.labels('timeout')
+FETCH_RETRANSMISSIONS = REGISTRY.counter('repo_fetch_retransmissions_total', 'Interests sent again by fetchers')
+FETCH_RTT = REGISTRY.histogram('repo_fetch_rtt_seconds', 'Round-trip time of Interests answered with data')
 
 class IdNamingConv:
     SEGMENT = 1
@@ -18,7 +33,7 @@ class IdNamingConv:
     NUMBER = 3
 
 async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
-                             end_id: Optional[int], semaphore: aio.Semaphore, **kwargs):
+                             end_id: Optional[int], semaphore: Union[aio.Semaphore, FetchJob], **kwargs):
     """
     An async-generator to fetch data packets between "`name`/`start_id`" and "`name`/`end_id`"\
         concurrently.
@@ -28,8 +43,14 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
     :param start_id: int. The start number.
     :param end_id: Optional[int]. The end segment number. If not specified, continue fetching\
         until an interest receives timeout or nack or 3 times.
-    :param semaphore: aio.Semaphore. Semaphore used to fetch data.
-    :return: Yield ``(FormalName, MetaInfo, Content, RawPacket)`` tuples in order.
+    :param semaphore: Union[aio.Semaphore, FetchJob]. Semaphore used to fetch data. Pass a\
+        ``FetchJob`` to share the repo-wide Interest window.
+    :param exists: Optional[Callable[[list[FormalName]], list[bool]]]. Keyword only. If given\
+        together with ``end_id``, it is asked which names of each upcoming window of ids are\
+        already stored, and no Interest is sent for them.
+    :return: Yield ``(FormalName, MetaInfo, Content, RawPacket)`` tuples in order. Skipped ids\
+        are yielded as ``(FormalName, None, None, None)``. A consumer stopping early closes the\
+        generator, e.g. with ``contextlib.aclosing``, so the remaining ids are not fetched.
     """
     name_conv = IdNamingConv.SEGMENT
     max_retries = 15
@@ -37,6 +58,7 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
         name_conv = kwargs['name_conv']
     if 'max_retries' in kwargs:
         max_retries = kwargs['max_retries']
+    exists = kwargs.pop('exists', None)
     cur_id = start_id
     final_id = end_id if end_id is not None else 0x7fffffff
     is_failed = False
@@ -45,7 +67,18 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
     seq_to_data_packet = dict()           # Buffer for out-of-order delivery
     received_or_fail = aio.Event()
     name = Name.normalize(name)
-    logger = logging.getLogger(__name__)
+    request_log = RequestLog.get('fetch')
+
+    def _make_name(seq: int):
+        if name_conv == IdNamingConv.SEGMENT:
+            return name + [Component.from_segment(seq)]
+        elif name_conv == IdNamingConv.SEQUENCE:
+            return name + [Component.from_sequence_num(seq)]
+        elif name_conv == IdNamingConv.NUMBER:
+            # fixme: .from_number apparently requires a second parameter for "type"
+            return name + [Component.from_number(seq)]
+        else:
+            return None
 
     async def _retry(seq: int):
         """
@@ -53,14 +86,8 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
         :param seq: block_id of data
         """
         nonlocal app, name, semaphore, is_failed, received_or_fail, final_id
-        if name_conv == IdNamingConv.SEGMENT:
-            int_name = name + [Component.from_segment(seq)]
-        elif name_conv == IdNamingConv.SEQUENCE:
-            int_name = name + [Component.from_sequence_num(seq)]
-        elif name_conv == IdNamingConv.NUMBER:
-            # fixme: .from_number apparently requires a second parameter for "type"
-            int_name = name + [Component.from_number(seq)]
-        else:
+        int_name = _make_name(seq)
+        if int_name is None:
             logging.error('Unrecognized naming convention')
             return
         trial_times = 0
@@ -68,17 +95,21 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
             trial_times += 1
             # always retry when max_retries is -1
             if 0 <= max_retries < trial_times:
-                semaphore.release()
                 is_failed = True
                 received_or_fail.set()
                 return
+            if trial_times > 1:
+                FETCH_RETRANSMISSIONS.inc()
             try:
-                logger.info('Express Interest: {}'.format(Name.to_str(int_name)))
+                request_log('express', int_name, trial=trial_times)
+                sent_time = time.perf_counter()
                 data_name, meta_info, content, data_bytes = await app.express_interest(
                     int_name, need_raw_packet=True, can_be_prefix=False, lifetime=1000, **kwargs)
+                FETCH_RTT.observe(time.perf_counter() - sent_time)
+                _FETCH_DATA.inc()
 
                 # Save data and update final_id
-                logging.info('Received data: {}'.format(Name.to_str(data_name)))
+                request_log('data', data_name, size=len(data_bytes))
                 if name_conv == IdNamingConv.SEGMENT and \
                     meta_info is not None and \
                     meta_info.final_block_id is not None:
@@ -100,13 +131,14 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
                 seq_to_data_packet[seq] = (data_name, meta_info, content, data_bytes)
                 break
             except InterestNack as e:
-                logging.info(f'Interest {Name.to_str(int_name)} nacked with reason={e.reason}')
+                _FETCH_NACK.inc()
+                request_log('nack', int_name, reason=e.reason)
             except InterestTimeout:
-                logging.info(f'Interest {Name.to_str(int_name)} timeout')
+                _FETCH_TIMEOUT.inc()
+                request_log('timeout', int_name)
             except InterestCanceled:
-                logging.info(f'Interest {Name.to_str(int_name)} (might legally) cancelled')
+                request_log('cancel', int_name)
                 return
-        semaphore.release()
         received_or_fail.set()
 
     async def _dispatch_tasks():
@@ -114,7 +146,19 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
         Dispatch retry() tasks using semaphore.
         """
         nonlocal semaphore, tasks, cur_id, final_id, is_failed
+        stored = {}
         while cur_id <= final_id:
+            if exists is not None and end_id is not None and _make_name(cur_id) is not None:
+                # look up the next window of ids at once
+                if cur_id not in stored:
+                    ids = range(cur_id, min(cur_id + EXISTS_WINDOW, final_id + 1))
+                    stored = dict(zip(ids, exists([_make_name(seq) for seq in ids])))
+                    await aio.sleep(0)
+                if stored.get(cur_id):
+                    seq_to_data_packet[cur_id] = (_make_name(cur_id), None, None, None)
+                    received_or_fail.set()
+                    cur_id += 1
+                    continue
             await semaphore.acquire()
             # in case final_id has been updated while waiting semaphore
             # typically happened after the first round trip when we update 
@@ -129,29 +173,40 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, start_id: int,
                 break
             task = aio.get_event_loop().create_task(_retry(cur_id))
             task.set_name(cur_id)
+            # the slot may be shared with other fetchers through a FetchScheduler, so it is given
+            # back however the task ends, even if it is cancelled before it starts
+            task.add_done_callback(lambda _: semaphore.release())
             tasks.append(task)
             cur_id += 1
 
-    aio.get_event_loop().create_task(_dispatch_tasks())
-    while True:
-        await received_or_fail.wait()
-        received_or_fail.clear()
-        # Re-assemble bytes in order
-        while recv_window + 1 in seq_to_data_packet:
-            yield seq_to_data_packet[recv_window + 1]
-            del seq_to_data_packet[recv_window + 1]
-            recv_window += 1
-        # Return if all data have been fetched, or the fetching process failed
-        if recv_window == final_id:
-            await aio.gather(*tasks)
-            return
-        elif is_failed:
-            await aio.gather(*tasks)
-            # New data may return during gather(), need to check again
-            # TODO: complete misuse of async for & yield. The generator does not make any sense since
-            # all data are already fetched.
+    dispatcher = aio.get_event_loop().create_task(_dispatch_tasks())
+    try:
+        while True:
+            await received_or_fail.wait()
+            received_or_fail.clear()
+            # Re-assemble bytes in order
             while recv_window + 1 in seq_to_data_packet:
                 yield seq_to_data_packet[recv_window + 1]
                 del seq_to_data_packet[recv_window + 1]
                 recv_window += 1
-            return
+            # Return if all data have been fetched, or the fetching process failed
+            if recv_window == final_id:
+                await aio.gather(*tasks)
+                return
+            elif is_failed:
+                await aio.gather(*tasks)
+                # New data may return during gather(), need to check again
+                # TODO: complete misuse of async for & yield. The generator does not make any sense since
+                # all data are already fetched.
+                while recv_window + 1 in seq_to_data_packet:
+                    yield seq_to_data_packet[recv_window + 1]
+                    del seq_to_data_packet[recv_window + 1]
+                    recv_window += 1
+                return
+    finally:
+        # when the consumer stops early, e.g. by breaking out of the loop and closing the
+        # generator, nothing more is fetched
+        dispatcher.cancel()
+        for task in tasks:
+            task.cancel()
+        await aio.gather(dispatcher, *tasks, return_exceptions=True)
@@ -0,0 +1,281 @@
+# -----------------------------------------------------------------------------
+# Verification of the signatures of inserted Data packets.
+#
+# Signatures are verified in batches, on a pool of processes if configured.
+# The keys are obtained from certificates named by the KeyLocators, which are
+# verified up to a trust anchor once and cached.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import base64
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import ECC, RSA
+from Cryptodome.Signature import DSS, pkcs1_15, eddsa
+from ndn.app import NDNApp
+from ndn.app_support.security_v2 import parse_certificate
+from ndn.encoding import Name, FormalName, SignatureType, DecodeError, parse_data
+from ndn.types import InterestNack, InterestTimeout
+from .metrics import REGISTRY
+
+
+VALIDATED = REGISTRY.counter('repo_validated_packets_total', 'Data packets checked by the validator', ['result'])
+_VALID = VALIDATED.labels('valid')
+_INVALID = VALIDATED.labels('invalid')
+VALIDATION_SECONDS = REGISTRY.histogram('repo_validation_seconds', 'Time to verify a batch of packets')
+
+# Signatures verified with a public key
+KEY_SIGNATURES = (SignatureType.SHA256_WITH_ECDSA, SignatureType.SHA256_WITH_RSA, SignatureType.ED25519)
+
+
+# Public keys imported by a process, by their bits
+_imported_keys = {}
+
+
+def _import_key(sig_type: int, key_bits: bytes):
+    key = _imported_keys.get(key_bits)
+    if key is None:
+        if len(_imported_keys) >= 1024:
+            _imported_keys.clear()
+        key = RSA.import_key(key_bits) if sig_type == SignatureType.SHA256_WITH_RSA else ECC.import_key(key_bits)
+        _imported_keys[key_bits] = key
+    return key
+
+
+def _verify_one(sig_type: int, key_bits: bytes, covered: bytes, sig_value: bytes) -> bool:
+    try:
+        key = _import_key(sig_type, key_bits)
+        if sig_type == SignatureType.SHA256_WITH_ECDSA:
+            DSS.new(key, 'fips-186-3', 'der').verify(SHA256.new(covered), sig_value)
+        elif sig_type == SignatureType.SHA256_WITH_RSA:
+            pkcs1_15.new(key).verify(SHA256.new(covered), sig_value)
+        elif sig_type == SignatureType.ED25519:
+            eddsa.new(key, 'rfc8032').verify(covered, sig_value)
+        else:
+            return False
+        return True
+    except (ValueError, TypeError, IndexError):
+        return False
+
+
+def _verify_batch(items: list) -> list[bool]:
+    """
+    Verify a batch of ``(signature_type, key_bits, covered_part, signature_value)``. This function\
+        is run by the processes of the pool, so it has to be defined at the top level.
+    """
+    return [_verify_one(*item) for item in items]
+
+
+def _in_validity_period(signature_info) -> bool:
+    period = getattr(signature_info, 'validity_period', None)
+    if period is None or period.not_before is None or period.not_after is None:
+        return True
+    now = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S').encode()
+    return bytes(period.not_before) <= now <= bytes(period.not_after)
+
+
+class DataValidator:
+    """
+    Verify the signatures of Data packets before they are stored.
+
+    A packet signed with a key is valid if its KeyLocator names a trust anchor, or a certificate\
+        that is itself valid. Certificates are fetched once, and the result of their verification\
+        is cached by KeyLocator. Packets signed with a SHA-256 digest are invalid, as anyone can\
+        compute the digest; they are only stored when listed by a verified manifest.
+    """
+    # Values of ``mode`` in the ``validation`` section of the config
+    MODES = ('none', 'signature')
+    # Longest chain of certificates from a packet to a trust anchor
+    MAX_CHAIN = 8
+    # Seconds a KeyLocator that cannot be verified is remembered
+    NEGATIVE_TTL = 10.0
+
+    def __init__(self, app: NDNApp, anchors: list[bytes], processes: int=0, batch_size: int=64,
+                 cache_size: int=1024, verify_listed: bool=False):
+        """
+        :param app: NDNApp. Used to fetch certificates.
+        :param anchors: list[bytes]. The encoded certificates of the trust anchors.
+        :param processes: int. Number of processes verifying signatures. If 0, signatures are\
+            verified in the event loop.
+        :param batch_size: int. Most signatures verified by one task of the pool.
+        :param cache_size: int. Most KeyLocators whose verification is cached.
+        :param verify_listed: bool. If False, packets listed by a verified manifest are only\
+            checked against the digest in their full name. If True, the key signatures of listed\
+            packets are verified too.
+        """
+        self.app = app
+        self.processes = processes
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self.verify_listed = verify_listed
+        self.pool = None
+        self.logger = logging.getLogger(__name__)
+        # KeyLocator name -> (signature type, key bits), or None with the time it failed
+        self.anchors = {}
+        self.keys = OrderedDict()
+        self.pending_keys = {}
+        for anchor in anchors:
+            cert = parse_certificate(anchor)
+            key_bits = bytes(cert.content)
+            # an anchor may be named by its certificate name or its key name
+            self.anchors[bytes(Name.to_bytes(cert.name))] = key_bits
+            self.anchors[bytes(Name.to_bytes(cert.name[:-2]))] = key_bits
+
+    @staticmethod
+    def from_config(app: NDNApp, config: dict) -> Optional['DataValidator']:
+        """
+        :param app: NDNApp.
+        :param config: dict. The whole config. Uses its ``validation`` section.
+        :return: Optional[DataValidator]. A validator, or None if inserted packets are not verified.
+        """
+        validation_config = config.get('validation') or {}
+        mode = validation_config.get('mode', 'none')
+        if mode not in DataValidator.MODES:
+            raise ValueError(f'Unsupported validation mode: {mode}')
+        if mode == 'none':
+            return None
+        anchors = []
+        for path in validation_config.get('anchors') or []:
+            with open(os.path.expanduser(path), 'rb') as cert_file:
+                cert = cert_file.read()
+            # certificates exported by ndnsec are base64 encoded
+            if not cert.startswith(b'\x06'):
+                cert = base64.b64decode(cert)
+            anchors.append(cert)
+        return DataValidator(app, anchors, int(validation_config.get('processes', 0)),
+                             int(validation_config.get('batch_size', 64)),
+                             int(validation_config.get('cache_size', 1024)),
+                             bool(validation_config.get('verify_listed', False)))
+
+    def close(self):
+        """
+        Stop the processes verifying signatures.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def verify(self, packets: list[bytes]) -> list[bool]:
+        """
+        Verify the signatures of Data packets.
+
+        :param packets: list[bytes]. Encoded Data packets.
+        :return: list[bool]. Whether each packet is valid.
+        """
+        start = time.perf_counter()
+        ret = [False] * len(packets)
+        parsed = []
+        for i, packet in enumerate(packets):
+            try:
+                _, _, _, sig_ptrs = parse_data(packet, with_tl=True)
+            except (DecodeError, IndexError, ValueError, TypeError):
+                continue
+            parsed.append((i, sig_ptrs))
+        # the keys of all packets are looked up at once, as most share few keys
+        key_names = {bytes(Name.to_bytes(sig_ptrs.signature_info.key_locator.name))
+                     for _, sig_ptrs in parsed
+                     if sig_ptrs.signature_info and sig_ptrs.signature_info.signature_type in KEY_SIGNATURES
+                     and sig_ptrs.signature_info.key_locator and sig_ptrs.signature_info.key_locator.name}
+        keys = dict(zip(key_names, await aio.gather(*[self._get_key(Name.from_bytes(key_name))
+                                                      for key_name in key_names])))
+        indices = []
+        items = []
+        for i, sig_ptrs in parsed:
+            sig_info = sig_ptrs.signature_info
+            if sig_info is None:
+                continue
+            # a digest signature authenticates nothing, anyone can compute it
+            if sig_info.signature_type in KEY_SIGNATURES and sig_info.key_locator and sig_info.key_locator.name:
+                covered = b''.join(bytes(part) for part in sig_ptrs.signature_covered_part)
+                key_bits = keys.get(bytes(Name.to_bytes(sig_info.key_locator.name)))
+                if key_bits is not None:
+                    indices.append(i)
+                    items.append((sig_info.signature_type, key_bits, covered, bytes(sig_ptrs.signature_value_buf)))
+        for i, valid in zip(indices, await self._verify_items(items)):
+            ret[i] = valid
+        valid_cnt = sum(ret)
+        _VALID.inc(valid_cnt)
+        _INVALID.inc(len(ret) - valid_cnt)
+        VALIDATION_SECONDS.observe(time.perf_counter() - start)
+        return ret
+
+    async def _verify_items(self, items: list) -> list[bool]:
+        if not items:
+            return []
+        if self.processes <= 0:
+            return _verify_batch(items)
+        if self.pool is None:
+            # imported here, as multiprocessing is only needed with a pool
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(max_workers=self.processes)
+        loop = aio.get_running_loop()
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        results = await aio.gather(*[loop.run_in_executor(self.pool, _verify_batch, batch) for batch in batches])
+        return [valid for result in results for valid in result]
+
+    async def _get_key(self, key_name: FormalName, chain: tuple = ()) -> Optional[bytes]:
+        """
+        Get the key bits of a KeyLocator, fetching and verifying its certificate if it is not cached.
+        Concurrent lookups of the same KeyLocator share one fetch.
+
+        :param chain: tuple. The names of the keys whose certificates are being verified with this\
+            one, from the key of the packet. A chain naming a key twice is never trusted.
+        """
+        key_bytes = bytes(Name.to_bytes(key_name))
+        if key_bytes in self.anchors:
+            return self.anchors[key_bytes]
+        if key_bytes in self.keys:
+            cached = self.keys[key_bytes]
+            self.keys.move_to_end(key_bytes)
+            if isinstance(cached, bytes):
+                return cached
+            if time.monotonic() - cached < self.NEGATIVE_TTL:
+                return None
+            del self.keys[key_bytes]
+        if key_bytes in chain or len(chain) >= self.MAX_CHAIN:
+            # a self-signed certificate that is not an anchor, or a cycle of issuers
+            return None
+        chain = chain + (key_bytes,)
+        if len(chain) > 1:
+            # an issuer is fetched on its own, as a pending fetch of it may be waiting for this chain
+            key_bits = await self._fetch_key(key_name, chain)
+        else:
+            pending = self.pending_keys.get(key_bytes)
+            if pending is None:
+                pending = self.pending_keys[key_bytes] = aio.ensure_future(self._fetch_key(key_name, chain))
+                pending.add_done_callback(lambda _: self.pending_keys.pop(key_bytes, None))
+            key_bits = await aio.shield(pending)
+        self.keys[key_bytes] = key_bits if key_bits is not None else time.monotonic()
+        while len(self.keys) > self.cache_size:
+            self.keys.popitem(last=False)
+        return key_bits
+
+    async def _fetch_key(self, key_name: FormalName, chain: tuple) -> Optional[bytes]:
+        try:
+            _, _, _, cert_bytes = await self.app.express_interest(
+                key_name, need_raw_packet=True, can_be_prefix=True, must_be_fresh=False, lifetime=1000)
+            cert = parse_certificate(cert_bytes)
+            _, _, _, sig_ptrs = parse_data(cert_bytes, with_tl=True)
+        except (InterestNack, InterestTimeout, DecodeError, IndexError, ValueError, TypeError) as exc:
+            self.logger.info(f'Cannot obtain certificate {Name.to_str(key_name)}: {exc}')
+            return None
+        sig_info = sig_ptrs.signature_info
+        if not _in_validity_period(cert.signature_info):
+            self.logger.info(f'Certificate {Name.to_str(cert.name)} is not valid now')
+            return None
+        if sig_info is None or sig_info.signature_type not in KEY_SIGNATURES or not sig_info.key_locator \
+                or not sig_info.key_locator.name:
+            return None
+        issuer_bits = await self._get_key(sig_info.key_locator.name, chain)
+        if issuer_bits is None:
+            return None
+        covered = b''.join(bytes(part) for part in sig_ptrs.signature_covered_part)
+        if not _verify_one(sig_info.signature_type, issuer_bits, covered, bytes(sig_ptrs.signature_value_buf)):
+            self.logger.info(f'Certificate {Name.to_str(cert.name)} has an invalid signature')
+            return None
+        return bytes(cert.content)
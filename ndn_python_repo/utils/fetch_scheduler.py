@@ -0,0 +1,190 @@
+# -----------------------------------------------------------------------------
+# Repo-wide scheduler of outstanding Interests.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from collections import deque
+from typing import Optional
+from .metrics import REGISTRY
+
+
+FETCH_WINDOW = REGISTRY.gauge('repo_fetch_window', 'Interest window of the fetch scheduler', ['state'])
+
+
+class FetchJob:
+    """
+    A fetching job holding slots of the scheduler's Interest window.
+
+    It can be used in place of the ``aio.Semaphore`` given to ``concurrent_fetcher``, or as an\
+        async context manager around a single Interest.
+    """
+    def __init__(self, scheduler: 'FetchScheduler', kind: str, name: str):
+        self.scheduler = scheduler
+        self.kind = kind
+        self.name = name
+        self.waiters = deque()
+        self.in_flight = 0
+        self.fetched = 0
+        self.start_time = time.monotonic()
+
+    async def acquire(self) -> bool:
+        await self.scheduler._acquire(self)
+        return True
+
+    def release(self):
+        self.scheduler._release(self)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Unregister the job from the scheduler's statistics.
+        """
+        self.scheduler.jobs.pop(id(self), None)
+
+    @property
+    def throughput(self) -> float:
+        """
+        Interests completed per second since the job started.
+        """
+        elapsed = time.monotonic() - self.start_time
+        return self.fetched / elapsed if elapsed > 0 else 0.0
+
+
+class _KindState:
+    def __init__(self, weight: int):
+        self.weight = weight
+        self.deficit = 0
+        self.jobs = deque()
+
+
+class FetchScheduler:
+    """
+    Own the total number of outstanding Interests of the repo, and share it among fetching jobs.
+
+    Slots are handed out by deficit round robin among job kinds, in proportion to their weights,\
+        and round robin among the jobs of a kind.
+    """
+    DEFAULT_WEIGHTS = {'insert': 1, 'sync': 1, 'pointer': 1}
+
+    def __init__(self, window: int=64, weights: Optional[dict]=None):
+        """
+        :param window: int. The maximum number of outstanding Interests of the repo.
+        :param weights: Optional[dict]. Share of the window of each job kind when the window is\
+            contended. Kinds not listed have weight 1.
+        """
+        self.window = window
+        self.weights = dict(self.DEFAULT_WEIGHTS)
+        self.weights.update(weights or {})
+        self.in_flight = 0
+        self.kinds = {}
+        self.active = deque()
+        self.jobs = {}
+        self.logger = logging.getLogger(__name__)
+        FETCH_WINDOW.set_function(self._window_metrics)
+
+    @staticmethod
+    def from_config(config: dict) -> 'FetchScheduler':
+        """
+        Create a scheduler from the ``repo_config`` section of the config file.
+        """
+        return FetchScheduler(config.get('fetch_window', 64), config.get('fetch_weights'))
+
+    def job(self, kind: str, name: str='') -> FetchJob:
+        """
+        Create a job fetching on behalf of ``kind``, e.g. ``insert``, ``sync`` or ``pointer``.
+
+        :param kind: str. The kind of the job, which determines its weight.
+        :param name: str. A name shown in the statistics.
+        :return: FetchJob. Close it, or use it as a context manager, once the job finishes.
+        """
+        ret = FetchJob(self, kind, name)
+        self.jobs[id(ret)] = ret
+        return ret
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of Interests waiting for a slot.
+        """
+        return sum(len(job.waiters) for job in self.jobs.values())
+
+    def stats(self) -> dict:
+        """
+        :return: The occupation of the window, queue depth, and per-job throughput.
+        """
+        return {
+            'window': self.window,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'jobs': [{'kind': job.kind, 'name': job.name, 'in_flight': job.in_flight,
+                      'queued': len(job.waiters), 'fetched': job.fetched, 'throughput': job.throughput}
+                     for job in self.jobs.values()],
+        }
+
+    def _window_metrics(self) -> list:
+        return [(('size', ), self.window), (('in_flight', ), self.in_flight), (('queued', ), self.queue_depth)]
+
+    async def _acquire(self, job: FetchJob):
+        if self.in_flight < self.window and not self.active:
+            self._grant(job)
+            return
+        fut = aio.get_running_loop().create_future()
+        job.waiters.append(fut)
+        state = self.kinds.get(job.kind)
+        if state is None:
+            state = self.kinds[job.kind] = _KindState(self.weights.get(job.kind, 1))
+        if len(job.waiters) == 1:
+            state.jobs.append(job)
+            if len(state.jobs) == 1:
+                self.active.append(job.kind)
+        try:
+            await fut
+        except aio.CancelledError:
+            # the slot may have been granted right before cancellation
+            if fut.done() and not fut.cancelled():
+                self._release(job, completed=False)
+            raise
+
+    def _release(self, job: FetchJob, completed: bool=True):
+        self.in_flight -= 1
+        job.in_flight -= 1
+        if completed:
+            job.fetched += 1
+        self._dispatch()
+
+    def _grant(self, job: FetchJob):
+        self.in_flight += 1
+        job.in_flight += 1
+
+    def _dispatch(self):
+        while self.in_flight < self.window and self.active:
+            state = self.kinds[self.active[0]]
+            if state.deficit < 1:
+                state.deficit += state.weight
+            job = state.jobs.popleft()
+            fut = job.waiters.popleft()
+            if not fut.cancelled():
+                self._grant(job)
+                fut.set_result(None)
+                state.deficit -= 1
+            if job.waiters:
+                state.jobs.append(job)
+            if not state.jobs:
+                state.deficit = 0
+                self.active.popleft()
+            elif state.deficit < 1:
+                self.active.rotate(-1)
@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# Lazily imported package exports.
+#
+# A package exports its names through a module ``__getattr__``, so a submodule
+# is only imported the first time one of its names is used. Tools importing a
+# client do not pay for the handles, the storage backends or the validator.
+# -----------------------------------------------------------------------------
+
+import importlib
+from typing import Optional
+
+
+def lazy_exports(package: str, namespace: dict, exports: dict, optional: Optional[dict] = None) -> tuple:
+    """
+    Make the module ``__getattr__`` and ``__dir__`` of a package exporting names of its submodules.
+
+    :param package: str. ``__name__`` of the package.
+    :param namespace: dict. ``globals()`` of the package, where a name is cached once imported.
+    :param exports: dict. Map from an exported name to the relative name of the submodule defining it.
+    :param optional: Optional[dict]. Map from an exported name to the optional dependency it needs.\
+        If that dependency is not installed, the name is reported missing with an ``AttributeError``.\
+        Any other ``ImportError`` propagates.
+    :return: ``(__getattr__, __dir__)``.
+    """
+    optional = optional or {}
+
+    def __getattr__(name: str):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        try:
+            value = getattr(importlib.import_module(module, package), name)
+        except ImportError as exc:
+            if name not in optional or not is_missing(exc, optional[name]):
+                raise
+            raise AttributeError(f'module {package!r} cannot import {name!r}: {exc}') from exc
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
+
+
+def is_missing(exc: ImportError, dependency: str) -> bool:
+    """
+    Whether an ``ImportError`` is caused by an optional dependency not being installed.
+
+    :param exc: ImportError.
+    :param dependency: str. The top-level name of the dependency, e.g. ``plyvel``.
+    """
+    return exc.name is not None and exc.name.split('.')[0] == dependency
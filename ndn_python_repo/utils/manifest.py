@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Manifests of objects whose segments are only signed with SHA-256 digests.
+#
+# A manifest lists the full names, i.e. with the implicit digest, of the
+# segments of an object. Only the root of the manifest is signed with a key,
+# so an object is signed once instead of once per segment. Manifests larger
+# than one packet are split into leaves, listed in turn by the root.
+# -----------------------------------------------------------------------------
+
+from hashlib import sha256
+from ndn.encoding import Name, NonStrictName, FormalName, Component, MetaInfo, BinaryStr, make_data
+from ndn.security import DigestSha256Signer
+from ..command import RepeatedNames
+
+
+# Name component appended to the name of an object to name its manifest
+MANIFEST_COMPONENT = Component.from_str('32=manifest')
+# Largest content of a manifest packet, below the 8800 bytes NDN packets are limited to
+MAX_MANIFEST_SIZE = 8000
+
+
+def manifest_name(name: NonStrictName) -> FormalName:
+    """
+    :param name: NonStrictName. The name of an object.
+    :return: FormalName. The name of the root of its manifest.
+    """
+    return Name.normalize(name) + [MANIFEST_COMPONENT]
+
+
+def full_name(data_bytes: BinaryStr, name: NonStrictName) -> FormalName:
+    """
+    :param data_bytes: BinaryStr. An encoded Data packet.
+    :param name: NonStrictName. The name of this packet.
+    :return: FormalName. The name of the packet followed by its implicit digest.
+    """
+    digest = sha256(data_bytes).digest()
+    return Name.normalize(name) + [Component.from_bytes(digest, Component.TYPE_IMPLICIT_SHA256)]
+
+
+def make_manifest(name: NonStrictName, full_names: list[FormalName],
+                  freshness_period: int) -> tuple[FormalName, bytes, list[bytes]]:
+    """
+    Make the manifest of an object. If the full names do not fit in one packet, they are\
+        listed by leaves ``<name>/32=manifest/<segment>``, signed with SHA-256 digests, and the\
+        root lists the leaves. Leaves are also grouped this way until the root fits in one packet.
+
+    :param name: NonStrictName. The name of the object.
+    :param full_names: list[FormalName]. The full names of the segments of the object.
+    :param freshness_period: int. Freshness of the manifest packets.
+    :return: The name and the content of the root, which is to be signed with a key, and the\
+        encoded leaves, numbered from 0.
+    """
+    root_name = manifest_name(name)
+    meta_info = MetaInfo(freshness_period=freshness_period)
+    leaves = []
+    entries = full_names
+    while True:
+        chunks = []
+        chunk_size = MAX_MANIFEST_SIZE
+        for entry in entries:
+            entry_size = len(Name.encode(entry))
+            if chunk_size + entry_size > MAX_MANIFEST_SIZE:
+                chunks.append([])
+                chunk_size = 0
+            chunks[-1].append(entry)
+            chunk_size += entry_size
+        if len(chunks) <= 1:
+            root = RepeatedNames()
+            root.names = chunks[0] if chunks else []
+            return root_name, bytes(root.encode()), leaves
+        entries = []
+        for chunk in chunks:
+            leaf_name = root_name + [Component.from_segment(len(leaves))]
+            content = RepeatedNames()
+            content.names = chunk
+            leaf = bytes(make_data(leaf_name, meta_info, content.encode(), signer=DigestSha256Signer()))
+            leaves.append(leaf)
+            entries.append(full_name(leaf, leaf_name))
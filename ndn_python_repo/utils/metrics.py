@@ -0,0 +1,249 @@
+# -----------------------------------------------------------------------------
+# Metrics in the Prometheus text exposition format.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import inspect
+import logging
+import math
+import weakref
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str='') -> str:
+    labels = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class _Metric:
+    TYPE = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str]=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+
+    def labels(self, *values) -> '_Metric':
+        """
+        :return: The child metric of the given label values. Keep it to update it on hot paths.
+        """
+        values = tuple(str(v) for v in values)
+        ret = self.children.get(values)
+        if ret is None:
+            ret = self.children[values] = type(self)(self.name, self.documentation)
+            ret._copy_config(self)
+        return ret
+
+    def _copy_config(self, parent: '_Metric'):
+        pass
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+        if self.labelnames:
+            for values, child in list(self.children.items()):
+                lines.extend(child._render_child(self.labelnames, values))
+        else:
+            lines.extend(self._render_child((), ()))
+        return '\n'.join(lines) + '\n'
+
+    def _render_child(self, labelnames: tuple, values: tuple) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, e.g. the number of Interests served.
+    """
+    TYPE = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str]=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+
+    def inc(self, amount: float=1):
+        self.value += amount
+
+    def _render_child(self, labelnames: tuple, values: tuple) -> Iterable[str]:
+        yield f'{self.name}{_format_labels(labelnames, values)} {_format_value(self.value)}'
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. It is either set, or computed by a function when scraped.
+    """
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str]=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable):
+        """
+        Compute the value when scraped.
+
+        :param function: Callable. Returns the value, or for a gauge with labels, an iterable of\
+            ``(label_values, value)``. Bound methods are only weakly referenced, so registering\
+            one does not keep its object alive.
+        """
+        if inspect.ismethod(function):
+            ref = weakref.WeakMethod(function)
+            self.function = lambda: ref()() if ref() is not None else None
+        else:
+            self.function = function
+
+    def render(self) -> str:
+        if self.function is not None and self.labelnames:
+            self.children = {}
+            for values, value in (self.function() or ()):
+                self.labels(*values).set(value)
+        return super().render()
+
+    def _render_child(self, labelnames: tuple, values: tuple) -> Iterable[str]:
+        value = self.value
+        if self.function is not None and not labelnames:
+            value = self.function()
+            if value is None:
+                return
+        yield f'{self.name}{_format_labels(labelnames, values)} {_format_value(value)}'
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values, e.g. latencies in seconds, counted in cumulative buckets.
+    """
+    TYPE = 'histogram'
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                       0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str]=(),
+                 buckets: Iterable[float]=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # the last count is for values above all buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _copy_config(self, parent: 'Histogram'):
+        self.buckets = parent.buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def _render_child(self, labelnames: tuple, values: tuple) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf, ), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            yield f'{self.name}_bucket{_format_labels(labelnames, values, le)} {cumulative}'
+        yield f'{self.name}_sum{_format_labels(labelnames, values)} {_format_value(self.sum)}'
+        yield f'{self.name}_count{_format_labels(labelnames, values)} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    A set of metrics rendered together. Metrics are only formatted when scraped.
+    """
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f'Metric {metric.name} already registered differently')
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str]=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str]=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str]=(),
+                  buckets: Iterable[float]=Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return ''.join(metric.render() for metric in list(self.metrics.values()))
+
+
+# The registry of all metrics of the repo
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """
+    Serve the metrics of a registry over HTTP, on ``GET /metrics``.
+    """
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, registry: MetricsRegistry=REGISTRY, addr: str='127.0.0.1', port: int=9469):
+        self.registry = registry
+        self.addr = addr
+        self.port = port
+        self.server = None
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def from_config(config: dict) -> Optional['MetricsServer']:
+        """
+        :param config: dict. The whole config. Uses its ``metrics`` section, if enabled.
+        :return: Optional[MetricsServer]. A server to start, or None if metrics are disabled.
+        """
+        metrics_config = config.get('metrics') or {}
+        if not metrics_config.get('enabled', False):
+            return None
+        return MetricsServer(REGISTRY, metrics_config.get('addr', '127.0.0.1'),
+                             int(metrics_config.get('port', 9469)))
+
+    async def start(self):
+        self.server = await aio.start_server(self._on_connection, self.addr, self.port)
+        self.logger.info(f'Metrics serving on {self.server.sockets[0].getsockname()}')
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    async def _on_connection(self, reader: aio.StreamReader, writer: aio.StreamWriter):
+        try:
+            request = await aio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+            method, path = request.split(b' ', 2)[:2]
+            if method != b'GET':
+                status, body = '405 Method Not Allowed', b''
+            elif path.split(b'?')[0] != b'/metrics':
+                status, body = '404 Not Found', b''
+            else:
+                status, body = '200 OK', self.registry.render().encode('utf-8')
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {self.CONTENT_TYPE}\r\n'
+                         f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('ascii') + body)
+            await writer.drain()
+        except (aio.IncompleteReadError, aio.LimitOverrunError, aio.TimeoutError, ValueError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
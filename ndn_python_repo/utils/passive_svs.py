@@ -14,6 +14,7 @@ from ndn.encoding import Name, NonStrictName, DecodeError, FormalName, BinaryStr
     parse_tl_num, UintField
 from ndn.encoding.ndn_format_0_3 import TypeNumber
 from ndn.utils import gen_nonce
+from .profiler import timed_callback
 
 OnMissingDataFunc = Callable[["PassiveSvs"], None]
 r"""
@@ -83,6 +84,7 @@ class PassiveSvs:
         # do not await for this
         self.ndn_app.express_raw_interest(final_name, interest_param, wire)
 
+    @timed_callback('PassiveSvs.sync_handler')
     def sync_handler(self, name: FormalName, _param: InterestParam, _app_param: BinaryStr | None,
                      raw_packet: BinaryStr) -> None:
         if len(name) != len(self.base_prefix) + 2:
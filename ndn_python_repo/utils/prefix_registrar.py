@@ -0,0 +1,132 @@
+# -----------------------------------------------------------------------------
+# Pipelined prefix registration with the local forwarder.
+#
+# NFD rejects a command Interest whose timestamp is not larger than the one of
+# the previous command signed by the same key. Commands are therefore sent in
+# order, at least one millisecond apart, so their timestamps increase, and
+# several of them are in flight at once instead of one per round trip.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from ndn.app import NDNApp
+from ndn.app_support.nfd_mgmt import make_command, parse_response
+from ndn.encoding import Name, NonStrictName, DecodeError
+from ndn.types import InterestNack, InterestTimeout, InterestCanceled
+from .metrics import REGISTRY
+
+
+REGISTRATIONS = REGISTRY.counter('repo_prefix_commands_total', 'Prefix commands sent to the forwarder',
+                                 ['command', 'result'])
+
+
+class PrefixRegistrar:
+    """
+    Send prefix registration commands to the forwarder in the background, with at most\
+        ``window`` commands in flight and ``rate`` commands sent per second.
+    """
+    # Number of times a command is sent before giving up
+    RETRIES = 3
+
+    def __init__(self, app: NDNApp, window: int=16, rate: float=200.0):
+        """
+        :param app: NDNApp.
+        :param window: int. Most commands waiting for a response.
+        :param rate: float. Most commands sent per second, at most 1000 so that the timestamps\
+            of the commands increase.
+        """
+        self.app = app
+        self.window = max(1, window)
+        self.interval = max(1.0 / rate if rate > 0 else 0.0, 0.001)
+        self.logger = logging.getLogger(__name__)
+        self.queue = aio.Queue()
+        self.slots = None
+        self.worker = None
+        self.last_sent = 0.0
+        self.in_flight = set()
+
+    @staticmethod
+    def from_config(app: NDNApp, config: dict) -> 'PrefixRegistrar':
+        """
+        Create a registrar from the ``repo_config`` section of the config file.
+        """
+        return PrefixRegistrar(app, config.get('register_window', 16), config.get('register_rate', 200.0))
+
+    def register(self, name: NonStrictName):
+        """
+        Register ``name`` with the forwarder. Returns immediately.
+        """
+        self._submit('register', Name.normalize(name))
+
+    def unregister(self, name: NonStrictName):
+        """
+        Unregister ``name`` from the forwarder. Returns immediately.
+        """
+        self._submit('unregister', Name.normalize(name))
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of commands not answered yet.
+        """
+        return self.queue.qsize() + len(self.in_flight)
+
+    async def join(self):
+        """
+        Wait until all commands submitted are answered, or given up.
+        """
+        while self.pending:
+            await self.queue.join()
+            if self.in_flight:
+                await aio.wait(list(self.in_flight))
+
+    def _submit(self, command: str, name, attempt: int=0):
+        self.queue.put_nowait((command, name, attempt))
+        if self.worker is None or self.worker.done():
+            self.slots = self.slots or aio.Semaphore(self.window)
+            self.worker = aio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            command, name, attempt = await self.queue.get()
+            try:
+                await self.slots.acquire()
+                # keep the commands at least ``interval`` apart, so their timestamps increase
+                delay = self.last_sent + self.interval - time.monotonic()
+                if delay > 0:
+                    await aio.sleep(delay)
+                self.last_sent = time.monotonic()
+                task = aio.create_task(self._send(command, name, attempt))
+                self.in_flight.add(task)
+                task.add_done_callback(self._on_done)
+            finally:
+                self.queue.task_done()
+
+    def _on_done(self, task):
+        self.in_flight.discard(task)
+        self.slots.release()
+
+    async def _send(self, command: str, name, attempt: int):
+        try:
+            _, _, reply = await self.app.express_interest(
+                make_command('rib', command, self.app.face, name=name), lifetime=1000)
+            ret = parse_response(reply)
+        except (InterestNack, InterestTimeout, InterestCanceled):
+            # sent again through the queue, with a new timestamp
+            if attempt + 1 < self.RETRIES:
+                self._submit(command, name, attempt + 1)
+                return
+            self.logger.error(f'{command} {Name.to_str(name)} failed: no response')
+            REGISTRATIONS.labels(command, 'failed').inc()
+            return
+        except (DecodeError, IndexError, ValueError, TypeError) as exc:
+            self.logger.error(f'{command} {Name.to_str(name)} failed: {exc}')
+            REGISTRATIONS.labels(command, 'failed').inc()
+            return
+        if ret['status_code'] != 200:
+            self.logger.error(f'{command} {Name.to_str(name)} failed: {ret["status_code"]} {ret["status_text"]}')
+            REGISTRATIONS.labels(command, 'failed').inc()
+            return
+        self.logger.debug(f'{command} {Name.to_str(name)}: OK')
+        REGISTRATIONS.labels(command, 'ok').inc()
@@ -0,0 +1,250 @@
+# -----------------------------------------------------------------------------
+# Profiling hooks of the repo daemon, toggled at runtime.
+# -----------------------------------------------------------------------------
+
+import asyncio as aio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as _Counter
+from contextlib import suppress
+from typing import Callable, Optional
+
+
+class _CallbackStats:
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class Profiler:
+    """
+    Profile the event loop while active, and dump a report to a file when stopped.
+
+    While active, the profiler records:
+
+    * a ``cProfile`` profile of the event loop thread (mode ``cprofile``), or stacks of the event\
+        loop thread sampled by a background thread (mode ``sample``), which costs much less;
+    * the wall time of callbacks decorated with :func:`timed_callback`;
+    * event loop stalls, i.e. a callback holding the loop for longer than ``stall_threshold``\
+        seconds, with the stack of the loop at that time.
+    """
+    MODES = ('cprofile', 'sample')
+
+    def __init__(self, output_dir: str='.', mode: str='cprofile', stall_threshold: float=0.1,
+                 sample_interval: float=0.005):
+        """
+        :param output_dir: str. Directory where reports are written.
+        :param mode: str. ``cprofile`` or ``sample``.
+        :param stall_threshold: float. Time in seconds the loop can be held before it is flagged.
+        :param sample_interval: float. Time in seconds between two samples in mode ``sample``.
+        """
+        self.output_dir = output_dir
+        self.mode = mode
+        self.stall_threshold = stall_threshold
+        self.sample_interval = sample_interval
+        self.active = False
+        self.callbacks = {}
+        self.stalls = []
+        self.samples = _Counter()
+        self.profile = None
+        self.start_time = None
+        self.heartbeat = 0.0
+        self.heartbeat_task = None
+        self.watchdog = None
+        self.loop_thread_id = None
+        self.logger = logging.getLogger(__name__)
+
+    def configure(self, output_dir: Optional[str]=None, mode: Optional[str]=None,
+                  stall_threshold: Optional[float]=None):
+        if mode is not None and mode not in self.MODES:
+            raise ValueError(f'Unsupported profiling mode: {mode}')
+        self.output_dir = output_dir if output_dir is not None else self.output_dir
+        self.mode = mode if mode is not None else self.mode
+        self.stall_threshold = stall_threshold if stall_threshold is not None else self.stall_threshold
+
+    def start(self):
+        """
+        Start profiling. Must be called from the event loop thread.
+        """
+        if self.active:
+            return
+        self.callbacks = {}
+        self.stalls = []
+        self.samples = _Counter()
+        self.start_time = time.time()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.heartbeat_task = aio.get_running_loop().create_task(self._beat())
+        if self.mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.active = True
+        self.watchdog = threading.Thread(target=self._watch, name='repo-profiler', daemon=True)
+        self.watchdog.start()
+        self.logger.info(f'Profiling started in mode {self.mode}')
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the report.
+
+        :return: Optional[str]. The path of the report, if profiling was active.
+        """
+        if not self.active:
+            return None
+        self.active = False
+        if self.profile is not None:
+            self.profile.disable()
+        # the loop may already be closed when stopping on exit
+        with suppress(RuntimeError):
+            self.heartbeat_task.cancel()
+        self.watchdog.join()
+        path = self.write_report()
+        self.profile = None
+        self.logger.info(f'Profiling stopped, report written to {path}')
+        return path
+
+    def toggle(self):
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def install_signal_handler(self, signum: int=getattr(signal, 'SIGUSR1', None)) -> bool:
+        """
+        Toggle profiling when the process receives ``signum``, SIGUSR1 by default.
+
+        :return: bool. False if signals are not supported, e.g. on Windows.
+        """
+        if signum is None:
+            return False
+        try:
+            aio.get_running_loop().add_signal_handler(signum, self.toggle)
+        except NotImplementedError:
+            return False
+        return True
+
+    def record_callback(self, name: str, elapsed: float):
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = _CallbackStats()
+        stats.add(elapsed)
+
+    async def _beat(self):
+        # the watchdog sees a stall when this task cannot run in time
+        interval = self.stall_threshold / 4
+        while True:
+            self.heartbeat = time.monotonic()
+            await aio.sleep(interval)
+
+    def _loop_stack(self) -> list[str]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return []
+        return [f'{summary.filename}:{summary.lineno}({summary.name})'
+                for summary in traceback.extract_stack(frame)]
+
+    def _watch(self):
+        interval = self.sample_interval if self.mode == 'sample' else self.stall_threshold / 4
+        stalled_since = None
+        while self.active:
+            time.sleep(interval)
+            if self.mode == 'sample':
+                stack = self._loop_stack()
+                if stack:
+                    self.samples[';'.join(stack)] += 1
+            lag = time.monotonic() - self.heartbeat
+            if lag > self.stall_threshold:
+                if stalled_since is None:
+                    stalled_since = self.heartbeat
+                    stack = self._loop_stack()
+                    self.stalls.append({'time': time.time(), 'stack': stack})
+                    self.logger.warning(f'Event loop stalled for over {self.stall_threshold}s at '
+                                        f'{stack[-1] if stack else "unknown"}')
+            elif stalled_since is not None:
+                self.stalls[-1]['duration'] = self.heartbeat - stalled_since
+                stalled_since = None
+
+    def write_report(self) -> str:
+        """
+        Write the report of the last profiling session into ``output_dir``.
+
+        :return: str. The path of the text report. A ``.pstats`` file loadable by ``pstats`` is\
+            written next to it in mode ``cprofile``, and a ``.folded`` file of the sampled stacks\
+            for flame graph tools in mode ``sample``.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, time.strftime('repo-profile-%Y%m%d-%H%M%S',
+                                                           time.localtime(self.start_time)))
+        out = io.StringIO()
+        out.write(f'Profiling session of {time.time() - self.start_time:.1f}s in mode {self.mode}\n\n')
+        out.write('Callback wall time:\n')
+        out.write(f'{"callback":<40} {"calls":>10} {"total (s)":>12} {"mean (ms)":>10} {"max (ms)":>10}\n')
+        for name, stats in sorted(self.callbacks.items(), key=lambda item: -item[1].total):
+            out.write(f'{name:<40} {stats.count:>10} {stats.total:>12.3f} '
+                      f'{stats.total / stats.count * 1000:>10.3f} {stats.max * 1000:>10.3f}\n')
+        out.write(f'\nEvent loop stalls over {self.stall_threshold}s: {len(self.stalls)}\n')
+        for stall in self.stalls:
+            duration = stall.get('duration')
+            out.write(f'\n{time.strftime("%H:%M:%S", time.localtime(stall["time"]))} '
+                      f'{f"{duration:.3f}s" if duration is not None else "ongoing"}\n')
+            out.write(''.join(f'  {line}\n' for line in stall['stack']))
+        if self.profile is not None:
+            self.profile.dump_stats(base + '.pstats')
+            out.write('\nTop functions by cumulative time:\n')
+            pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(50)
+        if self.samples:
+            with open(base + '.folded', 'w') as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f'{stack} {count}\n')
+            total = sum(self.samples.values())
+            out.write(f'\nTop sampled frames of {total} samples:\n')
+            leaves = _Counter()
+            for stack, count in self.samples.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            for frame, count in leaves.most_common(50):
+                out.write(f'{count / total * 100:>6.2f}% {frame}\n')
+        with open(base + '.txt', 'w') as f:
+            f.write(out.getvalue())
+        return base + '.txt'
+
+
+# The profiler of the repo daemon
+PROFILER = Profiler()
+
+
+def timed_callback(name: str) -> Callable:
+    """
+    Record the wall time of a callback in :data:`PROFILER` while it is active.
+
+    :param name: str. The name of the callback in the report.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.active:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record_callback(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -18,6 +18,7 @@ from ndn.app import NDNApp
 from ndn.encoding import TlvModel, ModelField, NameField, BytesField
 from ndn.encoding import Name, NonStrictName, Component, InterestParam
 from ndn.name_tree import NameTrie
+from .profiler import timed_callback
 from ndn.types import InterestNack, InterestTimeout
 import os
 
@@ -183,6 +184,7 @@ class PubSub(object):
             await self.app.register(to_register, self._on_notify_interest)
             self.logger.info(f'Subscribing to topic: {Name.to_str(topic)}')
 
+    @timed_callback('PubSub._on_notify_interest')
     def _on_notify_interest(self, int_name, int_param, app_param):
         aio.ensure_future(self._process_notify_interest(int_name, int_param, app_param))
 
@@ -0,0 +1,153 @@
+# -----------------------------------------------------------------------------
+# Per-request logging for the packet paths.
+# -----------------------------------------------------------------------------
+
+import json
+import logging
+import logging.handlers
+import queue
+from ndn.encoding import Name
+from typing import Optional
+
+
+ACCESS_LOGGER = 'ndn_python_repo.access'
+
+
+class _LazyName:
+    """
+    Formats a name only when a handler actually emits the record.
+    """
+    __slots__ = ('name', )
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        name = self.name
+        if name is None:
+            return '-'
+        # a storage key is decoded into components by itself
+        if hasattr(name, 'to_name'):
+            name = name.to_name()
+        return Name.to_str(name)
+
+
+class _LazyMessage:
+    __slots__ = ('event', 'name', 'fields')
+
+    def __init__(self, event: str, name, fields: dict):
+        self.event = event
+        self.name = _LazyName(name)
+        self.fields = fields
+
+    def __str__(self):
+        ret = f'{self.event} {self.name}'
+        if self.fields:
+            ret += ' ' + ' '.join(f'{k}={v}' for k, v in self.fields.items())
+        return ret
+
+
+class RequestLog:
+    """
+    Logger of per-packet events of one category, e.g. ``read`` or ``fetch``.
+
+    Events are logged as DEBUG messages of the logger ``ndn_python_repo.requests.<category>``,\
+        and as JSON lines in the access log if it is enabled. Nothing is formatted on the event\
+        loop unless a handler emits the event, and only one of every ``1 / sample_rate`` events\
+        of the category is logged.
+    """
+    _instances = {}
+    # shared by all categories, set by config_request_logging
+    access_logger = None
+
+    def __init__(self, category: str):
+        self.category = category
+        self.logger = logging.getLogger(f'ndn_python_repo.requests.{category}')
+        self.stride = 1
+        self.count = 0
+
+    @staticmethod
+    def get(category: str) -> 'RequestLog':
+        """
+        :param category: str. The category, sharing one sampling rate.
+        :return: RequestLog. The same instance for all callers of a category.
+        """
+        ret = RequestLog._instances.get(category)
+        if ret is None:
+            ret = RequestLog._instances[category] = RequestLog(category)
+        return ret
+
+    def set_sample_rate(self, rate: float):
+        """
+        :param rate: float. Fraction of events logged, from 0 (none) to 1 (all).
+        """
+        self.stride = round(1 / rate) if rate > 0 else 0
+        self.count = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether events may be logged at all. Callers can check it before computing costly fields.
+        """
+        return self.stride > 0 and (self.access_logger is not None or self.logger.isEnabledFor(logging.DEBUG))
+
+    def __call__(self, event: str, name=None, **fields):
+        """
+        Log an event.
+
+        :param event: str. What happened, e.g. ``serve`` or ``timeout``.
+        :param name: The name concerned, as a NonStrictName or a storage key. Only formatted\
+            when the event is emitted.
+        :param fields: Other values of the event, which must be JSON serializable.
+        """
+        if not self.enabled:
+            return
+        self.count += 1
+        if self.count < self.stride:
+            return
+        self.count = 0
+        msg = _LazyMessage(event, name, fields)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg)
+        if self.access_logger is not None:
+            self.access_logger.info(msg, extra={'category': self.category})
+
+
+class _AccessLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        msg = record.msg
+        ret = {'ts': round(record.created, 6), 'cat': record.category, 'ev': msg.event, 'name': str(msg.name)}
+        ret.update(msg.fields)
+        return json.dumps(ret, separators=(',', ':'), default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # enqueue the record as is, so it is formatted by the listener thread
+        return record
+
+
+def config_request_logging(config: dict) -> Optional[logging.handlers.QueueListener]:
+    """
+    Configure request logging from the ``requests`` section of ``logging_config``.
+
+    :param config: dict. With keys ``sample`` (mapping from category to its sample rate) and\
+        ``access_log`` (path of the access log file, no access log if not given).
+    :return: Optional[QueueListener]. The thread writing the access log, to be stopped on exit.
+    """
+    for category, rate in (config.get('sample') or {}).items():
+        RequestLog.get(category).set_sample_rate(float(rate))
+    access_log = config.get('access_log')
+    if not access_log:
+        return None
+    file_handler = logging.FileHandler(access_log)
+    file_handler.setFormatter(_AccessLogFormatter())
+    records = queue.SimpleQueue()
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    access_logger.addHandler(_QueueHandler(records))
+    listener = logging.handlers.QueueListener(records, file_handler)
+    listener.start()
+    RequestLog.access_logger = access_logger
+    return listener
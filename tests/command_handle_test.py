@@ -0,0 +1,89 @@
+import asyncio as aio
+from ndn.app import NDNApp
+from ndn.encoding import Name, InterestParam, make_interest, parse_data
+from ndn.security import KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo.clients import CommandChecker
+from ndn_python_repo.command import RepoCommandRes, RepoStatCode, RepoStatQuery
+from ndn_python_repo.handle import CommandHandle
+
+
+class TestCheckLongPoll:
+    @staticmethod
+    def test_main():
+        request_no = b'\x01' * 32
+        check_name = Name.from_str('/repo/insert check')
+
+        def check_interest(wait_status):
+            query = RepoStatQuery()
+            query.request_no = request_no
+            query.wait_status = wait_status
+            return make_interest(check_name, InterestParam(must_be_fresh=True, lifetime=4000), query.encode())
+
+        def reply_status(face: DummyFace) -> int:
+            _, _, content, _ = parse_data(face.output_buf)
+            face.output_buf = b''
+            return RepoCommandRes.parse(content).status_code
+
+        async def face_proc(face: DummyFace):
+            handle = CommandHandle(app, None, None, {})
+            app.set_interest_filter(check_name, handle._on_check_interest)
+            stat = RepoCommandRes()
+            stat.request_no = request_no
+            stat.status_code = RepoStatCode.IN_PROGRESS
+            handle.m_processes[request_no] = stat
+
+            # a plain check is answered at once
+            await face.input_packet(check_interest(None))
+            await aio.sleep(0.01)
+            assert reply_status(face) == RepoStatCode.IN_PROGRESS
+
+            # a check waiting for the status to change is answered when it does
+            await face.input_packet(check_interest(RepoStatCode.IN_PROGRESS))
+            await aio.sleep(0.05)
+            assert face.output_buf == b''
+            stat.status_code = RepoStatCode.COMPLETED
+            handle.report_status(request_no)
+            await aio.sleep(0.01)
+            assert reply_status(face) == RepoStatCode.COMPLETED
+
+            # or at once if it already has
+            await face.input_packet(check_interest(RepoStatCode.IN_PROGRESS))
+            await aio.sleep(0.01)
+            assert reply_status(face) == RepoStatCode.COMPLETED
+
+        face = DummyFace(face_proc)
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop())
+
+
+class TestCheckUnanswered:
+    @staticmethod
+    def test_main():
+        request_no = b'\x02' * 32
+
+        async def main():
+            checker = CommandChecker(None)
+            checker.RETRY_INTERVAL = 0
+            replies = []
+
+            async def _check(*_args):
+                # checks lost on the way, before the final status
+                if len(replies) < 10:
+                    replies.append(None)
+                    return None
+                response = RepoCommandRes()
+                response.request_no = request_no
+                response.status_code = RepoStatCode.COMPLETED
+                return response
+            checker._check = _check
+            # unanswered checks do not stop waiting by default
+            response = await checker.wait_for_finish('insert', '/repo', request_no)
+            assert response.status_code == RepoStatCode.COMPLETED
+            # unless a limit is given
+            replies.clear()
+            assert await checker.wait_for_finish('insert', '/repo', request_no, max_unanswered=5) is None
+            assert len(replies) == 5
+
+        aio.run(main())
@@ -1,10 +1,12 @@
 import abc
 import asyncio as aio
+from contextlib import aclosing
 from ndn.app import NDNApp
-from ndn.encoding import Name
+from ndn.encoding import Name, Component, MetaInfo, make_data, parse_interest, parse_tl_num
 from ndn.transport.dummy_face import DummyFace
-from ndn.security import KeychainDigest
+from ndn.security import KeychainDigest, DigestSha256Signer
 from ndn_python_repo.utils.concurrent_fetcher import concurrent_fetcher
+from ndn_python_repo.utils.fetch_scheduler import FetchScheduler
 
 
 class ConcurrentFetcherTestSuite(object):
@@ -46,3 +48,56 @@ class TestConcurrentFetcherBasic(ConcurrentFetcherTestSuite):
         semaphore = aio.Semaphore(1)
         async for (data_name, _, _, _) in concurrent_fetcher(self.app, Name.from_str('/test_concurrent_fetcher'), 0, 0, semaphore, nonce=None):
             assert Name.to_str(data_name) == '/test_concurrent_fetcher/seg=0'
+
+
+class TestConcurrentFetcherSkipExisting(ConcurrentFetcherTestSuite):
+    async def face_proc(self, face: DummyFace):
+        # only the segment not stored is fetched
+        await face.consume_output(b'\x05"\x07\x1c\x08\x17test_concurrent_fetcher\x32\x01\x02\x0c\x02\x03\xe8',
+                                  timeout=1)
+        await face.input_packet(make_data(Name.from_str('/test_concurrent_fetcher/seg=2'), MetaInfo(),
+                                          b'Hello, world!', signer=DigestSha256Signer()))
+
+    async def app_main(self):
+        semaphore = aio.Semaphore(1)
+        received = []
+        async for (data_name, _, _, data_bytes) in concurrent_fetcher(
+                self.app, Name.from_str('/test_concurrent_fetcher'), 0, 2, semaphore, nonce=None,
+                exists=lambda names: [Component.to_number(name[-1]) < 2 for name in names]):
+            received.append((Name.to_str(data_name), data_bytes is not None))
+        assert received == [('/test_concurrent_fetcher/seg=0', False), ('/test_concurrent_fetcher/seg=1', False),
+                            ('/test_concurrent_fetcher/seg=2', True)]
+
+
+class TestConcurrentFetcherClose(ConcurrentFetcherTestSuite):
+    async def face_proc(self, face: DummyFace):
+        # only the first segments are answered, the Interests for the others stay pending
+        self.expressed = []
+        while face.running:
+            await aio.sleep(0.001)
+            buf, face.output_buf = face.output_buf, b''
+            while buf:
+                _, typ_len = parse_tl_num(buf)
+                size, size_len = parse_tl_num(buf, typ_len)
+                int_name = parse_interest(buf[:typ_len + size_len + size])[0]
+                buf = buf[typ_len + size_len + size:]
+                self.expressed.append(Component.to_number(int_name[-1]))
+                if Component.to_number(int_name[-1]) < 2:
+                    await face.input_packet(make_data(int_name, MetaInfo(), b'Hello, world!',
+                                                      signer=DigestSha256Signer()))
+
+    async def app_main(self):
+        scheduler = FetchScheduler(window=4)
+        with scheduler.job('insert') as job:
+            async with aclosing(concurrent_fetcher(self.app, Name.from_str('/test_concurrent_fetcher'), 0, 99,
+                                                   job, nonce=None)) as fetcher:
+                async for (data_name, _, _, _) in fetcher:
+                    assert Component.to_number(data_name[-1]) == 0
+                    break
+        # the slots of all Interests are given back, including tasks cancelled before they started
+        assert scheduler.in_flight == 0
+        # and the rest of the range is not fetched
+        expressed = len(self.expressed)
+        await aio.sleep(0.05)
+        assert len(self.expressed) == expressed < 10
+        self.app.shutdown()
@@ -0,0 +1,227 @@
+import asyncio as aio
+from datetime import datetime, timezone
+import pytest
+from Cryptodome.PublicKey import ECC
+from ndn.app import NDNApp
+from ndn.app_support.security_v2 import derive_cert, self_sign
+from ndn.encoding import Name, Component, MetaInfo, make_data, parse_data, parse_interest, parse_tl_num
+from ndn.security import DigestSha256Signer, KeychainDigest, Sha256WithEcdsaSigner
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo.handle import ReadHandle, WriteCommandHandle
+from ndn_python_repo.storage import BatchWriter, SqliteStorage
+from ndn_python_repo.utils import DataValidator, full_name, make_manifest
+
+
+def _key(key_name):
+    key = ECC.generate(curve='P-256')
+    return (key.public_key().export_key(format='DER'),
+            Sha256WithEcdsaSigner(key_name, key.export_key(format='DER')))
+
+
+class TestDataValidator:
+    @staticmethod
+    def test_main(tmp_path):
+        anchor_key_name = Name.from_str('/test/KEY/%01')
+        anchor_pub, anchor_signer = _key(anchor_key_name)
+        anchor = bytes(self_sign(anchor_key_name, anchor_pub, anchor_signer)[1])
+        # a key certified by the anchor, whose certificate is fetched
+        key_name = Name.from_str('/test/alice/KEY/%02')
+        pub, signer = _key(key_name)
+        cert = bytes(derive_cert(key_name, Component.from_str('anchor'), pub, anchor_signer,
+                                 datetime.now(timezone.utc), 3600)[1])
+        # a key nobody certified
+        unknown_pub, unknown_signer = _key(Name.from_str('/test/mallory/KEY/%03'))
+
+        def _data(name, content, data_signer):
+            return bytes(make_data(Name.from_str(name), MetaInfo(), content, signer=data_signer))
+
+        valid = _data('/test/alice/valid', b'valid', signer)
+        tampered = valid.replace(b'valid', b'bogus')
+        digest = _data('/test/alice/digest', b'digest', DigestSha256Signer())
+        unknown = _data('/test/mallory/unknown', b'unknown', unknown_signer)
+        fetched = []
+
+        async def face_proc(face: DummyFace):
+            # a producer serving the certificate of alice
+            cert_name = parse_data(cert)[0]
+            while face.running:
+                await aio.sleep(0.001)
+                buf, face.output_buf = face.output_buf, b''
+                while buf:
+                    _, typ_len = parse_tl_num(buf)
+                    size, size_len = parse_tl_num(buf, typ_len)
+                    int_name = parse_interest(buf[:typ_len + size_len + size])[0]
+                    buf = buf[typ_len + size_len + size:]
+                    fetched.append(Name.to_str(int_name))
+                    if Name.is_prefix(int_name, cert_name):
+                        await face.input_packet(cert)
+
+        async def app_main():
+            validator = DataValidator(app, [anchor])
+            # a digest signature authenticates nothing
+            assert await validator.verify([valid, tampered, digest, unknown, b'\x06\x00']) == \
+                [True, False, False, False, False]
+            # the certificate of alice is fetched once, and the anchor never
+            assert await validator.verify([valid, valid]) == [True, True]
+            assert fetched.count(Name.to_str(key_name)) == 1
+            assert not any(name.startswith('/test/KEY') for name in fetched)
+
+            # invalid packets are not committed, nor reported
+            storage = SqliteStorage(str(tmp_path / 'sqlite3.db'))
+            flushed = []
+            async with BatchWriter(storage, on_flush=flushed.extend, validator=validator) as writer:
+                for tag, packet in enumerate([valid, unknown, digest]):
+                    writer.put(parse_data(packet)[0], packet, None, tag)
+            assert flushed == [0]
+            assert writer.rejected == 2
+            assert storage.get_data_packet(parse_data(unknown)[0]) is None
+            assert storage.get_data_packet(parse_data(digest)[0]) is None
+            # in order, nothing after an invalid packet is reported
+            flushed = []
+            async with BatchWriter(storage, max_packets=2, on_flush=flushed.extend, validator=validator,
+                                   in_order=True) as writer:
+                for tag, packet in enumerate([valid, valid, tampered, valid, digest]):
+                    writer.put(parse_data(packet)[0], packet, None, tag)
+            assert flushed == [0, 1]
+            assert writer.rejected == 3
+
+            # the same results with a pool of processes
+            pool_validator = DataValidator(app, [anchor], processes=1, batch_size=2)
+            try:
+                assert await pool_validator.verify([valid, tampered, digest, unknown, valid]) == \
+                    [True, False, False, False, True]
+            finally:
+                pool_validator.close()
+            results.append(True)
+            app.shutdown()
+
+        results = []
+        face = DummyFace(face_proc)
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
+
+
+class TestCertificateLoop:
+    @staticmethod
+    def test_main():
+        anchor_key_name = Name.from_str('/test/KEY/%01')
+        anchor_pub, anchor_signer = _key(anchor_key_name)
+        anchor = bytes(self_sign(anchor_key_name, anchor_pub, anchor_signer)[1])
+        # a self-signed certificate that is not an anchor
+        bob_key_name = Name.from_str('/test/bob/KEY/%04')
+        bob_pub, bob_signer = _key(bob_key_name)
+        # two certificates naming each other as issuer
+        carol_key_name = Name.from_str('/test/carol/KEY/%05')
+        carol_pub, carol_signer = _key(carol_key_name)
+        dave_key_name = Name.from_str('/test/dave/KEY/%06')
+        dave_pub, dave_signer = _key(dave_key_name)
+        now = datetime.now(timezone.utc)
+        certs = [bytes(self_sign(bob_key_name, bob_pub, bob_signer)[1]),
+                 bytes(derive_cert(carol_key_name, Component.from_str('dave'), carol_pub, dave_signer, now, 3600)[1]),
+                 bytes(derive_cert(dave_key_name, Component.from_str('carol'), dave_pub, carol_signer, now, 3600)[1])]
+        packets = [bytes(make_data(Name.from_str(f'/test/loop/{i}'), MetaInfo(), b'loop', signer=data_signer))
+                   for i, data_signer in enumerate([bob_signer, carol_signer, dave_signer])]
+
+        async def face_proc(face: DummyFace):
+            while face.running:
+                await aio.sleep(0.001)
+                buf, face.output_buf = face.output_buf, b''
+                while buf:
+                    _, typ_len = parse_tl_num(buf)
+                    size, size_len = parse_tl_num(buf, typ_len)
+                    int_name = parse_interest(buf[:typ_len + size_len + size])[0]
+                    buf = buf[typ_len + size_len + size:]
+                    for cert in certs:
+                        if Name.is_prefix(int_name, parse_data(cert)[0]):
+                            await face.input_packet(cert)
+
+        async def app_main():
+            try:
+                # each on its own, then all at once, so that the lookups of carol and dave overlap
+                for batch in [packets[:1], packets[1:2], packets]:
+                    validator = DataValidator(app, [anchor])
+                    assert await aio.wait_for(validator.verify(batch), 5) == [False] * len(batch)
+                results.append(True)
+            finally:
+                app.shutdown()
+
+        results = []
+        face = DummyFace(face_proc)
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
+
+
+class TestValidationConfig:
+    @staticmethod
+    def test_main():
+        assert DataValidator.from_config(None, {}) is None
+        assert DataValidator.from_config(None, {'validation': {'mode': 'none'}}) is None
+        validator = DataValidator.from_config(None, {'validation': {'mode': 'signature', 'processes': 2}})
+        assert validator.processes == 2
+        # a typo does not silently change the mode
+        with pytest.raises(ValueError):
+            DataValidator.from_config(None, {'validation': {'mode': 'signatures'}})
+        assert not validator.verify_listed
+
+
+class TestListedDigest:
+    @staticmethod
+    def test_main(tmp_path):
+        anchor_key_name = Name.from_str('/test/KEY/%01')
+        anchor_pub, anchor_signer = _key(anchor_key_name)
+        anchor = bytes(self_sign(anchor_key_name, anchor_pub, anchor_signer)[1])
+        # segments signed with digests, listed by a manifest signed with the anchor
+        name = Name.from_str('/test/listed')
+        segments = [bytes(make_data(name + [Component.from_segment(i)], MetaInfo(), b'segment',
+                                    signer=DigestSha256Signer())) for i in range(3)]
+        root_name, root_content, _ = make_manifest(
+            name, [full_name(seg, name + [Component.from_segment(i)]) for i, seg in enumerate(segments)], 0)
+        served = {Name.to_str(parse_data(seg)[0]): seg for seg in segments}
+        served[Name.to_str(root_name)] = bytes(make_data(root_name, MetaInfo(), root_content, signer=anchor_signer))
+        # the same manifest signed with a digest
+        forged_name = Name.from_str('/test/forged')
+        forged_root_name, forged_root_content, _ = make_manifest(
+            forged_name, [full_name(segments[0], name + [Component.from_segment(0)])], 0)
+        served[Name.to_str(forged_root_name)] = bytes(make_data(forged_root_name, MetaInfo(), forged_root_content,
+                                                                signer=DigestSha256Signer()))
+
+        async def face_proc(face: DummyFace):
+            while face.running:
+                await aio.sleep(0.001)
+                buf, face.output_buf = face.output_buf, b''
+                while buf:
+                    _, typ_len = parse_tl_num(buf)
+                    size, size_len = parse_tl_num(buf, typ_len)
+                    int_name = parse_interest(buf[:typ_len + size_len + size])[0]
+                    buf = buf[typ_len + size_len + size:]
+                    if Component.get_type(int_name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+                        int_name = int_name[:-1]
+                    if Name.to_str(int_name) in served:
+                        await face.input_packet(served[Name.to_str(int_name)])
+
+        async def app_main():
+            config = {'repo_config': {'register_root': False}}
+            storage = SqliteStorage(str(tmp_path / 'sqlite3.db'))
+            validator = DataValidator(app, [anchor], verify_listed=True)
+            handle = WriteCommandHandle(app, storage, None, ReadHandle(app, storage, config), config,
+                                        validator=validator)
+            # the segments are authenticated by the digests the verified manifest lists
+            assert await handle.fetch_manifest_data(root_name, None)
+            assert storage.get_data_packet(name + [Component.from_segment(2)]) == segments[2]
+            # a manifest signed with a digest authenticates nothing
+            handle.MANIFEST_RETRIES = 1
+            assert not await handle.fetch_manifest_data(forged_root_name, None)
+            assert storage.get_data_packet(forged_root_name) is None
+            results.append(True)
+            app.shutdown()
+
+        results = []
+        face = DummyFace(face_proc)
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
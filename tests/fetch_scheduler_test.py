@@ -0,0 +1,71 @@
+import asyncio as aio
+from ndn_python_repo.utils import FetchScheduler
+
+
+class TestFetchScheduler:
+    @staticmethod
+    def test_window():
+        aio.run(TestFetchScheduler.window_body())
+
+    @staticmethod
+    async def window_body():
+        scheduler = FetchScheduler(window=2)
+        with scheduler.job('insert', '/a') as job:
+            await job.acquire()
+            await job.acquire()
+            waiter = aio.create_task(job.acquire())
+            await aio.sleep(0)
+            assert not waiter.done()
+            assert scheduler.queue_depth == 1
+            job.release()
+            await aio.sleep(0)
+            assert waiter.done()
+            assert scheduler.in_flight == 2 and scheduler.queue_depth == 0
+            job.release()
+            job.release()
+            assert scheduler.in_flight == 0
+            assert scheduler.stats()['jobs'][0]['fetched'] == 3
+        assert scheduler.stats()['jobs'] == []
+
+    @staticmethod
+    def test_weighted_sharing():
+        aio.run(TestFetchScheduler.weighted_sharing_body())
+
+    @staticmethod
+    async def weighted_sharing_body():
+        scheduler = FetchScheduler(window=1, weights={'insert': 2, 'sync': 1})
+        order = []
+        insert_jobs = [scheduler.job('insert', f'/insert/{i}') for i in range(2)]
+        sync_job = scheduler.job('sync', '/sync')
+        blocker = scheduler.job('pointer', '/blocker')
+        await blocker.acquire()
+
+        async def _fetch(job):
+            async with job:
+                order.append(job.name)
+
+        tasks = [aio.create_task(_fetch(job)) for job in insert_jobs + [sync_job] for _ in range(3)]
+        await aio.sleep(0)
+        assert scheduler.queue_depth == 9
+        blocker.release()
+        await aio.gather(*tasks)
+        # insert gets twice the share of sync, and its jobs take turns
+        assert order[:6] == ['/insert/0', '/insert/1', '/sync', '/insert/0', '/insert/1', '/sync']
+
+    @staticmethod
+    def test_cancel():
+        aio.run(TestFetchScheduler.cancel_body())
+
+    @staticmethod
+    async def cancel_body():
+        scheduler = FetchScheduler(window=1)
+        job = scheduler.job('insert')
+        await job.acquire()
+        waiter = aio.create_task(job.acquire())
+        await aio.sleep(0)
+        waiter.cancel()
+        await aio.sleep(0)
+        job.release()
+        assert scheduler.in_flight == 0
+        await job.acquire()
+        assert scheduler.in_flight == 1
@@ -0,0 +1,145 @@
+import asyncio as aio
+from hashlib import sha256
+from ndn.app import NDNApp
+from ndn.encoding import Name, Component, MetaInfo, make_data, parse_data, parse_interest, parse_tl_num
+from ndn.security import DigestSha256Signer, KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn.types import InterestCanceled
+from ndn_python_repo.command import RepeatedNames
+from ndn_python_repo.handle import ReadHandle, WriteCommandHandle
+from ndn_python_repo.storage import SqliteStorage
+from ndn_python_repo.utils import full_name, make_manifest, manifest_name
+from ndn_python_repo.utils.manifest import MAX_MANIFEST_SIZE
+
+
+def _segments(name, count):
+    return [bytes(make_data(name + [Component.from_segment(i)], MetaInfo(), str(i).encode(),
+                            signer=DigestSha256Signer())) for i in range(count)]
+
+
+class TestSmallManifest:
+    @staticmethod
+    def test_main():
+        name = Name.from_str('/test/small')
+        segments = _segments(name, 3)
+        full_names = [full_name(seg, name + [Component.from_segment(i)]) for i, seg in enumerate(segments)]
+        root_name, root_content, leaves = make_manifest(name, full_names, 0)
+        assert root_name == manifest_name(name)
+        assert leaves == []
+        assert RepeatedNames.parse(root_content).names == full_names
+        assert bytes(Component.get_value(full_names[1][-1])) == sha256(segments[1]).digest()
+
+
+class TestLargeManifest:
+    @staticmethod
+    def test_main():
+        name = Name.from_str('/test/large')
+        full_names = [full_name(seg, name + [Component.from_segment(i)])
+                      for i, seg in enumerate(_segments(name, 1000))]
+        root_name, root_content, leaves = make_manifest(name, full_names, 0)
+        assert len(leaves) > 1
+        # the root lists the leaves, and the leaves list the segments in order
+        listed = []
+        root_names = RepeatedNames.parse(root_content).names
+        assert len(root_names) == len(leaves)
+        for leaf_full_name, leaf in zip(root_names, leaves):
+            leaf_name, _, content, _ = parse_data(leaf)
+            assert leaf_full_name == full_name(leaf, leaf_name)
+            assert Name.is_prefix(root_name, leaf_name)
+            assert len(content) <= MAX_MANIFEST_SIZE
+            listed.extend(RepeatedNames.parse(content).names)
+        assert listed == full_names
+
+
+class TestManifestFetch:
+    @staticmethod
+    def test_main(tmp_path):
+        name = Name.from_str('/test/manifest_fetch/with/a/long/enough/name')
+        segments = _segments(name, 200)
+        full_names = [full_name(seg, name + [Component.from_segment(i)]) for i, seg in enumerate(segments)]
+        root_name, root_content, leaves = make_manifest(name, full_names, 0)
+        assert leaves
+        served = {Name.to_str(root_name): bytes(make_data(root_name, MetaInfo(), root_content,
+                                                          signer=DigestSha256Signer()))}
+        for packet in segments + leaves:
+            served[Name.to_str(parse_data(packet)[0])] = packet
+        # another object, whose last segment is replaced
+        bad_name = Name.from_str('/test/manifest_fetch/bad')
+        bad_segments = _segments(bad_name, 3)
+        bad_full_names = [full_name(seg, bad_name + [Component.from_segment(i)]) for i, seg in enumerate(bad_segments)]
+        bad_root_name, bad_root_content, _ = make_manifest(bad_name, bad_full_names, 0)
+        served[Name.to_str(bad_root_name)] = bytes(make_data(bad_root_name, MetaInfo(), bad_root_content,
+                                                             signer=DigestSha256Signer()))
+        for packet in bad_segments:
+            served[Name.to_str(parse_data(packet)[0])] = packet
+        served[Name.to_str(bad_name + [Component.from_segment(2)])] = bytes(make_data(
+            bad_name + [Component.from_segment(2)], MetaInfo(), b'tampered', signer=DigestSha256Signer()))
+
+        # another object, whose listed packets cannot be fetched
+        canceled_name = Name.from_str('/test/manifest_fetch/canceled')
+        canceled_segments = _segments(canceled_name, 100)
+        canceled_root_name, canceled_root_content, _ = make_manifest(
+            canceled_name, [full_name(seg, canceled_name + [Component.from_segment(i)])
+                            for i, seg in enumerate(canceled_segments)], 0)
+        served[Name.to_str(canceled_root_name)] = bytes(make_data(canceled_root_name, MetaInfo(),
+                                                                  canceled_root_content, signer=DigestSha256Signer()))
+
+        async def face_proc(face: DummyFace):
+            # a producer answering every Interest with the packet of its name
+            while face.running:
+                await aio.sleep(0.001)
+                buf, face.output_buf = face.output_buf, b''
+                while buf:
+                    _, typ_len = parse_tl_num(buf)
+                    size, size_len = parse_tl_num(buf, typ_len)
+                    int_name = parse_interest(buf[:typ_len + size_len + size])[0]
+                    buf = buf[typ_len + size_len + size:]
+                    if Component.get_type(int_name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+                        int_name = int_name[:-1]
+                    if Name.to_str(int_name) in served:
+                        await face.input_packet(served[Name.to_str(int_name)])
+
+        async def app_main():
+            config = {'repo_config': {'register_root': False}}
+            storage = SqliteStorage(str(tmp_path / 'sqlite3.db'))
+            handle = WriteCommandHandle(app, storage, None, ReadHandle(app, storage, config), config)
+            stored = []
+            assert await handle.fetch_manifest_data(root_name, None, on_stored=lambda: stored.append(1))
+            assert len(stored) == len(segments) + len(leaves) + 1
+            for i, segment in enumerate(segments):
+                assert storage.get_data_packet(name + [Component.from_segment(i)]) == segment
+            assert storage.get_data_packet(root_name) == served[Name.to_str(root_name)]
+            # packets already stored are not fetched again
+            del served[Name.to_str(name + [Component.from_segment(0)])]
+            stored = []
+            assert await handle.fetch_manifest_data(root_name, None, on_stored=lambda: stored.append(1))
+            assert len(stored) == len(segments) + len(leaves) + 1
+            # a packet stored under a listed name but with another digest is fetched again
+            seg_name = name + [Component.from_segment(1)]
+            storage.put_data_packet(seg_name, bytes(make_data(seg_name, MetaInfo(), b'other',
+                                                              signer=DigestSha256Signer())))
+            assert await handle.fetch_manifest_data(root_name, None)
+            assert storage.get_data_packet(full_names[1]) == segments[1]
+            # a packet whose digest is not the one listed is never accepted
+            handle.MANIFEST_RETRIES = 1
+            assert not await handle.fetch_manifest_data(bad_root_name, None)
+            assert storage.get_data_packet(bad_root_name) is None
+            # any error fetching a listed packet fails the object, however many packets are listed
+            express_interest = app.express_interest
+
+            async def _canceled(int_name, *args, **kwargs):
+                if Component.get_type(Name.normalize(int_name)[-1]) == Component.TYPE_IMPLICIT_SHA256:
+                    raise InterestCanceled()
+                return await express_interest(int_name, *args, **kwargs)
+            app.express_interest = _canceled
+            assert not await aio.wait_for(handle.fetch_manifest_data(canceled_root_name, None), 5)
+            assert storage.get_data_packet(canceled_root_name) is None
+            results.append(True)
+            app.shutdown()
+
+        results = []
+        face = DummyFace(face_proc)
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
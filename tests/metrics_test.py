@@ -0,0 +1,60 @@
+import asyncio as aio
+from ndn_python_repo.utils import MetricsRegistry, MetricsServer
+
+
+class TestMetrics:
+    @staticmethod
+    def test_render():
+        registry = MetricsRegistry()
+        counter = registry.counter('test_requests_total', 'Requests', ['result'])
+        counter.labels('served').inc()
+        counter.labels('served').inc(2)
+        assert registry.counter('test_requests_total', 'Requests', ['result']) is counter
+        gauge = registry.gauge('test_queue', 'Queue length')
+        gauge.set_function(lambda: 5)
+        labeled_gauge = registry.gauge('test_lag', 'Lag', ['group'])
+        labeled_gauge.set_function(lambda: [(('/a"b', ), 1)])
+        histogram = registry.histogram('test_seconds', 'Latency', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 2):
+            histogram.observe(value)
+        assert registry.render().splitlines() == [
+            '# HELP test_requests_total Requests',
+            '# TYPE test_requests_total counter',
+            'test_requests_total{result="served"} 3',
+            '# HELP test_queue Queue length',
+            '# TYPE test_queue gauge',
+            'test_queue 5',
+            '# HELP test_lag Lag',
+            '# TYPE test_lag gauge',
+            'test_lag{group="/a\\"b"} 1',
+            '# HELP test_seconds Latency',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            'test_seconds_sum 2.55',
+            'test_seconds_count 3',
+        ]
+
+    @staticmethod
+    def test_server():
+        aio.run(TestMetrics.server_body())
+
+    @staticmethod
+    async def server_body():
+        registry = MetricsRegistry()
+        registry.counter('test_total', 'Test').inc()
+        server = MetricsServer(registry, '127.0.0.1', 0)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+
+        async def _get(path: str) -> bytes:
+            reader, writer = await aio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            ret = await reader.read()
+            writer.close()
+            return ret
+
+        assert (await _get('/metrics')).endswith(b'\r\n\r\n# HELP test_total Test\n# TYPE test_total counter\ntest_total 1\n')
+        assert (await _get('/')).startswith(b'HTTP/1.1 404')
+        server.close()
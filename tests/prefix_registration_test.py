@@ -0,0 +1,195 @@
+import asyncio as aio
+import struct
+from ndn.app import NDNApp
+from ndn.app_support.nfd_mgmt import ControlParameters, ControlResponse
+from ndn.encoding import Name, Component, InterestParam, MetaInfo, TypeNumber, make_data, make_interest, \
+    parse_interest, parse_tl_num
+from ndn.encoding.tlv_var import write_tl_num, get_tl_num_size
+from ndn.security import DigestSha256Signer, KeychainDigest
+from ndn.transport.dummy_face import DummyFace
+from ndn_python_repo import Repo
+from ndn_python_repo.handle import CommandHandle, DeleteCommandHandle, ReadHandle, SyncCommandHandle, \
+    WriteCommandHandle
+from ndn_python_repo.storage import SqliteStorage
+from ndn_python_repo.utils import PubSub
+from typing import Optional
+
+
+def _response(name, params) -> bytes:
+    response = ControlResponse()
+    response.status_code = 200
+    response.status_text = 'OK'
+    response.body = params
+    value = response.encode()
+    content = bytearray(1 + get_tl_num_size(len(value)) + len(value))
+    content[0] = 0x65
+    offset = 1 + write_tl_num(len(value), content, 1)
+    content[offset:] = value
+    return bytes(make_data(name, MetaInfo(freshness_period=0), bytes(content), signer=DigestSha256Signer()))
+
+
+def _forwarder(commands: list, served: Optional[list] = None):
+    """
+    :return: A face procedure accepting all prefix commands, which appends their\
+        ``(command, prefix, timestamp)`` to ``commands``, and the Data packets sent to ``served``.
+    """
+    async def face_proc(face: DummyFace):
+        while face.running:
+            await aio.sleep(0.001)
+            buf, face.output_buf = face.output_buf, b''
+            while buf:
+                typ, typ_len = parse_tl_num(buf)
+                size, size_len = parse_tl_num(buf, typ_len)
+                packet = buf[:typ_len + size_len + size]
+                buf = buf[typ_len + size_len + size:]
+                if typ == TypeNumber.DATA:
+                    if served is not None:
+                        served.append(packet)
+                    continue
+                int_name = parse_interest(packet)[0]
+                if int_name[:2] != Name.from_str('/localhost/nfd'):
+                    continue
+                params = ControlParameters.parse(Component.get_value(int_name[4])).cp
+                timestamp = struct.unpack('!Q', Component.get_value(int_name[5]))[0]
+                commands.append((bytes(Component.get_value(int_name[3])).decode(),
+                                 Name.to_str(params.name), timestamp))
+                await face.input_packet(_response(int_name, params))
+    return face_proc
+
+
+class TestPrefixAggregation:
+    @staticmethod
+    def test_main(tmp_path):
+        commands = []
+
+        async def app_main():
+            config = {'repo_config': {'register_root': False, 'register_aggregate_depth': 2,
+                                      'register_window': 4, 'register_rate': 1000}}
+            read_handle = ReadHandle(app, SqliteStorage(str(tmp_path / 'sqlite3.db')), config)
+            for i in range(50):
+                read_handle.listen(Name.from_str(f'/a/b/obj{i}'))
+            read_handle.listen(Name.from_str('/a/c/obj'))
+            read_handle.listen(Name.from_str('/d'))
+            await read_handle.registrar.join()
+            assert sorted((command, name) for command, name, _ in commands) == \
+                [('register', '/a/b'), ('register', '/a/c'), ('register', '/d')]
+            # commands are sent in order, with increasing timestamps
+            timestamps = [timestamp for _, _, timestamp in commands]
+            assert timestamps == sorted(set(timestamps))
+
+            # an aggregated prefix is unregistered with the last prefix under it
+            commands.clear()
+            read_handle.unlisten(Name.from_str('/a/b/obj0'))
+            read_handle.unlisten(Name.from_str('/a/c/obj'))
+            await read_handle.registrar.join()
+            assert [(command, name) for command, name, _ in commands] == [('unregister', '/a/c')]
+            assert len(read_handle.routes) == 2
+            results.append(True)
+            app.shutdown()
+
+        results = []
+        face = DummyFace(_forwarder(commands))
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
+
+
+class TestLazyRecovery:
+    @staticmethod
+    def test_main(tmp_path):
+        commands = []
+
+        async def app_main():
+            config = {'repo_config': {'repo_name': 'testrepo', 'register_root': False, 'register_rate': 1000}}
+            storage = SqliteStorage(str(tmp_path / 'sqlite3.db'))
+            for i in range(300):
+                CommandHandle.add_registered_prefix_in_storage(storage, Name.from_str(f'/app/obj{i}'))
+            groups = [Name.from_str('/sync/a'), Name.from_str('/sync/b')]
+            for group in groups:
+                CommandHandle.add_sync_group_in_storage(storage, group)
+                CommandHandle.add_sync_states_in_storage(storage, group, {
+                    'fetched_dict': {}, 'svs_client_states': {'local_sv': {}, 'inst_buffer': {}},
+                    'data_name_dedupe': False, 'check_status': {}, 'register_prefix': None})
+            pb = PubSub(app)
+            read_handle = ReadHandle(app, storage, config)
+            write_handle = WriteCommandHandle(app, storage, pb, read_handle, config)
+            sync_handle = SyncCommandHandle(app, storage, pb, read_handle, config)
+            delete_handle = DeleteCommandHandle(app, storage, pb, read_handle, config)
+            repo = Repo(app, storage, read_handle, write_handle, delete_handle, sync_handle, None, config)
+            # the repo accepts commands before its state is recovered
+            await repo.listen()
+            assert not repo.ready.is_set()
+            # a group a command refers to is recovered first
+            sync_handle.unrecovered_groups.add('/sync/b')
+            sync_handle.recover_group('/sync/b')
+            assert list(sync_handle.running_svs) == ['/sync/b']
+            await aio.wait_for(repo.wait_ready(), 20)
+            assert len(read_handle.routes) == 300
+            assert sorted(sync_handle.running_svs) == ['/sync/a', '/sync/b']
+            assert repo.recovery == {'prefixes': [300, 300], 'sync_groups': [2, 2], 'insert_jobs': [0, 0]}
+            assert sum(command == 'register' and name.startswith('/app/') for command, name, _ in commands) == 300
+            for svs in sync_handle.running_svs.values():
+                await svs.stop()
+            results.append(True)
+            app.shutdown()
+
+        results = []
+        face = DummyFace(_forwarder(commands))
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app.main_loop(after_start=app_main()))
+        assert results == [True]
+
+
+class TestReconnection:
+    @staticmethod
+    def test_main(tmp_path):
+        commands = []
+        served = []
+        name = Name.from_str('/a/b/obj/0')
+        data_bytes = bytes(make_data(name, MetaInfo(), b'data', signer=DigestSha256Signer()))
+        interest = bytes(make_interest(name, InterestParam()))
+
+        async def first():
+            config = {'repo_config': {'register_root': False, 'register_aggregate_depth': 2,
+                                      'register_rate': 1000}}
+            storage = SqliteStorage(str(tmp_path / 'sqlite3.db'))
+            storage.put_data_packet(name, data_bytes)
+            read_handle = ReadHandle(app, storage, config)
+            # kept alive across the reconnection
+            handles.append(read_handle)
+            read_handle.listen(Name.from_str('/a/b/obj'))
+            read_handle.listen(Name.from_str('/c/obj'))
+            read_handle.unlisten(Name.from_str('/c/obj'))
+            await read_handle.registrar.join()
+            app.shutdown()
+
+        async def second():
+            # the forwarder restarted, the prefix listened to is registered again
+            for _ in range(100):
+                if ('register', '/a/b') in [(command, name) for command, name, _ in commands]:
+                    break
+                await aio.sleep(0.01)
+            assert [(command, name) for command, name, _ in commands] == [('register', '/a/b')]
+            await face.input_packet(interest)
+            for _ in range(100):
+                if served:
+                    break
+                await aio.sleep(0.01)
+            assert served == [data_bytes]
+            results.append(True)
+            app.shutdown()
+
+        async def app_main():
+            await app.main_loop(after_start=first())
+            commands.clear()
+            await app.main_loop(after_start=second())
+
+        results = []
+        handles = []
+        face = DummyFace(_forwarder(commands, served))
+        app = NDNApp(face, KeychainDigest())
+        face.app = app
+        aio.run(app_main())
+        assert results == [True]
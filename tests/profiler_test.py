@@ -0,0 +1,41 @@
+import asyncio as aio
+import time
+from ndn_python_repo.utils import Profiler
+from ndn_python_repo.utils import profiler
+
+
+class TestProfiler:
+    @staticmethod
+    def test_cprofile(tmp_path):
+        aio.run(TestProfiler.body(tmp_path, 'cprofile'))
+        assert len(list(tmp_path.glob('*.pstats'))) == 1
+
+    @staticmethod
+    def test_sample(tmp_path):
+        aio.run(TestProfiler.body(tmp_path, 'sample'))
+        assert 'profiler_test.py' in next(tmp_path.glob('*.folded')).read_text()
+
+    @staticmethod
+    async def body(tmp_path, mode: str):
+        prof = Profiler(str(tmp_path), mode, stall_threshold=0.05)
+        # the decorator records into the module-wide profiler
+        old_profiler, profiler.PROFILER = profiler.PROFILER, prof
+        try:
+            @profiler.timed_callback('blocking')
+            def blocking():
+                time.sleep(0.2)
+
+            blocking()
+            assert not prof.callbacks
+            prof.start()
+            await aio.sleep(0.05)
+            blocking()
+            await aio.sleep(0.05)
+            path = prof.stop()
+        finally:
+            profiler.PROFILER = old_profiler
+        assert prof.callbacks['blocking'].count == 1
+        assert len(prof.stalls) == 1 and prof.stalls[0]['duration'] >= 0.15
+        assert any('blocking' in frame for frame in prof.stalls[0]['stack'])
+        report = open(path).read()
+        assert 'blocking' in report and 'Event loop stalls over 0.05s: 1' in report
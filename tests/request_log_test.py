@@ -0,0 +1,57 @@
+import json
+import logging
+from ndn.encoding import Name
+from ndn_python_repo.storage import NameKey
+from ndn_python_repo.utils import RequestLog, config_request_logging
+
+
+class _CountingName(list):
+    """
+    A name counting how many times it is iterated over, i.e. formatted.
+    """
+    formatted = 0
+
+    def __iter__(self):
+        _CountingName.formatted += 1
+        return super().__iter__()
+
+
+class TestRequestLog:
+    @staticmethod
+    def test_lazy_formatting(caplog):
+        request_log = RequestLog('test_lazy')
+        name = _CountingName(Name.from_str('/a/b'))
+        with caplog.at_level(logging.INFO):
+            request_log('serve', name)
+        assert _CountingName.formatted == 0 and not caplog.records
+        with caplog.at_level(logging.DEBUG, logger=request_log.logger.name):
+            request_log('serve', NameKey.from_name('/a/b'), size=10)
+        assert caplog.messages == ['serve /a/b size=10']
+
+    @staticmethod
+    def test_sampling(caplog):
+        request_log = RequestLog('test_sampling')
+        request_log.set_sample_rate(0.25)
+        with caplog.at_level(logging.DEBUG, logger=request_log.logger.name):
+            for i in range(8):
+                request_log('serve', f'/a/{i}')
+        assert caplog.messages == ['serve /a/3', 'serve /a/7']
+        request_log.set_sample_rate(0)
+        assert not request_log.enabled
+
+    @staticmethod
+    def test_access_log(tmp_path):
+        path = tmp_path / 'access.log'
+        listener = config_request_logging({'sample': {'test_access': 0.5}, 'access_log': str(path)})
+        try:
+            request_log = RequestLog.get('test_access')
+            assert request_log.stride == 2 and request_log.enabled
+            for i in range(4):
+                request_log('nack', f'/a/{i}', reason=150)
+        finally:
+            listener.stop()
+            RequestLog.access_logger.handlers.clear()
+            RequestLog.access_logger = None
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [(line['cat'], line['ev'], line['name'], line['reason']) for line in lines] == \
+            [('test_access', 'nack', '/a/1', 150), ('test_access', 'nack', '/a/3', 150)]
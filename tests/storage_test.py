@@ -1,6 +1,10 @@
 import asyncio as aio
-from ndn.encoding import Name
-from ndn_python_repo.storage import SqliteStorage
+from hashlib import sha256
+import sqlite3
+import struct
+from ndn.encoding import Name, Component, DecodeError, MetaInfo, make_data
+from ndn.security import DigestSha256Signer
+from ndn_python_repo.storage import BatchWriter, NameKey, Storage, SqliteStorage
 import time
 
 
@@ -21,6 +25,12 @@ class StorageTestFixture(object):
         StorageTestFixture._test_get_prefix()
         StorageTestFixture._test_put_batch()
         StorageTestFixture._test_write_back()
+        StorageTestFixture._test_implicit_digest()
+        StorageTestFixture._test_latest_version()
+        StorageTestFixture._test_exists()
+        StorageTestFixture._test_batch_writer()
+        StorageTestFixture._test_scan_data_packet()
+        StorageTestFixture._test_name_key()
 
     @staticmethod
     def _test_put():
@@ -114,6 +124,150 @@ class StorageTestFixture(object):
         data_bytes_out = StorageTestFixture.storage.get_data_packet(Name.from_str('/test_write_back/0'))
         assert data_bytes_in == data_bytes_out
 
+    @staticmethod
+    def _test_implicit_digest():
+        storage = StorageTestFixture.storage
+        name = Name.from_str('/test_implicit_digest/0')
+        data_bytes_in = bytes(make_data(name, MetaInfo(freshness_period=10000), b'Hello, world!',
+                                        signer=DigestSha256Signer()))
+        digest = Component.from_bytes(sha256(data_bytes_in).digest(), Component.TYPE_IMPLICIT_SHA256)
+        wrong_digest = Component.from_bytes(bytes(32), Component.TYPE_IMPLICIT_SHA256)
+        storage.put_data_packet(name, data_bytes_in)
+        # resolved from the cache
+        assert storage.get_data_packet(name + [digest]) == data_bytes_in
+        assert storage.get_data_packet(name + [wrong_digest]) is None
+        # resolved from the backend
+        storage._write_back()
+        assert storage.get_data_packet(name + [digest]) == data_bytes_in
+        assert storage.get_data_packet(name + [wrong_digest]) is None
+
+    @staticmethod
+    def _make_versions(prefix: str, versions: list[int], n_segments: int) -> dict:
+        ret = {}
+        for version in versions:
+            for seg in range(n_segments):
+                name = Name.from_str(prefix) + [Component.from_version(version), Component.from_segment(seg)]
+                ret[(version, seg)] = bytes(make_data(name, MetaInfo(freshness_period=10000), b'Hello, world!',
+                                                      signer=DigestSha256Signer()))
+                StorageTestFixture.storage.put_data_packet(name, ret[(version, seg)])
+        return ret
+
+    @staticmethod
+    def _test_latest_version():
+        storage = StorageTestFixture.storage
+        prefix = Name.from_str('/test_latest_version')
+        # version 256 is encoded longer than 255, and must still be considered newer
+        packets = StorageTestFixture._make_versions('/test_latest_version', [1, 255], 2)
+        storage._write_back()
+        assert storage.get_data_packet(prefix, can_be_prefix=True) == packets[(255, 0)]
+        # a newer version still in the write-back cache is found as well
+        packets.update(StorageTestFixture._make_versions('/test_latest_version', [256], 2))
+        assert storage.get_data_packet(prefix, can_be_prefix=True) == packets[(256, 0)]
+        storage._write_back()
+        assert storage.get_data_packet(prefix, can_be_prefix=True) == packets[(256, 0)]
+
+    @staticmethod
+    def _test_exists():
+        storage = StorageTestFixture.storage
+        StorageTestFixture._make_versions('/test_exists', [1], 2)
+        storage._write_back()
+        StorageTestFixture._make_versions('/test_exists', [2], 1)
+        names = ['/test_exists/v=1/seg=0', '/test_exists/v=1/seg=1', '/test_exists/v=1/seg=2',
+                 '/test_exists/v=2/seg=0']
+        assert storage.exists_data_packets(names) == [True, True, False, True]
+
+    @staticmethod
+    def _test_batch_writer():
+        storage = StorageTestFixture.storage
+        names = [Name.from_str(f'/test_batch_writer/{i}') for i in range(3)]
+        data_bytes_in = [bytes(make_data(name, MetaInfo(freshness_period=10000), b'Hello, world!',
+                                         signer=DigestSha256Signer())) for name in names]
+        # an older packet in the cache is superseded
+        storage.put_data_packet(names[0], bytes(make_data(names[0], MetaInfo(), b'old',
+                                                          signer=DigestSha256Signer())))
+        flushed = []
+        with BatchWriter(storage, max_packets=2, on_flush=flushed.extend) as writer:
+            for i, (name, data_bytes) in enumerate(zip(names, data_bytes_in)):
+                writer.put(name, data_bytes, 10000, i)
+            # committed as soon as the batch is full
+            assert flushed == [0, 1]
+            assert storage._get(storage._get_name_bytes_wo_tl(names[1])) == data_bytes_in[1]
+        assert flushed == [0, 1, 2]
+        for name, data_bytes in zip(names, data_bytes_in):
+            assert storage.get_data_packet(name, must_be_fresh=True) == data_bytes
+        storage._write_back()
+        assert storage.get_data_packet(names[0]) == data_bytes_in[0]
+        # packets already stored are reported in order, without committing the batch early
+        flushed = []
+        with BatchWriter(storage, max_packets=3, on_flush=flushed.extend) as writer:
+            writer.put(names[0], data_bytes_in[0], 10000, 0)
+            writer.skip(1)
+            assert flushed == []
+            writer.put(names[2], data_bytes_in[2], 10000, 2)
+            assert flushed == [0, 1, 2]
+            writer.skip(3)
+        assert flushed == [0, 1, 2, 3]
+
+    @staticmethod
+    def _test_scan_data_packet():
+        name = Name.from_str('/test_scan_data_packet/0')
+        data_bytes = bytes(make_data(name, MetaInfo(freshness_period=10000), b'Hello, world!',
+                                     signer=DigestSha256Signer()))
+        name_tlv, freshness_period = Storage.scan_data_packet(data_bytes)
+        assert Name.from_bytes(name_tlv) == name and freshness_period == 10000
+        data_bytes = bytes(make_data(name, MetaInfo(), b'Hello, world!', signer=DigestSha256Signer()))
+        assert Storage.scan_data_packet(data_bytes)[1] is None
+        for malformed in [data_bytes[:-1], b'\x05' + data_bytes[1:], data_bytes[:4]]:
+            try:
+                Storage.scan_data_packet(malformed)
+                assert False
+            except DecodeError:
+                pass
+
+    @staticmethod
+    def _test_name_key():
+        storage = StorageTestFixture.storage
+        name = Name.from_str('/test_name_key/a/b')
+        data_bytes = bytes(make_data(name, MetaInfo(freshness_period=10000), b'Hello, world!',
+                                     signer=DigestSha256Signer()))
+        key = NameKey.from_packet(data_bytes)
+        assert key == NameKey.from_name(name) == storage._get_name_bytes_wo_tl('/test_name_key/a/b')
+        assert key.n_components == 3 and key.component(-1) == name[-1]
+        assert key.prefix(-1) == NameKey.from_name(name[:-1]) and key.prefix(-1).n_components == 2
+        assert key.to_name() == name
+        storage.put_data_packet(name, data_bytes)
+        assert storage.get_data_packet(key) == data_bytes
+        assert storage.get_data_packet(key.prefix(2), can_be_prefix=True) == data_bytes
+
+    @staticmethod
+    def _test_dedup():
+        storage = StorageTestFixture.storage
+        content = b'same payload ' * 32
+        names = [Name.from_str('/test_dedup/mirror1/0'), Name.from_str('/test_dedup/mirror2/0')]
+        data_bytes_in = [bytes(make_data(name, MetaInfo(freshness_period=10000), content,
+                                         signer=DigestSha256Signer())) for name in names]
+        for name, data_bytes in zip(names, data_bytes_in):
+            storage.put_data_packet(name, data_bytes)
+        storage._write_back()
+        assert storage.get_dedup_ratio() > 1.0
+        for name, data_bytes in zip(names, data_bytes_in):
+            assert storage.get_data_packet(name) == data_bytes
+            digest = Component.from_bytes(sha256(data_bytes).digest(), Component.TYPE_IMPLICIT_SHA256)
+            assert storage.get_data_packet(name + [digest]) == data_bytes
+        # The shared block survives until its last reference is removed
+        assert storage.remove_data_packet(names[0])
+        assert storage.get_data_packet(names[1]) == data_bytes_in[1]
+        assert storage.remove_data_packet(names[1])
+        assert storage._get(storage.DEDUP_BLOCK_PREFIX + sha256(content).digest()) is None
+        # Overwriting a stored packet releases the block of the old payload
+        storage.put_data_packet(names[0], data_bytes_in[0])
+        storage._write_back()
+        new_data_bytes = bytes(make_data(names[0], MetaInfo(), b'new payload ' * 32, signer=DigestSha256Signer()))
+        storage.put_data_packet(names[0], new_data_bytes)
+        storage._write_back()
+        assert storage._get(storage.DEDUP_BLOCK_PREFIX + sha256(content).digest()) is None
+        assert storage.get_data_packet(names[0]) == new_data_bytes
+
 
 # Default DB is SQLite
 class TestSqliteStorage(StorageTestFixture):
@@ -129,6 +283,263 @@ class TestSqliteStorage(StorageTestFixture):
         StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db')
         StorageTestFixture.test_main(tmp_path)
 
+    @staticmethod
+    def test_digest_migration(tmp_path):
+        aio.run(TestSqliteStorage.digest_migration_body(tmp_path))
+
+    @classmethod
+    async def digest_migration_body(cls, tmp_path):
+        # a database created before implicit digests were stored
+        name = Name.from_str('/test_digest_migration/0')
+        data_bytes_in = bytes(make_data(name, MetaInfo(), b'Hello, world!', signer=DigestSha256Signer()))
+        conn = sqlite3.connect(tmp_path / 'old.db')
+        conn.execute('CREATE TABLE data (key BLOB PRIMARY KEY, value BLOB, expire_time_ms INTEGER)')
+        conn.execute('INSERT INTO data VALUES (?, ?, ?)',
+                     (SqliteStorage._get_name_bytes_wo_tl(name), data_bytes_in, None))
+        conn.commit()
+        conn.close()
+        storage = SqliteStorage(tmp_path / 'old.db')
+        digest = Component.from_bytes(sha256(data_bytes_in).digest(), Component.TYPE_IMPLICIT_SHA256)
+        assert storage.get_data_packet(name + [digest]) == data_bytes_in
+
+    @staticmethod
+    def test_version_retention(tmp_path):
+        aio.run(TestSqliteStorage.version_retention_body(tmp_path))
+
+    @classmethod
+    async def version_retention_body(cls, tmp_path):
+        storage = SqliteStorage(tmp_path / 'test.db', version_retention=2)
+        StorageTestFixture.storage = storage
+        packets = StorageTestFixture._make_versions('/test_version_retention', [1, 2, 3], 3)
+        storage._write_back()
+        for (version, seg), data_bytes in packets.items():
+            name = Name.from_str('/test_version_retention') + [Component.from_version(version),
+                                                               Component.from_segment(seg)]
+            expected = data_bytes if version > 1 else None
+            assert storage.get_data_packet(name) == expected
+
+    @staticmethod
+    def test_version_retention_batches(tmp_path):
+        aio.run(TestSqliteStorage.version_retention_batches_body(tmp_path))
+
+    @classmethod
+    async def version_retention_batches_body(cls, tmp_path):
+        storage = SqliteStorage(tmp_path / 'test.db', version_retention=1, dedup=True,
+                                quota={'max_bytes': 1 << 30})
+        prefix = Name.from_str('/test_retention_batches')
+        packets = {}
+
+        def _put_versions(versions: list[int]):
+            for version in versions:
+                for seg in range(3):
+                    name = prefix + [Component.from_version(version), Component.from_segment(seg)]
+                    packets[(version, seg)] = bytes(make_data(name, MetaInfo(), b'same payload ' * 32,
+                                                              signer=DigestSha256Signer()))
+                    storage.put_data_packet(name, packets[(version, seg)])
+
+        _put_versions([1])
+        storage._write_back()
+        conn = storage.conn
+        commits = []
+
+        class _Connection:
+            def __getattr__(self, attr):
+                return getattr(conn, attr)
+
+            def commit(self):
+                commits.append(True)
+                conn.commit()
+        storage.conn = _Connection()
+        # the blocks, the removal of old versions and the new packets take one transaction each,
+        # and a version already outdated in the cache is never written
+        _put_versions([2, 3])
+        storage._write_back()
+        assert len(commits) == 3
+        storage.conn = conn
+        for (version, seg), data_bytes in packets.items():
+            name = prefix + [Component.from_version(version), Component.from_segment(seg)]
+            expected = data_bytes if version == 3 else None
+            assert storage.get_data_packet(name) == expected
+        # the block and the index only count the packets left
+        size = len(packets[(3, 0)])
+        assert storage.quota.usage['total'] == size * 3
+        assert len(list(storage._iter_prefix_keys(storage.quota.META_PREFIX))) == 3
+        blocks = list(storage._iter_prefix_keys(storage.DEDUP_BLOCK_PREFIX))
+        assert len(blocks) == 1
+        assert struct.unpack('!I', storage._get(blocks[0])[:4])[0] == 3
+
+
+class TestSqliteStorageDedup(StorageTestFixture):
+    """
+    Test SqliteStorage with payload deduplication
+    """
+    @staticmethod
+    def test_main(tmp_path):
+        aio.run(TestSqliteStorageDedup.body(tmp_path))
+
+    @classmethod
+    async def body(cls, tmp_path):
+        StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db', dedup=True)
+        StorageTestFixture.test_main(tmp_path)
+        StorageTestFixture._test_dedup()
+
+
+class TestSqliteStorageReservedKeys(StorageTestFixture):
+    """
+    Test that the records kept next to Data packets are never served
+    """
+    @staticmethod
+    def test_main(tmp_path):
+        aio.run(TestSqliteStorageReservedKeys.body(tmp_path))
+
+    @classmethod
+    async def body(cls, tmp_path):
+        storage = SqliteStorage(tmp_path / 'test.db', dedup=True, quota={'max_bytes': 1 << 30})
+        # a record of the command handles
+        storage._put(b'/insert_jobs/%01', b'{}')
+        assert storage.get_data_packet('/', can_be_prefix=True) is None
+        name = Name.from_str('/test_reserved/0')
+        data_bytes = bytes(make_data(name, MetaInfo(), b'x' * 100, signer=DigestSha256Signer()))
+        storage.put_data_packet(name, data_bytes)
+        storage._write_back()
+        # the dedup and quota records sort before every packet
+        assert storage.get_data_packet('/', can_be_prefix=True) == data_bytes
+
+
+class TestSqliteStorageQuota(StorageTestFixture):
+    """
+    Test SqliteStorage with quotas
+    """
+    @staticmethod
+    def test_main(tmp_path):
+        aio.run(TestSqliteStorageQuota.body(tmp_path))
+
+    @classmethod
+    async def body(cls, tmp_path):
+        StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': 1 << 30,
+                                                                                 'eviction': 'lru'})
+        StorageTestFixture.test_main(tmp_path)
+
+    @staticmethod
+    def test_quota_check(tmp_path):
+        aio.run(TestSqliteStorageQuota.quota_check_body(tmp_path))
+
+    @classmethod
+    async def quota_check_body(cls, tmp_path):
+        # packets stored before quotas are enabled are accounted for
+        StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db')
+        packets = StorageTestFixture._make_versions('/test_quota', [1], 2)
+        StorageTestFixture.storage._write_back()
+        size = len(packets[(1, 0)])
+        storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': size * 4,
+                                                              'prefixes': {'/test_quota/v=2': size}})
+        StorageTestFixture.storage = storage
+        assert storage.check_quota('/test_quota/v=1/seg=0', size * 2)
+        assert not storage.check_quota('/test_quota/v=1/seg=0', size * 3)
+        assert not storage.check_quota('/test_quota/v=2/seg=0', size * 2)
+        # overwriting a packet, in the cache or in the database, does not count twice
+        for _ in range(2):
+            StorageTestFixture._make_versions('/test_quota', [1], 2)
+        assert storage.quota.usage['total'] == size * 2
+        storage._write_back()
+        StorageTestFixture._make_versions('/test_quota', [2], 1)
+        assert storage.quota.usage == {'total': size * 3, 'prefixes': {'/test_quota/v=2': size}}
+        assert not storage.check_quota('/test_quota/v=2/seg=1', size)
+        assert storage.remove_data_packet('/test_quota/v=2/seg=0')
+        assert storage.check_quota('/test_quota/v=2/seg=1', size)
+        storage._write_back()
+        # usage is persisted
+        storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': size * 4,
+                                                              'prefixes': {'/test_quota/v=2': size}})
+        assert not storage.check_quota('/test_quota', size * 3)
+        assert storage.check_quota('/test_quota', size * 2)
+
+    @staticmethod
+    def test_disabled(tmp_path):
+        aio.run(TestSqliteStorageQuota.disabled_body(tmp_path))
+
+    @classmethod
+    async def disabled_body(cls, tmp_path):
+        quota = {'max_bytes': 1 << 30}
+        StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db', quota=quota)
+        packets = StorageTestFixture._make_versions('/test_disabled', [1], 1)
+        StorageTestFixture.storage._write_back()
+        size = len(packets[(1, 0)])
+        assert StorageTestFixture.storage.quota.usage['total'] == size
+        # a section that limits nothing keeps no index
+        storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': 0, 'prefixes': {}, 'eviction': 'none'})
+        assert storage.quota is None
+        StorageTestFixture.storage = storage
+        StorageTestFixture._make_versions('/test_disabled', [2], 1)
+        storage._write_back()
+        # the packets stored meanwhile are accounted for once quotas are enabled again
+        storage = SqliteStorage(tmp_path / 'test.db', quota=quota)
+        assert storage.check_quota('/test_disabled', (1 << 30) - size * 2)
+        assert not storage.check_quota('/test_disabled', (1 << 30) - size * 2 + 1)
+
+    @staticmethod
+    def test_index_batches(tmp_path):
+        aio.run(TestSqliteStorageQuota.index_batches_body(tmp_path))
+
+    @classmethod
+    async def index_batches_body(cls, tmp_path):
+        storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': 1 << 30, 'eviction': 'lru'})
+        StorageTestFixture.storage = storage
+        packets = StorageTestFixture._make_versions('/test_index', [1], 20)
+        storage._write_back()
+        # count the transactions of the database
+        conn = storage.conn
+        commits = []
+
+        class _Connection:
+            def __getattr__(self, attr):
+                return getattr(conn, attr)
+
+            def commit(self):
+                commits.append(True)
+                conn.commit()
+        storage.conn = _Connection()
+        # replacing stored packets, some of which were read, updates the index in two transactions
+        for seg in range(5):
+            storage.get_data_packet(Name.from_str(f'/test_index/v=1/seg={seg}'))
+        storage.put_data_packets([(Name.from_str(f'/test_index/v=1/seg={seg}'), packets[(1, seg)], None)
+                                  for seg in range(3, 10)])
+        assert len(commits) == 2
+        assert storage.quota.usage['total'] == sum(len(data) for data in packets.values())
+        # and removing a packet, with its index entries, in one
+        commits.clear()
+        assert storage.remove_data_packet('/test_index/v=1/seg=0')
+        assert len(commits) == 1
+        storage.conn = conn
+        # one meta and one order entry remain per stored packet
+        for prefix in (storage.quota.META_PREFIX, storage.quota.ORDER_PREFIX):
+            assert len(list(storage._iter_prefix_keys(prefix))) == 19
+
+    @staticmethod
+    def test_eviction(tmp_path):
+        aio.run(TestSqliteStorageQuota.eviction_body(tmp_path))
+
+    @classmethod
+    async def eviction_body(cls, tmp_path):
+        StorageTestFixture.storage = SqliteStorage(tmp_path / 'test.db')
+        size = len(StorageTestFixture._make_versions('/test_eviction', [0], 1)[(0, 0)])
+        StorageTestFixture.storage._write_back()
+        storage = SqliteStorage(tmp_path / 'test.db', quota={'max_bytes': size * 6, 'eviction': 'oldest'})
+        StorageTestFixture.storage = storage
+        packets = {}
+        for version in [1, 2, 3]:
+            packets.update(StorageTestFixture._make_versions('/test_eviction', [version], 3))
+            storage._write_back()
+        # evicted from the oldest until at most 80% of the quota is used
+        assert storage.quota.evict() == 6
+        assert storage.quota.usage['total'] == size * 4
+        for (version, seg), data_bytes in packets.items():
+            name = Name.from_str('/test_eviction') + [Component.from_version(version),
+                                                      Component.from_segment(seg)]
+            expected = data_bytes if (version, seg) >= (2, 2) else None
+            assert storage.get_data_packet(name) == expected
+        assert storage.quota.evict() == 0
+
 
 # # Unit tests for optional DBs only if they can be successfully imported
 # class TestLevelDBStorage(StorageTestFixture):